@@ -0,0 +1,111 @@
+"""
+Compares exact search with the IVF-Flat, IVF-PQ and HNSW indexes of 'AnnIndex'.
+
+Vectors are either the embedded fixture chunks repeated with noise up to '--num-vectors', or,
+with '--synthetic', L2-normalized points drawn around random cluster centers (embeddings of web
+pages are clustered by topic, uniform random vectors would be the worst case for IVF). Queries
+are perturbed copies of held-out points. Reports per index type the build (training) time, the
+index memory, queries per second and recall@k against the exact top-k.
+
+usage:
+    python -m benchmarks.ann [--fixtures tests/test_data] [--num-vectors 100000] [--k 5] [--synthetic]
+
+Without '--synthetic' the fixture chunks are embedded with 'config.EMBEDDING_MODEL_ID'.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from crawler.article_crawler.extractors import extract_text
+from src import config
+from src.processing.text_processor import iter_chunks
+from src.rag_core.ann_index import INDEX_TYPES, AnnIndex, AnnParams
+
+
+NUM_QUERIES = 500
+DIMENSION = 384
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_vectors(num_vectors: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(max(num_vectors // 500, 1), DIMENSION))
+    assignments = rng.integers(len(centers), size=num_vectors)
+    return normalize(centers[assignments] + rng.normal(scale=0.6, size=(num_vectors, DIMENSION)))
+
+
+def fixture_vectors(fixtures_dir: Path, num_vectors: int, rng: np.random.Generator) -> np.ndarray:
+    pages = {path.name: extract_text(path.read_bytes()) for path in sorted(fixtures_dir.glob("*.html"))}
+    if not pages:
+        raise SystemExit(f"No .html fixtures found in {fixtures_dir}")
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    model = HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL_ID, cache_folder=str(config.HF_HOME))
+    chunks = np.asarray(model.embed_documents([doc.page_content for doc in iter_chunks(pages)]), dtype=np.float32)
+
+    base = chunks[rng.integers(len(chunks), size=num_vectors)]
+    return normalize(base + rng.normal(scale=0.5 / np.sqrt(chunks.shape[1]), size=base.shape))
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    top = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), 100):
+        scores = queries[start:start + 100] @ vectors.T
+        top[start:start + 100] = np.argsort(-scores, axis=1)[:, :k]
+    return top
+
+
+def index_bytes(ann: AnnIndex) -> int:
+    import faiss
+    return len(faiss.serialize_index(ann.index)) + ann.slot_rows.nbytes
+
+
+def run(fixtures_dir: Path, num_vectors: int, k: int, synthetic: bool):
+    rng = np.random.default_rng(0)
+    points = synthetic_vectors(num_vectors + NUM_QUERIES, rng) if synthetic else fixture_vectors(fixtures_dir, num_vectors + NUM_QUERIES, rng)
+    vectors, queries = points[:num_vectors], points[num_vectors:]
+    queries = normalize(queries + rng.normal(scale=0.1 / np.sqrt(DIMENSION), size=queries.shape))
+
+    truth = exact_top_k(vectors, queries, k)
+
+    # One query at a time, like 'VectorIndex._search_rows'.
+    started_at = time.perf_counter()
+    for query in queries:
+        scores = vectors @ query
+        np.argpartition(-scores, k - 1)[:k]
+    exact_qps = len(queries) / (time.perf_counter() - started_at)
+
+    print(f"{num_vectors} vectors of dimension {vectors.shape[1]}, {len(queries)} queries, k={k}\n")
+    print(f"{'index':<10} {'build s':>8} {'memory MB':>10} {'QPS':>9} {f'recall@{k}':>10}")
+    print(f"{'flat':<10} {0:>8.2f} {vectors.nbytes / 2 ** 20:>10.1f} {exact_qps:>9.0f} {1:>10.3f}")
+
+    params = AnnParams.from_config()
+    for index_type in INDEX_TYPES[1:]:
+        started_at = time.perf_counter()
+        ann = AnnIndex.build(vectors, index_type, params)
+        build_time = time.perf_counter() - started_at
+
+        hits = 0
+        started_at = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            rows, _ = ann.search(vectors, query, k)
+            hits += len(set(rows.tolist()) & set(expected.tolist()))
+        qps = len(queries) / (time.perf_counter() - started_at)
+
+        print(f"{index_type:<10} {build_time:>8.2f} {index_bytes(ann) / 2 ** 20:>10.1f} {qps:>9.0f} {hits / truth.size:>10.3f}")
+
+    print("\nANN memory is the FAISS index alone, the exact vectors are kept for re-scoring in every mode.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=Path(__file__).parent.parent / "tests" / "test_data")
+    parser.add_argument("--num-vectors", type=int, default=100000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--synthetic", action="store_true", help="clustered random vectors instead of embedded fixture chunks")
+    args = parser.parse_args()
+
+    run(args.fixtures, args.num_vectors, args.k, args.synthetic)
@@ -0,0 +1,86 @@
+"""
+Compares character chunking with token chunking by the embedding model's tokenizer.
+
+Every fixture page is extracted and chunked both ways, then every chunk is counted with the same
+tokenizer. A chunk of more than the model window is truncated when embedded, so its tail costs
+scraping and chunking but never reaches the index. Reports per mode the number of chunks, the
+tokens that are embedded, the tokens that are truncated away and the worst chunk length.
+
+usage:
+    python -m benchmarks.chunking [--fixtures tests/test_data] [--tokenizer-file tokenizer.json]
+
+Without '--tokenizer-file' the tokenizer of 'config.EMBEDDING_MODEL_ID' is loaded from the Hub.
+"""
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+from tokenizers import Tokenizer
+
+from crawler.article_crawler.extractors import extract_text
+from src import config
+from src.processing.text_processor import _get_text_splitter
+from src.processing.token_splitter import EmbeddingTokenSplitter
+
+
+def load_splitter(tokenizer_file: Path, special_tokens: int) -> EmbeddingTokenSplitter:
+    if tokenizer_file is None:
+        return EmbeddingTokenSplitter.from_pretrained(
+            config.EMBEDDING_MODEL_ID, config.CHUNK_TOKEN_SIZE, config.CHUNK_TOKEN_OVERLAP, cache_dir=str(config.HF_HOME)
+        )
+
+    tokenizer = Tokenizer.from_file(str(tokenizer_file))
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    return EmbeddingTokenSplitter(tokenizer, config.CHUNK_TOKEN_SIZE - special_tokens, config.CHUNK_TOKEN_OVERLAP)
+
+
+def report(name: str, chunks: List[str], splitter: EmbeddingTokenSplitter, special_tokens: int):
+    counts = [count + special_tokens for count in splitter.count_tokens(chunks)]
+    window = splitter.chunk_tokens + special_tokens
+
+    embedded = sum(min(count, window) for count in counts)
+    truncated = sum(max(count - window, 0) for count in counts)
+    num_truncated = sum(count > window for count in counts)
+
+    print(
+        f"{name:<12} {len(chunks):>7} {embedded:>10} {truncated:>10} {num_truncated:>11} {max(counts):>10}"
+    )
+    return len(chunks), embedded
+
+
+def run(fixtures_dir: Path, tokenizer_file: Path, special_tokens: int):
+    pages: Dict[str, str] = {path.name: extract_text(path.read_bytes()) for path in sorted(fixtures_dir.glob("*.html"))}
+    if not pages:
+        raise SystemExit(f"No .html fixtures found in {fixtures_dir}")
+
+    splitter = load_splitter(tokenizer_file, special_tokens)
+    text_splitter = _get_text_splitter(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+
+    character_chunks = [chunk for text in pages.values() for chunk in text_splitter.split_text(text)]
+    token_chunks = [text[start:end] for text, spans in zip(pages.values(), splitter.split_spans(list(pages.values()))) for start, end in spans]
+
+    page_tokens = sum(splitter.count_tokens(list(pages.values())))
+    print(
+        f"Corpus: {len(pages)} pages, {sum(map(len, pages.values()))} characters, {page_tokens} tokens, "
+        f"window {splitter.chunk_tokens + special_tokens} tokens\n"
+    )
+    print(f"{'mode':<12} {'chunks':>7} {'embedded':>10} {'truncated':>10} {'truncated#':>11} {'max tokens':>10}")
+
+    characters = report(f"chars/{config.CHUNK_SIZE}", character_chunks, splitter, special_tokens)
+    tokens = report(f"tokens/{splitter.chunk_tokens + special_tokens}", token_chunks, splitter, special_tokens)
+
+    print(
+        f"\nToken chunking saves {characters[0] - tokens[0]} chunks ({1 - tokens[0] / characters[0]:.0%}) and "
+        f"{characters[1] - tokens[1]} embedded tokens ({1 - tokens[1] / characters[1]:.0%}), "
+        "embedded tokens include the overlap between chunks."
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=Path(__file__).parent.parent / "tests" / "test_data")
+    parser.add_argument("--tokenizer-file", type=Path, default=None, help="a local tokenizer.json instead of the Hub tokenizer")
+    parser.add_argument("--special-tokens", type=int, default=2, help="special tokens the model adds, 2 for BERT's [CLS] and [SEP]")
+    args = parser.parse_args()
+
+    run(args.fixtures, args.tokenizer_file, args.special_tokens)
@@ -0,0 +1,97 @@
+"""
+Measures the prompt tokens MMR selection and adjacent-chunk merging save over the raw top-k.
+
+The fixture pages are chunked and indexed, and one query per chunk is made from a sentence of it
+(see 'benchmarks.retrieval'). For every query the 'config.MMR_POOL_SIZE' best chunks are fetched,
+then the context is built two ways:
+
+    top-k    the k best chunks, as retrieval returned them before
+    mmr      k chunks picked by MMR with the per-source cap, neighbors merged into one span
+
+Reports the context tokens per query by the generator's tokenizer, the number of sources the
+context covers, and how often the chunk a query was made from is in the context.
+
+usage:
+    python -m benchmarks.context [--fixtures tests/test_data] [--k 5] [--hash-embeddings] [--tokenizer-file tokenizer.json]
+
+Without '--tokenizer-file' the tokenizer of 'config.MODEL_ID' is loaded from the Hub.
+"""
+import argparse
+import random
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+
+from benchmarks.retrieval import build_corpus, build_queries, load_embeddings
+from src import config
+from src.processing.text_processor import Document
+from src.rag_core.context_selection import merge_adjacent_chunks, mmr_select
+from src.rag_core.generator import Generator
+from src.rag_core.vector_index import VectorIndex
+
+
+def load_token_counter(tokenizer_file: Path) -> Callable[[str], int]:
+    if tokenizer_file is not None:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_file(str(tokenizer_file))
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(config.MODEL_ID, cache_dir=str(config.HF_HOME))
+    return lambda text: len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def context_tokens(docs: List[Document], count_tokens: Callable[[str], int]) -> int:
+    return count_tokens("\n\n".join(Generator._format_context_doc(doc) for doc in docs))
+
+
+def run(fixtures_dir: Path, k: int, use_hash: bool, tokenizer_file: Path):
+    rng = random.Random(0)
+    embed_fn = load_embeddings(use_hash)
+    count_tokens = load_token_counter(tokenizer_file)
+
+    documents = build_corpus(fixtures_dir, 0, rng)
+    queries = build_queries(documents, rng)["passage"]
+
+    index = VectorIndex()
+    index.upsert(documents, embed_fn)
+    print(f"Indexed {len(index)} chunks, {len(queries)} queries, k={k}, pool {config.MMR_POOL_SIZE}, "
+          f"lambda {config.MMR_LAMBDA}, at most {config.MAX_CHUNKS_PER_SOURCE} chunks per source\n")
+
+    results = {"top-k": [], "mmr": []}
+    for (query, row), vector in zip(queries, embed_fn([query for query, _ in queries])):
+        candidates = [doc for doc, _ in index.search(vector, config.MMR_POOL_SIZE)]
+        picked = mmr_select(
+            vector, index.vectors_of(candidates), k, lambda_mult=config.MMR_LAMBDA,
+            groups=[doc.metadata["source_url"] for doc in candidates], max_per_group=config.MAX_CHUNKS_PER_SOURCE
+        )
+
+        target = documents[row].page_content
+        for name, context in (("top-k", candidates[:k]), ("mmr", merge_adjacent_chunks([candidates[i] for i in picked]))):
+            results[name].append((
+                context_tokens(context, count_tokens),
+                len({doc.metadata["source_url"] for doc in context}),
+                any(target in doc.page_content for doc in context),
+            ))
+
+    print(f"{'context':<8} {'tokens/query':>13} {'p95 tokens':>11} {'sources':>8} {'hit rate':>9}")
+    for name, rows in results.items():
+        tokens = np.array([row[0] for row in rows])
+        print(
+            f"{name:<8} {tokens.mean():>13.0f} {np.percentile(tokens, 95):>11.0f} "
+            f"{np.mean([row[1] for row in rows]):>8.2f} {np.mean([row[2] for row in rows]):>9.2f}"
+        )
+
+    saved = np.array([raw[0] - selected[0] for raw, selected in zip(results["top-k"], results["mmr"])])
+    print(f"\nSaved {saved.mean():.0f} prompt tokens per query on average ({saved.sum() / sum(row[0] for row in results['top-k']):.0%}), at most {saved.max()}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=Path(__file__).parent.parent / "tests" / "test_data")
+    parser.add_argument("--k", type=int, default=config.NUM_RETRIEVED_DOCS)
+    parser.add_argument("--hash-embeddings", action="store_true")
+    parser.add_argument("--tokenizer-file", type=Path, default=None, help="a local tokenizer.json instead of the generator's Hub tokenizer")
+    args = parser.parse_args()
+
+    run(args.fixtures, args.k, args.hash_embeddings, args.tokenizer_file)
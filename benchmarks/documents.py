@@ -0,0 +1,101 @@
+"""
+Measures the memory each chunk costs when a corpus is held as Python objects.
+
+The fixture pages are extracted, chunked and copied under '--pages' synthetic URLs, then loaded
+the way 'VectorIndex.load' reads 'records.json', once into each layout:
+
+    dataclass      one '__dict__'-backed Document per chunk, the layout before '__slots__'
+    slots          one slotted Document per chunk
+    DocumentBatch  the columnar batch 'VectorIndex' keeps its chunks in
+
+With '--dedup' the pages are deduplicated the way 'retrieve_context_docs' does, one
+'ChunkDeduplicator' per query, where a query scrapes every fixture page once plus a mirror of
+one of them. Every kept chunk then carries 'source_urls', listing two URLs where it was mirrored.
+
+Reports the bytes per chunk on top of the chunk text itself, and the total.
+
+usage:
+    python -m benchmarks.documents [--fixtures tests/test_data] [--pages 2000] [--dedup]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from typing import Dict
+
+from crawler.article_crawler.extractors import extract_text
+from src.processing.deduplication import ChunkDeduplicator
+from src.processing.text_processor import Document, DocumentBatch, iter_chunks
+
+
+@dataclass
+class DictDocument:
+    page_content: str
+    metadata: Dict[str, str]
+
+
+LAYOUTS = {
+    "dataclass": lambda records: [DictDocument(r["page_content"], r["metadata"]) for r in records],
+    "slots": lambda records: [Document(r["page_content"], r["metadata"]) for r in records],
+    "DocumentBatch": lambda records: DocumentBatch(Document(r["page_content"], r["metadata"]) for r in records),
+}
+
+
+def build_records(fixtures_dir: Path, num_pages: int, dedup: bool) -> str:
+    texts = [extract_text(path.read_bytes()) for path in sorted(fixtures_dir.glob("*.html"))]
+    if not texts:
+        raise SystemExit(f"No .html fixtures found in {fixtures_dir}")
+
+    pages = [(f"https://mirror-{page}.example.com/articles/{page % len(texts)}", texts[page % len(texts)]) for page in range(num_pages)]
+    if dedup:
+        per_query = len(texts) + 1
+        chunks = chain.from_iterable(
+            ChunkDeduplicator().iter_unique(iter_chunks(dict(pages[start:start + per_query]))) for start in range(0, num_pages, per_query)
+        )
+    else:
+        chunks = iter_chunks(dict(pages))
+
+    return json.dumps([
+        {"page_content": doc.page_content, "metadata": doc.metadata} for doc in chunks
+    ])
+
+
+def measure(layout, serialized: str):
+    """Returns the number of chunks, the bytes still allocated once they are loaded and the bytes of their text."""
+    gc.collect()
+    tracemalloc.start()
+    records = json.loads(serialized)
+    text_bytes = sum(len(r["page_content"]) + 49 for r in records)
+    documents = layout(records)
+    del records
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return len(documents), size, text_bytes
+
+
+def run(fixtures_dir: Path, num_pages: int, dedup: bool):
+    serialized = build_records(fixtures_dir, num_pages, dedup)
+
+    print(f"{'layout':<14} {'chunks':>8} {'total MB':>9} {'bytes/chunk':>12} {'overhead/chunk':>15}")
+    for name, layout in LAYOUTS.items():
+        num_chunks, size, text_bytes = measure(layout, serialized)
+        print(
+            f"{name:<14} {num_chunks:>8} {size / 1e6:>9.1f} {size / num_chunks:>12.0f} "
+            f"{(size - text_bytes) / num_chunks:>15.0f}"
+        )
+
+    print("\noverhead/chunk is the total minus one 'str' per chunk text (49 bytes of header plus one byte per ASCII character).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=Path(__file__).parent.parent / "tests" / "test_data")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--dedup", action="store_true", help="deduplicate the pages, so chunks carry 'source_urls'")
+    args = parser.parse_args()
+
+    run(args.fixtures, args.pages, args.dedup)
@@ -0,0 +1,76 @@
+"""
+Benchmarks the text extractors of 'ContentSpider' over a corpus of saved HTML pages.
+
+Reports pages/sec and MB/sec per extractor, how closely each one reproduces the
+BeautifulSoup output, which is the reference since it is what the spider always used,
+and the characters each extractor keeps per page, i.e. how much text is left to chunk and embed.
+
+usage:
+    python -m benchmarks.extractors [--fixtures tests/test_data] [--repeat 20]
+"""
+import argparse
+import difflib
+import time
+from pathlib import Path
+from typing import Dict
+
+from crawler.article_crawler.extractors import EXTRACTORS
+
+
+REFERENCE_EXTRACTOR = "bs4"
+
+
+def load_corpus(fixtures_dir: Path) -> Dict[str, bytes]:
+    corpus = {path.name: path.read_bytes() for path in sorted(fixtures_dir.glob("*.html"))}
+    if not corpus:
+        raise SystemExit(f"No .html fixtures found in {fixtures_dir}")
+    return corpus
+
+
+def run(fixtures_dir: Path, repeat: int):
+    corpus = load_corpus(fixtures_dir)
+    total_bytes = sum(len(body) for body in corpus.values())
+    reference = {name: EXTRACTORS[REFERENCE_EXTRACTOR](body) for name, body in corpus.items()}
+
+    print(f"Corpus: {len(corpus)} pages, {total_bytes / 1024:.0f} KiB, {repeat} passes\n")
+    print(f"{'extractor':<13} {'pages/s':>9} {'MB/s':>7} {'speedup':>8} {'exact':>7} {'similarity':>11}")
+
+    results = {}
+    for name, extractor in EXTRACTORS.items():
+        outputs = {page: extractor(body) for page, body in corpus.items()}
+
+        started_at = time.perf_counter()
+        for _ in range(repeat):
+            for body in corpus.values():
+                extractor(body)
+        results[name] = (outputs, time.perf_counter() - started_at)
+
+    baseline = results[REFERENCE_EXTRACTOR][1]
+    for name, (outputs, elapsed) in results.items():
+        exact = sum(outputs[page] == reference[page] for page in corpus)
+        similarity = min(
+            difflib.SequenceMatcher(None, outputs[page], reference[page], autojunk=False).ratio() for page in corpus
+        )
+
+        print(
+            f"{name:<13} {len(corpus) * repeat / elapsed:>9.1f} {total_bytes * repeat / elapsed / 1e6:>7.2f} "
+            f"{baseline / elapsed:>7.1f}x {exact:>3}/{len(corpus):<3} {similarity:>11.4f}"
+        )
+
+        for page in corpus:
+            if outputs[page] != reference[page]:
+                print(f"    differs from {REFERENCE_EXTRACTOR}: {page} ({len(outputs[page])} vs {len(reference[page])} chars)")
+
+    print(f"\nCharacters per page\n{'page':<24}" + "".join(f"{name:>14}" for name in results))
+    for page in corpus:
+        print(f"{page:<24}" + "".join(
+            f"{len(outputs[page]):>8} ({len(outputs[page]) / max(len(reference[page]), 1):>4.0%})" for outputs, _ in results.values()
+        ))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=Path(__file__).parent.parent / "tests" / "test_data")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    run(args.fixtures, args.repeat)
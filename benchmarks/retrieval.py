@@ -0,0 +1,146 @@
+"""
+Compares dense, BM25 and hybrid (reciprocal rank fusion) retrieval on the fixture corpus.
+
+The fixture pages are chunked, '--distractors' extra chunks of shuffled corpus words are added
+to grow the index, and two query sets are generated from the real chunks:
+
+    exact     a rare term of a chunk (a code, number or long word found in no other chunk)
+    passage   a sentence of a chunk with a third of its words dropped
+
+A query is a hit when the chunk it was generated from is in the top k. Reports recall@k per
+query set and mode, and the search latency per query, the query embedding excluded.
+
+usage:
+    python -m benchmarks.retrieval [--fixtures tests/test_data] [--k 5] [--distractors 5000] [--hash-embeddings]
+
+'--hash-embeddings' replaces the embedding model with hashed character trigrams, so the benchmark
+also runs offline. Those are no semantic embeddings, dense numbers are only meaningful with the model.
+"""
+import argparse
+import random
+import re
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from crawler.article_crawler.extractors import extract_text
+from src import config
+from src.processing.text_processor import Document, iter_chunks
+from src.rag_core.sparse_index import tokenize
+from src.rag_core.vector_index import VectorIndex
+
+
+HASH_DIMENSION = 384
+
+
+def hash_embed(texts: List[str]) -> np.ndarray:
+    vectors = np.zeros((len(texts), HASH_DIMENSION), dtype=np.float32)
+    for row, text in enumerate(texts):
+        text = f"  {text.lower()}  "
+        for i in range(len(text) - 2):
+            vectors[row, zlib.crc32(text[i:i + 3].encode("utf-8")) % HASH_DIMENSION] += 1.0
+    return vectors
+
+
+def load_embeddings(use_hash: bool) -> Callable[[List[str]], List[List[float]]]:
+    if use_hash:
+        return hash_embed
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    model = HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL_ID, cache_folder=str(config.HF_HOME))
+    return model.embed_documents
+
+
+def build_corpus(fixtures_dir: Path, num_distractors: int, rng: random.Random) -> List[Document]:
+    pages = {path.name: extract_text(path.read_bytes()) for path in sorted(fixtures_dir.glob("*.html"))}
+    if not pages:
+        raise SystemExit(f"No .html fixtures found in {fixtures_dir}")
+
+    documents = list(iter_chunks(pages))
+
+    # Distractors only use words found in several chunks, so the rare terms of the exact queries stay rare.
+    document_frequency = Counter(term for doc in documents for term in set(tokenize(doc.page_content)))
+    words = [word for word in " ".join(pages.values()).split() if all(document_frequency[term] > 2 for term in tokenize(word))]
+    for i in range(num_distractors):
+        documents.append(Document(
+            page_content=" ".join(rng.choices(words, k=150)),
+            metadata={"source_url": f"distractor-{i // 10}", "chunk_index": i % 10}
+        ))
+    return documents
+
+
+def build_queries(documents: List[Document], rng: random.Random) -> Dict[str, List[Tuple[str, int]]]:
+    real = [row for row, doc in enumerate(documents) if not doc.metadata["source_url"].startswith("distractor")]
+    document_frequency = Counter(term for doc in documents for term in set(tokenize(doc.page_content)))
+
+    exact, passage = [], []
+    for row in real:
+        text = documents[row].page_content
+        rare = [
+            term for term in dict.fromkeys(tokenize(text))
+            if document_frequency[term] == 1 and (re.search(r"\d", term) or len(term) >= 8)
+        ]
+        if rare:
+            exact.append((f"what is {rng.choice(rare)}", row))
+
+        sentences = [sentence for sentence in re.split(r"(?<=[.!?])\s+", text) if len(sentence.split()) >= 8]
+        if sentences:
+            words = rng.choice(sentences).split()
+            passage.append((" ".join(word for word in words if rng.random() > 0.33), row))
+
+    return {"exact": exact, "passage": passage}
+
+
+def run(fixtures_dir: Path, k: int, num_distractors: int, use_hash: bool):
+    rng = random.Random(0)
+    embed_fn = load_embeddings(use_hash)
+    documents = build_corpus(fixtures_dir, num_distractors, rng)
+    queries = build_queries(documents, rng)
+
+    index = VectorIndex()
+    started_at = time.perf_counter()
+    index.upsert(documents, embed_fn, batch_size=256)
+    print(f"Indexed {len(index)} chunks ({len(index) - num_distractors} real) in {time.perf_counter() - started_at:.1f}s")
+
+    started_at = time.perf_counter()
+    index.sparse_index
+    print(f"Built the BM25 index in {time.perf_counter() - started_at:.2f}s\n")
+
+    row_of = {(doc.metadata["source_url"], doc.page_content): row for row, doc in enumerate(documents)}
+    modes = {
+        "dense": lambda vector, query: index.search(vector, k),
+        "sparse": lambda vector, query: index.keyword_search(query, k),
+        "hybrid": lambda vector, query: index.hybrid_search(vector, query, k, config.HYBRID_NUM_CANDIDATES, config.RRF_K),
+    }
+
+    print(f"{'mode':<8}" + "".join(f"{name + f' R@{k}':>16}" for name in queries) + f"{'ms/query':>10}{'p95 ms':>9}")
+    for mode, search in modes.items():
+        recalls, latencies = [], []
+        for name, query_set in queries.items():
+            vectors = embed_fn([query for query, _ in query_set])
+            hits = 0
+            for (query, row), vector in zip(query_set, vectors):
+                started_at = time.perf_counter()
+                results = search(vector, query)
+                latencies.append(time.perf_counter() - started_at)
+                hits += row in {row_of[(doc.metadata["source_url"], doc.page_content)] for doc, _ in results}
+            recalls.append(f"{hits / max(len(query_set), 1):.2f} ({hits}/{len(query_set)})")
+
+        print(
+            f"{mode:<8}" + "".join(f"{recall:>16}" for recall in recalls)
+            + f"{np.mean(latencies) * 1000:>10.2f}{np.percentile(latencies, 95) * 1000:>9.2f}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=Path(__file__).parent.parent / "tests" / "test_data")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--distractors", type=int, default=5000)
+    parser.add_argument("--hash-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    run(args.fixtures, args.k, args.distractors, args.hash_embeddings)
@@ -0,0 +1,258 @@
+import logging
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+
+logger = logging.getLogger(__name__)
+
+# Elements whose text never belongs to the article.
+STRIPPED_TAGS = frozenset(['nav', 'footer', 'header', 'script', 'style', 'aside', 'form'])
+
+DEFAULT_EXTRACTOR = "lxml"
+
+# class/id hints used by the main-content scoring, in the spirit of Readability.
+BOILERPLATE_HINTS = re.compile(
+    r"cookie|consent|banner|comment|related|share|social|newsletter|subscribe|signup|sidebar|promo|sponsor"
+    r"|advert|\bads?\b|ad-|popup|modal|breadcrumb|menu|masthead|widget|recommend|prevnext|pagination|topbar|toc\b",
+    re.IGNORECASE
+)
+CONTENT_HINTS = re.compile(r"article|content|entry|main|post|story|text|blog|body", re.IGNORECASE)
+
+# Tags whose text is scored as a paragraph, and how much a tag is worth as a container on its own.
+SCORED_TAGS = ("p", "pre", "td", "blockquote", "dd")
+TAG_WEIGHTS = {
+    "article": 25, "main": 25, "div": 5, "section": 3, "pre": 3, "td": 3, "blockquote": 3,
+    "ol": -3, "ul": -3, "dl": -3, "dd": -3, "dt": -3, "li": -3, "h1": -5, "h2": -5, "h3": -5, "th": -5,
+}
+
+
+def extract_text_bs4(body: bytes, encoding: Optional[str] = None) -> str:
+    """
+    Builds a full BeautifulSoup tree, decomposes the stripped tags and returns the text of <body>.
+    Slow on large documents, but it is pure Python and handles anything thrown at it.
+    """
+    soup = BeautifulSoup(body, "html.parser", from_encoding=encoding)
+
+    for tag in soup(list(STRIPPED_TAGS)):
+        tag.decompose()
+
+    return soup.body.get_text(separator=' ', strip=True) if soup.body else ""
+
+
+class _BodyTextTarget:
+    """
+    lxml parser target that collects the text of <body> while parsing, no tree is ever built.
+
+    Text inside a stripped tag is skipped by counting how deep the parser is inside it, text
+    nodes are stripped and joined with single spaces like 'get_text(separator=' ', strip=True)'.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.buffer: List[str] = []
+        self.in_body = False
+        self.skip_depth = 0
+
+    def _flush(self):
+        if self.buffer:
+            text = "".join(self.buffer).strip()
+            if text:
+                self.parts.append(text)
+            self.buffer = []
+
+    def start(self, tag, attrib):
+        self._flush()
+        if self.skip_depth or tag in STRIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag == "body":
+            self.in_body = True
+
+    def end(self, tag):
+        self._flush()
+        if self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, data):
+        if self.in_body and not self.skip_depth:
+            self.buffer.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self) -> str:
+        self._flush()
+        return " ".join(self.parts)
+
+
+def extract_text_lxml(body: bytes, encoding: Optional[str] = None) -> str:
+    """
+    Streams the document through libxml2's HTML parser and drops the stripped tags while parsing.
+    """
+    parser = etree.HTMLParser(target=_BodyTextTarget(), encoding=encoding)
+    parser.feed(body)
+    return parser.close()
+
+
+def _text_of(element) -> str:
+    return " ".join(text.strip() for text in element.itertext() if text.strip())
+
+
+def _hints_of(element) -> str:
+    return f"{element.get('class', '')} {element.get('id', '')} {element.get('role', '')}"
+
+
+def _link_density(element, text_length: int) -> float:
+    if not text_length:
+        return 0.0
+    return sum(len(_text_of(link)) for link in element.iter("a")) / text_length
+
+
+def _drop(element):
+    """Removes an element but keeps its tail text, which belongs to the parent."""
+    parent = element.getparent()
+    if parent is None:
+        return
+
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + element.tail
+        else:
+            parent.text = (parent.text or "") + element.tail
+    parent.remove(element)
+
+
+def _class_weight(element) -> int:
+    hints = _hints_of(element)
+    return 25 * bool(CONTENT_HINTS.search(hints)) - 25 * bool(BOILERPLATE_HINTS.search(hints))
+
+
+def _main_content(body: bytes, encoding: Optional[str] = None) -> Tuple[str, int]:
+    """
+    Readability-style main-content extraction.
+
+    Containers are scored by the paragraphs directly below them (commas and length count for,
+    boilerplate class/id hints and link density against) and only the best container, plus the
+    siblings that score close to it, is kept. Cookie banners, comment threads and related-article
+    lists are dropped up front by their class/id.
+
+    Returns:
+        The main-content text and the length of the full body text it was cut from.
+    """
+    tree = etree.HTML(body, parser=etree.HTMLParser(encoding=encoding, remove_comments=True))
+    document = tree.find("body") if tree is not None else None
+    if document is None:
+        return "", 0
+
+    etree.strip_elements(document, *STRIPPED_TAGS, with_tail=False)
+    full_text = _text_of(document)
+
+    for element in list(document.iter(etree.Element)):
+        if element.tag in ("body", "article", "main"):
+            continue
+        hints = _hints_of(element)
+        if BOILERPLATE_HINTS.search(hints) and not CONTENT_HINTS.search(hints):
+            _drop(element)
+
+    scores: Dict = {}
+
+    def initial_score(element) -> float:
+        return TAG_WEIGHTS.get(element.tag, 0) + _class_weight(element)
+
+    for paragraph in document.iter(*SCORED_TAGS):
+        text = _text_of(paragraph)
+        if len(text) < 25:
+            continue
+
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        for ancestor, share in ((paragraph.getparent(), 1.0), (paragraph.getparent().getparent(), 0.5)):
+            if ancestor is None or ancestor is tree:
+                continue
+            if ancestor not in scores:
+                scores[ancestor] = initial_score(ancestor)
+            scores[ancestor] += score * share
+
+    if not scores:
+        return full_text, len(full_text)
+
+    for element in scores:
+        scores[element] *= 1 - _link_density(element, len(_text_of(element)))
+
+    top = max(scores, key=scores.get)
+    parent = top.getparent()
+    if parent is None or top is document:
+        main_text = _text_of(top)
+        return main_text or full_text, len(full_text)
+
+    threshold = max(10.0, scores[top] * 0.2)
+    parts = []
+    for sibling in parent:
+        if not isinstance(sibling.tag, str):
+            continue
+
+        text = _text_of(sibling)
+        keep = sibling is top or scores.get(sibling, 0) >= threshold
+        if not keep and sibling.tag == "p" and len(text) > 80:
+            keep = _link_density(sibling, len(text)) < 0.25
+        if keep and text:
+            parts.append(text)
+
+    main_text = " ".join(parts)
+    return main_text or full_text, len(full_text)
+
+
+def extract_text_main_content(body: bytes, encoding: Optional[str] = None) -> str:
+    """
+    Keeps only the article body, see '_main_content'.
+    """
+    return _main_content(body, encoding)[0]
+
+
+EXTRACTORS: Dict[str, Callable[[bytes, Optional[str]], str]] = {
+    "lxml": extract_text_lxml,
+    "bs4": extract_text_bs4,
+    "main_content": extract_text_main_content,
+}
+
+
+def extract_page(body: bytes, encoding: Optional[str] = None, extractor: str = DEFAULT_EXTRACTOR) -> Tuple[str, int]:
+    """
+    Extracts the cleaned text of an HTML page with the named extractor.
+    Any failure of a faster extractor falls back to BeautifulSoup.
+
+    Args:
+        body: the raw HTML.
+        encoding: the response encoding, detected from the document when None.
+        extractor: one of 'EXTRACTORS'.
+
+    Returns:
+        The text of <body> without navigation, scripts and other boilerplate tags, and the
+        length of the full body text. The two only differ for the 'main_content' extractor.
+    """
+    if extractor not in EXTRACTORS:
+        raise ValueError(f"Unknown text extractor '{extractor}', expected one of {list(EXTRACTORS)}.")
+
+    if extractor == "bs4" or not body:
+        text = extract_text_bs4(body, encoding)
+        return text, len(text)
+
+    try:
+        if extractor == "main_content":
+            return _main_content(body, encoding)
+
+        text = EXTRACTORS[extractor](body, encoding)
+    except Exception as e:
+        logger.warning(f"'{extractor}' text extractor failed, falling back to BeautifulSoup. Error: {e}")
+        text = extract_text_bs4(body, encoding)
+
+    return text, len(text)
+
+
+def extract_text(body: bytes, encoding: Optional[str] = None, extractor: str = DEFAULT_EXTRACTOR) -> str:
+    """
+    Like 'extract_page', without the full text length.
+    """
+    return extract_page(body, encoding, extractor)[0]
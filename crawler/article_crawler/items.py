@@ -9,3 +9,4 @@ import scrapy
 class ArticleCrawlerItem(scrapy.Item):
     url = scrapy.Field()
     cleaned_text = scrapy.Field()
+    full_text_length = scrapy.Field()
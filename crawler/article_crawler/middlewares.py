@@ -4,10 +4,14 @@
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import HtmlResponse
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from crawler.article_crawler.page_cache import get_page_cache
+
 
 class ArticleCrawlerSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -98,3 +102,108 @@ class ArticleCrawlerDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class ScrapeBudgetDownloaderMiddleware(ArticleCrawlerDownloaderMiddleware):
+    """
+    Enforces the budget of the scrape batch a request belongs to ('request.meta["scrape_batch"]',
+    set by the scraping engine): requests of a batch that already resolved are dropped before they
+    hit the network, and the download timeout of the rest is capped to the time left before the
+    batch deadline, so in-flight pages are cancelled with it.
+    """
+
+    def process_request(self, request, spider):
+        batch = request.meta.get("scrape_batch")
+        if batch is None:
+            return None
+
+        if batch.done:
+            raise IgnoreRequest(f"Scrape batch already finished ({batch.stop_reason}), skipping {request.url}")
+
+        remaining = batch.remaining_time
+        if remaining is not None:
+            request.meta["download_timeout"] = min(request.meta.get("download_timeout", remaining), max(remaining, 0.1))
+
+        return None
+
+
+class PageCacheDownloaderMiddleware(ArticleCrawlerDownloaderMiddleware):
+    """
+    Serves pages from the page cache instead of the network.
+
+    Fresh entries are answered without any download, stale entries that carry an ETag or
+    Last-Modified are revalidated with a conditional request and a 304 is served from the cache.
+    Every other page is downloaded and its cleaned text stored once the spider scraped it.
+    """
+
+    def __init__(self, page_cache):
+        self.page_cache = page_cache
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        page_cache = get_page_cache(crawler.settings)
+        if page_cache is None:
+            raise NotConfigured("PAGE_CACHE_ENABLED is False")
+
+        s = cls(page_cache)
+        s.stats = crawler.stats
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.item_scraped, signal=signals.item_scraped)
+        return s
+
+    def process_request(self, request, spider):
+        if "page_cache" in request.meta:
+            return None
+
+        entry = self.page_cache.get(request.url)
+        if entry is None:
+            request.meta["page_cache"] = "miss"
+            return None
+
+        if entry.is_fresh(self.page_cache.ttl):
+            request.meta["page_cache"] = "fresh"
+            request.meta["page_cache_text"] = entry.cleaned_text
+            request.meta["page_cache_bytes_saved"] = entry.content_length
+            self.stats.inc_value("page_cache/fresh")
+            return HtmlResponse(url=entry.final_url, status=200, body=b"", request=request, flags=["page_cache"])
+
+        if entry.can_revalidate:
+            request.meta["page_cache"] = "revalidating"
+            if entry.etag:
+                request.headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request.headers["If-Modified-Since"] = entry.last_modified
+        else:
+            request.meta["page_cache"] = "miss"
+
+        return None
+
+    def process_response(self, request, response, spider):
+        if request.meta.get("page_cache") == "revalidating" and response.status == 304:
+            entry = self.page_cache.get(request.url)
+            if entry is not None:
+                self.page_cache.touch(request.url)
+                request.meta["page_cache"] = "revalidated"
+                request.meta["page_cache_text"] = entry.cleaned_text
+                request.meta["page_cache_bytes_saved"] = entry.content_length
+                self.stats.inc_value("page_cache/revalidated")
+                return HtmlResponse(url=entry.final_url, status=200, body=b"", request=request, flags=["page_cache"])
+
+        if request.meta.get("page_cache") in ("miss", "revalidating"):
+            request.meta["page_cache"] = "miss"
+            self.stats.inc_value("page_cache/miss")
+
+        return response
+
+    def item_scraped(self, item, response, spider):
+        if response.meta.get("page_cache") != "miss" or not item.get("cleaned_text"):
+            return
+
+        self.page_cache.store(
+            url=response.meta.get("redirect_urls", [response.url])[0],
+            final_url=item["url"],
+            cleaned_text=item["cleaned_text"],
+            etag=response.headers.get("ETag", b"").decode("latin-1") or None,
+            last_modified=response.headers.get("Last-Modified", b"").decode("latin-1") or None,
+            content_length=len(response.body),
+        )
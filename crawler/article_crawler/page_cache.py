@@ -0,0 +1,99 @@
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_CACHE_PATH = "page_cache.sqlite3"
+DEFAULT_PAGE_CACHE_TTL = 3600
+
+
+@dataclass
+class PageCacheEntry:
+    """The cleaned text of a previously scraped page and the validators needed to revalidate it."""
+    url: str
+    final_url: str
+    cleaned_text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_length: int
+    fetched_at: float
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.fetched_at < ttl
+
+    @property
+    def can_revalidate(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class PageCache:
+    """
+    A SQLite store of cleaned page text keyed by the requested URL.
+    Shared by the crawler's downloader middleware and the 'scrape_urls' fast path.
+    """
+
+    def __init__(self, path: str, ttl: float = DEFAULT_PAGE_CACHE_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, final_url TEXT NOT NULL, cleaned_text TEXT NOT NULL, etag TEXT, "
+            "last_modified TEXT, content_length INTEGER NOT NULL, fetched_at REAL NOT NULL)"
+        )
+
+    def get(self, url: str) -> Optional[PageCacheEntry]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, final_url, cleaned_text, etag, last_modified, content_length, fetched_at FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+        return PageCacheEntry(*row) if row else None
+
+    def get_fresh(self, url: str) -> Optional[PageCacheEntry]:
+        entry = self.get(url)
+        return entry if entry is not None and entry.is_fresh(self.ttl) else None
+
+    def store(self, url: str, final_url: str, cleaned_text: str, etag: Optional[str] = None,
+              last_modified: Optional[str] = None, content_length: int = 0):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, final_url, cleaned_text, etag, last_modified, content_length, time.time())
+            )
+
+    def touch(self, url: str):
+        """Marks an entry as fresh again after a successful revalidation."""
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+
+_PAGE_CACHES: Dict[str, PageCache] = {}
+_PAGE_CACHES_LOCK = threading.Lock()
+
+
+def get_page_cache(settings) -> Optional[PageCache]:
+    """
+    Returns the page cache configured by the Scrapy settings, or None when it is disabled.
+    Caches are shared per path so the middleware and 'scrape_urls' see the same entries.
+    """
+    if not settings.getbool("PAGE_CACHE_ENABLED", True):
+        return None
+
+    path = settings.get("PAGE_CACHE_PATH", DEFAULT_PAGE_CACHE_PATH)
+
+    with _PAGE_CACHES_LOCK:
+        if path not in _PAGE_CACHES:
+            _PAGE_CACHES[path] = PageCache(path, ttl=settings.getfloat("PAGE_CACHE_TTL", DEFAULT_PAGE_CACHE_TTL))
+
+    return _PAGE_CACHES[path]
@@ -31,6 +31,24 @@ DOWNLOAD_HANDLERS = {
     "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
 }
 
+# Download pages over plain HTTP first and only re-fetch them with Playwright when the
+# extracted text is shorter than this many characters or the page needs JavaScript to render.
+PLAYWRIGHT_FAST_PATH_ENABLED = True
+PLAYWRIGHT_FALLBACK_MIN_TEXT_LENGTH = 500
+
+# How the text of a page is extracted, one of crawler.article_crawler.extractors.EXTRACTORS.
+# "lxml" strips boilerplate tags while streaming the page through libxml2, "bs4" builds a
+# full BeautifulSoup tree, "main_content" keeps only the article body (no cookie banners,
+# comment threads or related-article lists). Failures always fall back to BeautifulSoup.
+TEXT_EXTRACTOR = "lxml"
+
+# Worker processes ContentSpider parses large pages in, so parsing does not block downloads on the
+# reactor thread. None starts 2 (none on single-core machines), 0 parses on the reactor thread.
+# The pool is only started by the first page of at least PARSE_OFFLOAD_MIN_BYTES, smaller pages
+# always parse on the reactor thread, where they take less than the pickling round trip.
+PARSE_PROCESS_POOL_SIZE = None
+PARSE_OFFLOAD_MIN_BYTES = 262144
+
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 
 LOG_LEVEL = 'WARNING'
@@ -55,9 +73,16 @@ LOG_LEVEL = 'WARNING'
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "article_crawler.middlewares.ArticleCrawlerDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "crawler.article_crawler.middlewares.ScrapeBudgetDownloaderMiddleware": 100,
+    "crawler.article_crawler.middlewares.PageCacheDownloaderMiddleware": 543,
+}
+
+# Scraped-page cache: cleaned text is reused for PAGE_CACHE_TTL seconds, then
+# revalidated with If-None-Match / If-Modified-Since when the server sent validators.
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_PATH = "page_cache.sqlite3"
+PAGE_CACHE_TTL = 3600
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
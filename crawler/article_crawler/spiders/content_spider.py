@@ -1,22 +1,168 @@
 import scrapy
-from bs4 import BeautifulSoup
+from scrapy.exceptions import CloseSpider
+from crawler.article_crawler.extractors import DEFAULT_EXTRACTOR, extract_page
 from crawler.article_crawler.items import ArticleCrawlerItem
 
+import asyncio
 import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 
 logger = logging.getLogger(__name__)
 
+# Markup that only turns into content once JavaScript runs: an empty single-page-app mount
+# point, or a <noscript> notice asking the reader to enable JavaScript.
+JS_RENDERING_MARKERS = re.compile(
+    rb"""<div[^>]+id=["'](?:root|app|__next|__nuxt|svelte)["'][^>]*>\s*</div>"""
+    rb"|<noscript[^>]*>[^<]*(?:enable|requires?|turn on)[^<]*javascript",
+    re.IGNORECASE
+)
+
 
 class ContentSpider(scrapy.Spider):
+    """
+    Fetches pages and extracts their cleaned text.
+
+    Pages are first downloaded over plain HTTP, and only re-fetched through Playwright when the
+    extracted text is shorter than 'PLAYWRIGHT_FALLBACK_MIN_TEXT_LENGTH' characters or the markup
+    shows JS-rendering markers. Setting 'PLAYWRIGHT_FAST_PATH_ENABLED' to False sends every request
+    through the browser. The split is counted in the 'fetch/*' crawler stats.
+
+    Standalone crawls accept two optional spider arguments, e.g. '-a deadline=20 -a max_pages=3':
+    'deadline' closes the spider after that many seconds and 'max_pages' once that many pages with
+    text were scraped. Either way outstanding requests are cancelled and the items collected so far
+    are kept. The long-lived spider behind 'ScrapingEngine' leaves both unset and applies them per batch.
+
+    When crawled, pages of at least 'PARSE_OFFLOAD_MIN_BYTES' are parsed in a process pool of
+    'PARSE_PROCESS_POOL_SIZE' workers (2 when unset on multi-core machines, 0 parses everything on
+    the reactor thread), so CPU work on large pages overlaps the network I/O. The pool is started
+    by the first such page, and pages are parsed on the reactor thread until its workers are up.
+    """
+
     name = "content_spider"
 
+    fast_path_enabled = True
+    fallback_min_text_length = 500
+    text_extractor = DEFAULT_EXTRACTOR
+    parse_pool_size = 0
+    parse_offload_min_bytes = 256 * 1024
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.fast_path_enabled = crawler.settings.getbool("PLAYWRIGHT_FAST_PATH_ENABLED", cls.fast_path_enabled)
+        spider.fallback_min_text_length = crawler.settings.getint("PLAYWRIGHT_FALLBACK_MIN_TEXT_LENGTH", cls.fallback_min_text_length)
+        spider.text_extractor = crawler.settings.get("TEXT_EXTRACTOR", cls.text_extractor)
+
+        spider.parse_offload_min_bytes = crawler.settings.getint("PARSE_OFFLOAD_MIN_BYTES", cls.parse_offload_min_bytes)
+
+        pool_size = crawler.settings.get("PARSE_PROCESS_POOL_SIZE")
+        if pool_size is None:
+            # A single core gains nothing from a pool, the pickling round trip only adds latency.
+            pool_size = 2 if (os.cpu_count() or 1) > 1 else 0
+        spider.parse_pool_size = int(pool_size)
+        return spider
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deadline = float(getattr(self, "deadline", 0) or 0) or None
+        self.max_pages = int(getattr(self, "max_pages", 0) or 0) or None
+        self.pages_scraped = 0
+        self._deadline_call = None
+        self._parse_pool = None
+        self._parse_pool_warmup = []
+
+    def open_parse_pool(self, max_workers):
+        """
+        Starts the process pool pages are parsed in, 0 keeps parsing on the reactor thread.
+
+        Workers are spawned rather than forked, the crawling process runs the reactor and model threads.
+        A spawned worker imports the parent's '__main__' (with the app, the models' libraries) before
+        its first task, which takes seconds, so one no-op task per worker is submitted to start them all.
+
+        Returns:
+            The futures of those no-op tasks, the pool is used once all of them are done.
+        """
+        if not max_workers:
+            return []
+
+        self._parse_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._parse_pool_warmup = [self._parse_pool.submit(os.getpid) for _ in range(max_workers)]
+        logger.info(f"Parsing pages of at least {self.parse_offload_min_bytes} bytes in a pool of {max_workers} processes.")
+        return self._parse_pool_warmup
+
     async def start(self):
         
         urls = getattr(self, "urls", [])
 
+        if self.deadline is not None:
+            from twisted.internet import reactor
+            self._deadline_call = reactor.callLater(self.deadline, self._close_at_deadline)
+
         for url in urls:
-            yield scrapy.Request(url, callback=self.parse, errback=self.handle_error, meta={"playwright" : True})
+            yield self.build_request(url)
+
+    def _close_at_deadline(self):
+        logger.warning(f"Deadline of {self.deadline}s reached after {self.pages_scraped} pages, closing spider.")
+        self.crawler.engine.close_spider(self, reason="deadline")
+
+    def closed(self, reason):
+        if self._deadline_call is not None and self._deadline_call.active():
+            self._deadline_call.cancel()
+
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
+
+    def _count_page(self, item):
+        if not item['cleaned_text']:
+            return
+
+        self.pages_scraped += 1
+        if self.max_pages is not None and self.pages_scraped >= self.max_pages:
+            raise CloseSpider(reason="max_pages")
+
+    def _inc_stat(self, key):
+        crawler = getattr(self, "crawler", None)
+        if crawler is not None:
+            crawler.stats.inc_value(key)
+
+    def _browser_fallback_reason(self, response, text_length):
+        """
+        Returns why a page downloaded over plain HTTP has to be re-fetched with Playwright, or None.
+        """
+        if not self.fast_path_enabled or response.meta.get("playwright"):
+            return None
+
+        if JS_RENDERING_MARKERS.search(response.body):
+            return "js_markers"
+
+        if text_length < self.fallback_min_text_length:
+            return "short_text"
+
+        return None
+
+    def build_request(self, url, meta=None, **kwargs):
+        """
+        Builds the request used to fetch and parse a single URL.
+
+        Args:
+            url: the url to fetch.
+            meta: extra request meta merged over the spider defaults.
+            kwargs: extra keyword arguments passed to 'scrapy.Request'.
+        """
+
+        return scrapy.Request(
+            url,
+            callback=self.parse,
+            errback=self.handle_error,
+            meta={"playwright" : not self.fast_path_enabled, **(meta or {})},
+            **kwargs
+        )
 
     def handle_error(self, failure):
         """
@@ -34,20 +180,94 @@ class ContentSpider(scrapy.Spider):
     def parse(self, response):
         """
         This method is only called for SUCCESSFUL requests.
+
+        Without a parse pool the page is parsed right here and a generator is returned, with one
+        an async generator that awaits the extraction in a worker process is returned instead,
+        so the reactor keeps downloading while the page is parsed.
         """
 
+        if response.meta.get("page_cache_text") is None and self._offload_parse(response):
+            return self._parse_in_pool(response)
+
+        return self._parse_inline(response)
+
+    def _offload_parse(self, response):
+        """
+        Whether the page is parsed in the parse pool. Only pages of at least 'parse_offload_min_bytes' are,
+        the first one starts the pool, and until its workers are up they are parsed on the reactor thread.
+        """
+        if len(response.body) < self.parse_offload_min_bytes:
+            return False
+
+        if self._parse_pool is None:
+            self.open_parse_pool(self.parse_pool_size)
+            if self._parse_pool is None:
+                return False
+
+        return all(future.done() for future in self._parse_pool_warmup)
+
+    def _parse_inline(self, response):
+        cached_text = response.meta.get("page_cache_text")
+        if cached_text is not None:
+            logger.info(f"Serving URL from the page cache: {response.url}")
+
+            yield from self._emit(response, cached_text, from_cache=True)
+            return
+
         logger.info(f"Successfully fetched and parsing URL: {response.url}")
 
-        soup = BeautifulSoup(response.body, "html.parser")
+        cleaned_text, full_text_length = extract_page(response.body, getattr(response, "encoding", None), extractor=self.text_extractor)
+
+        yield from self._emit(response, cleaned_text, full_text_length)
 
-        for tag in soup(['nav', 'footer', 'header', 'script', 'style', 'aside', 'form']):
-            tag.decompose()
+    async def _parse_in_pool(self, response):
+        logger.info(f"Successfully fetched URL, parsing in the parse pool: {response.url}")
 
-        cleaned_text = soup.body.get_text(separator=' ', strip=True) if soup.body else ""
+        encoding = getattr(response, "encoding", None)
+        try:
+            cleaned_text, full_text_length = await asyncio.get_running_loop().run_in_executor(
+                self._parse_pool, extract_page, response.body, encoding, self.text_extractor
+            )
+        except BrokenProcessPool as e:
+            if self._parse_pool is not None:
+                logger.warning(f"Parse pool is broken, parsing on the reactor thread from now on. Error: {e}")
+                self._parse_pool.shutdown(wait=False, cancel_futures=True)
+                self._parse_pool = None
+                self.parse_pool_size = 0
+            cleaned_text, full_text_length = extract_page(response.body, encoding, extractor=self.text_extractor)
+
+        for result in self._emit(response, cleaned_text, full_text_length):
+            yield result
+
+    def _emit(self, response, cleaned_text, full_text_length=None, from_cache=False):
+        """
+        Yields the item for a parsed page, or the Playwright re-fetch when the plain HTTP download was not enough.
+        """
+
+        if not from_cache:
+            fallback_reason = self._browser_fallback_reason(
+                response, len(cleaned_text) if full_text_length is None else full_text_length
+            )
+            if fallback_reason is not None:
+                logger.info(f"Re-fetching URL with Playwright ({fallback_reason}): {response.url}")
+                self._inc_stat(f"fetch/browser_fallback/{fallback_reason}")
+
+                yield response.request.replace(
+                    meta={**response.request.meta, "playwright": True, "fetch_fallback": fallback_reason},
+                    dont_filter=True
+                )
+                return
+
+            self._inc_stat("fetch/browser" if response.meta.get("playwright") else "fetch/http")
+
+            if full_text_length is not None and full_text_length != len(cleaned_text):
+                logger.info(f"Kept {len(cleaned_text)} of {full_text_length} characters of main content: {response.url}")
 
         item = ArticleCrawlerItem()
         item['url'] = response.url
         item['cleaned_text'] = cleaned_text
+        if full_text_length is not None:
+            item['full_text_length'] = full_text_length
 
         yield item
-
+        self._count_page(item)
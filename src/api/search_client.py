@@ -1,5 +1,10 @@
 import requests
-from typing import List, Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
 from src import config
 
 import logging
@@ -9,24 +14,92 @@ logger = logging.getLogger(__name__)
 
 SERPAPI_ENDPOINT = "https://serpapi.com/search"
 
-def get_search_results(query: str, num_results: int = 5) -> List[Dict[str, Any]]:
+_session: Optional[requests.Session] = None
+_cache: "OrderedDict[Tuple[str, int], Tuple[float, List[str]]]" = OrderedDict()
+_in_flight: Dict[Tuple[str, int], Future] = {}
+_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """
+    Returns the shared SerpApi session, so connections (and their TLS handshakes) are reused across queries.
+    """
+    global _session
+
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=config.SEARCH_POOL_SIZE))
+            _session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=config.SEARCH_POOL_SIZE))
+
+    return _session
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def clear_search_cache():
+    """Drops every cached search result."""
+    with _lock:
+        _cache.clear()
+
+
+def get_search_results(query: str, num_results: int = 5) -> List[str]:
     """
     Fetches search results from SerpApi for a given query.
 
+    Results are cached for 'config.SEARCH_CACHE_TTL' seconds by normalized query and
+    'num_results', and concurrent calls for the same query share a single upstream request.
+
     Args:
         query: The search term.
         num_results: The number of results to return.
 
     Returns:
-        A list of dictionaries, where each dictionary represents a search result
-        containing keys like 'position', 'title', 'link', and 'snippet'.
+        A list of the result links, in SerpApi's ranking order.
         Returns an empty list if the request fails or no results are found.
-     posizione | titolo | link | snippet
     """
     if not query:
         logger.warning("No Query was passed... Returning empty results list.")
         return []
 
+    key = (_normalize_query(query), num_results)
+
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            _cache.move_to_end(key)
+            logger.info(f"Serving search results for query: '{query}' from cache.")
+            return list(cached[1])
+
+        future = _in_flight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _in_flight[key] = future
+
+    if not is_leader:
+        logger.info(f"Waiting on in-flight search request for query: '{query}'...")
+        return list(future.result())
+
+    results = []
+    try:
+        results = _fetch_search_results(query, num_results)
+    finally:
+        with _lock:
+            if results:
+                _cache[key] = (time.monotonic() + config.SEARCH_CACHE_TTL, results)
+                _cache.move_to_end(key)
+                while len(_cache) > config.SEARCH_CACHE_SIZE:
+                    _cache.popitem(last=False)
+            del _in_flight[key]
+        future.set_result(results)
+
+    return list(results)
+
+
+def _fetch_search_results(query: str, num_results: int) -> List[str]:
     logger.info(f"Fetching search results for query: '{query}'...")
 
     params = {
@@ -37,18 +110,18 @@ def get_search_results(query: str, num_results: int = 5) -> List[Dict[str, Any]]
     }
 
     try:
-        response = requests.get(SERPAPI_ENDPOINT, params=params, timeout=10)
-        
+        response = _get_session().get(SERPAPI_ENDPOINT, params=params, timeout=10)
+
         response.raise_for_status()
 
         data = response.json()
 
         organic_results = data.get("organic_results", [])
-        
+
         if not organic_results:
             logger.warning("No organic results found in API response.")
             return []
-        
+
         scraped_urls = [result.get("link") for result in organic_results]
 
         logger.info(f"Successfully fetched {len(scraped_urls)} results.")
@@ -59,4 +132,4 @@ def get_search_results(query: str, num_results: int = 5) -> List[Dict[str, Any]]
         return []
     except Exception as e:
         logger.error(f"An unexpected error occurred during search API call: {e}")
-        return []
\ No newline at end of file
+        return []
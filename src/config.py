@@ -18,14 +18,130 @@ DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
 
 MODEL_ID = 'deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B'
 
+# 'auto' picks 'bnb-4bit' on cuda and 'int8-dynamic' on cpu, see 'src.rag_core.generator.GENERATOR_BACKENDS'.
+GENERATOR_BACKEND = 'auto'
+
 EMBEDDING_MODEL_ID = 'all-MiniLM-L6-v2'
 
 CHUNK_SIZE = 1000
 
 CHUNK_OVERLAP = 200
 
+# 'characters' splits every CHUNK_SIZE characters, 'tokens' by the embedding model's tokenizer into
+# chunks of at most CHUNK_TOKEN_SIZE tokens (its input window, special tokens included).
+CHUNKING_MODE = 'characters'
+
+CHUNK_TOKEN_SIZE = 256
+
+CHUNK_TOKEN_OVERLAP = 32
+
+CHUNK_SPAN_CACHE_SIZE = 1024
+
 NUM_RETRIEVED_DOCS = 5
 
+# Retrieval only searches the pages scraped for the current query, True searches every page the persistent index holds.
+RETRIEVE_FROM_ALL_SOURCES = False
+
+# 'dense' (embeddings only), 'sparse' (BM25 only) or 'hybrid' (both, fused with reciprocal rank fusion).
+RETRIEVAL_MODE = 'dense'
+
+HYBRID_NUM_CANDIDATES = 20
+
+RRF_K = 60
+
+# Re-scores a pool of RERANK_POOL_SIZE retrieved chunks with a cross-encoder and keeps the best NUM_RETRIEVED_DOCS.
+RERANK_ENABLED = False
+
+RERANKER_MODEL_ID = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+
+RERANK_POOL_SIZE = 20
+
+RERANK_BATCH_SIZE = 16
+
+# Stop scoring further batches once this much time is spent, 0 scores the whole pool.
+RERANK_BUDGET_MS = 200
+
+# Picks the NUM_RETRIEVED_DOCS context chunks out of MMR_POOL_SIZE candidates by maximal marginal relevance,
+# at most MAX_CHUNKS_PER_SOURCE per source URL. MMR_LAMBDA 1 ranks by relevance only, 0 by diversity only.
+MMR_ENABLED = True
+
+MMR_POOL_SIZE = 20
+
+MMR_LAMBDA = 0.7
+
+MAX_CHUNKS_PER_SOURCE = 3
+
+# Merges context chunks that are neighbors on a page into one span before building the prompt.
+MERGE_ADJACENT_CHUNKS = True
+
+# Answers paraphrases of earlier queries from a cache when their embeddings' cosine similarity reaches the threshold.
+ANSWER_CACHE_ENABLED = True
+
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.92
+
+ANSWER_CACHE_TTL_SECONDS = 86400
+
+ANSWER_CACHE_SIZE = 1000
+
+# 'flat' (exact search), 'ivf_flat', 'ivf_pq', 'hnsw' or 'auto' ('flat' below ANN_MIN_VECTORS chunks, ANN_AUTO_INDEX_TYPE above).
+VECTOR_INDEX_TYPE = 'auto'
+
+ANN_AUTO_INDEX_TYPE = 'hnsw'
+
+ANN_MIN_VECTORS = 20000
+
+ANN_TRAIN_SAMPLE_SIZE = 50000
+
+IVF_NPROBE = 16
+
+HNSW_EF_SEARCH = 64
+
+HNSW_M = 32
+
+PQ_M = 48
+
+DEDUP_ENABLED = True
+
+DEDUP_SIMILARITY_THRESHOLD = 0.8
+
+PREFIX_CACHE_ENABLED = True
+
+GENERATION_MAX_NEW_TOKENS = 512
+
+GENERATION_CONTEXT_WINDOW = 4096
+
+GENERATION_CONTEXT_TOKEN_BUDGET = 3072
+
+TOKEN_COUNT_CACHE_SIZE = 10000
+
+GENERATION_MAX_BATCH_SIZE = 8
+
+GENERATION_MAX_WAIT_MS = 20
+
+SCRAPE_DEADLINE = 30.0
+
+SCRAPE_MAX_PAGES = 0
+
+PIPELINE_MIN_PAGES = 3
+
+PIPELINE_SCRAPE_DEADLINE = 15.0
+
+PIPELINE_QUEUE_SIZE = 4
+
+SEARCH_CACHE_TTL = 3600
+
+SEARCH_CACHE_SIZE = 1024
+
+SEARCH_POOL_SIZE = 10
+
+VECTOR_INDEX_DIR = './vector_index'
+
+EMBEDDING_CACHE_PATH = './embedding_cache.sqlite3'
+
+EMBEDDING_CACHE_SIZE = 10000
+
+EMBEDDING_BATCH_SIZE = 256
+
 def load_env_values():
     """
     Loads & Ensures the needed environment variables are defined, otherwise raises a VauleError exception.
@@ -73,7 +189,166 @@ def load_env_values():
 
     if not CHUNK_OVERLAP:
         raise ValueError("CHUNK_OVERLAP not found in .env file or in 'src.config'. Please add it.")
+
+    global CHUNKING_MODE
+    CHUNKING_MODE = os.getenv("CHUNKING_MODE") if  os.getenv("CHUNKING_MODE") else CHUNKING_MODE
+
+    if CHUNKING_MODE not in ('characters', 'tokens'):
+        raise ValueError("CHUNKING_MODE has an invalid value, expected 'characters' or 'tokens'.")
+
+    global CHUNK_TOKEN_SIZE
+    CHUNK_TOKEN_SIZE = int(os.getenv("CHUNK_TOKEN_SIZE")) if  os.getenv("CHUNK_TOKEN_SIZE") else CHUNK_TOKEN_SIZE
+
+    global CHUNK_TOKEN_OVERLAP
+    CHUNK_TOKEN_OVERLAP = int(os.getenv("CHUNK_TOKEN_OVERLAP")) if  os.getenv("CHUNK_TOKEN_OVERLAP") else CHUNK_TOKEN_OVERLAP
+
+    global CHUNK_SPAN_CACHE_SIZE
+    CHUNK_SPAN_CACHE_SIZE = int(os.getenv("CHUNK_SPAN_CACHE_SIZE")) if  os.getenv("CHUNK_SPAN_CACHE_SIZE") else CHUNK_SPAN_CACHE_SIZE
     
+    global GENERATOR_BACKEND
+    GENERATOR_BACKEND = os.getenv("GENERATOR_BACKEND") if  os.getenv("GENERATOR_BACKEND") else GENERATOR_BACKEND
+
+    if GENERATOR_BACKEND not in ('auto', 'bnb-4bit', 'int8-dynamic', 'bf16-compile', 'onnx'):
+        raise ValueError(f"GENERATOR_BACKEND has an invalid value: '{GENERATOR_BACKEND}'.")
+
+    global PREFIX_CACHE_ENABLED
+    PREFIX_CACHE_ENABLED = os.getenv("PREFIX_CACHE_ENABLED").lower() in ('1', 'true', 'yes') if  os.getenv("PREFIX_CACHE_ENABLED") else PREFIX_CACHE_ENABLED
+
+    global GENERATION_MAX_NEW_TOKENS
+    GENERATION_MAX_NEW_TOKENS = int(os.getenv("GENERATION_MAX_NEW_TOKENS")) if  os.getenv("GENERATION_MAX_NEW_TOKENS") else GENERATION_MAX_NEW_TOKENS
+
+    global GENERATION_CONTEXT_TOKEN_BUDGET
+    GENERATION_CONTEXT_TOKEN_BUDGET = int(os.getenv("GENERATION_CONTEXT_TOKEN_BUDGET")) if  os.getenv("GENERATION_CONTEXT_TOKEN_BUDGET") else GENERATION_CONTEXT_TOKEN_BUDGET
+
+    if GENERATION_MAX_NEW_TOKENS >= GENERATION_CONTEXT_WINDOW:
+        raise ValueError("GENERATION_MAX_NEW_TOKENS must be smaller than GENERATION_CONTEXT_WINDOW.")
+
+    global GENERATION_MAX_BATCH_SIZE
+    GENERATION_MAX_BATCH_SIZE = int(os.getenv("GENERATION_MAX_BATCH_SIZE")) if  os.getenv("GENERATION_MAX_BATCH_SIZE") else GENERATION_MAX_BATCH_SIZE
+
+    global GENERATION_MAX_WAIT_MS
+    GENERATION_MAX_WAIT_MS = int(os.getenv("GENERATION_MAX_WAIT_MS")) if  os.getenv("GENERATION_MAX_WAIT_MS") else GENERATION_MAX_WAIT_MS
+
+    global RETRIEVE_FROM_ALL_SOURCES
+    RETRIEVE_FROM_ALL_SOURCES = os.getenv("RETRIEVE_FROM_ALL_SOURCES").lower() in ('1', 'true', 'yes') if os.getenv("RETRIEVE_FROM_ALL_SOURCES") else RETRIEVE_FROM_ALL_SOURCES
+
+    global RETRIEVAL_MODE
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE") if  os.getenv("RETRIEVAL_MODE") else RETRIEVAL_MODE
+
+    if RETRIEVAL_MODE not in ('dense', 'sparse', 'hybrid'):
+        raise ValueError("RETRIEVAL_MODE has an invalid value, expected 'dense', 'sparse' or 'hybrid'.")
+
+    global HYBRID_NUM_CANDIDATES
+    HYBRID_NUM_CANDIDATES = int(os.getenv("HYBRID_NUM_CANDIDATES")) if  os.getenv("HYBRID_NUM_CANDIDATES") else HYBRID_NUM_CANDIDATES
+
+    global RRF_K
+    RRF_K = int(os.getenv("RRF_K")) if  os.getenv("RRF_K") else RRF_K
+
+    global RERANK_ENABLED
+    RERANK_ENABLED = os.getenv("RERANK_ENABLED").lower() in ('1', 'true', 'yes') if os.getenv("RERANK_ENABLED") else RERANK_ENABLED
+
+    global RERANKER_MODEL_ID
+    RERANKER_MODEL_ID = os.getenv("RERANKER_MODEL_ID") if  os.getenv("RERANKER_MODEL_ID") else RERANKER_MODEL_ID
+
+    global RERANK_POOL_SIZE
+    RERANK_POOL_SIZE = int(os.getenv("RERANK_POOL_SIZE")) if  os.getenv("RERANK_POOL_SIZE") else RERANK_POOL_SIZE
+
+    global RERANK_BATCH_SIZE
+    RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE")) if  os.getenv("RERANK_BATCH_SIZE") else RERANK_BATCH_SIZE
+
+    global RERANK_BUDGET_MS
+    RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS")) if  os.getenv("RERANK_BUDGET_MS") else RERANK_BUDGET_MS
+
+    global MMR_ENABLED
+    MMR_ENABLED = os.getenv("MMR_ENABLED").lower() in ('1', 'true', 'yes') if os.getenv("MMR_ENABLED") else MMR_ENABLED
+
+    global MMR_POOL_SIZE
+    MMR_POOL_SIZE = int(os.getenv("MMR_POOL_SIZE")) if  os.getenv("MMR_POOL_SIZE") else MMR_POOL_SIZE
+
+    global MMR_LAMBDA
+    MMR_LAMBDA = float(os.getenv("MMR_LAMBDA")) if  os.getenv("MMR_LAMBDA") else MMR_LAMBDA
+
+    global MAX_CHUNKS_PER_SOURCE
+    MAX_CHUNKS_PER_SOURCE = int(os.getenv("MAX_CHUNKS_PER_SOURCE")) if  os.getenv("MAX_CHUNKS_PER_SOURCE") else MAX_CHUNKS_PER_SOURCE
+
+    global MERGE_ADJACENT_CHUNKS
+    MERGE_ADJACENT_CHUNKS = os.getenv("MERGE_ADJACENT_CHUNKS").lower() in ('1', 'true', 'yes') if os.getenv("MERGE_ADJACENT_CHUNKS") else MERGE_ADJACENT_CHUNKS
+
+    global ANSWER_CACHE_ENABLED
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED").lower() in ('1', 'true', 'yes') if os.getenv("ANSWER_CACHE_ENABLED") else ANSWER_CACHE_ENABLED
+
+    global ANSWER_CACHE_SIMILARITY_THRESHOLD
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD")) if  os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD") else ANSWER_CACHE_SIMILARITY_THRESHOLD
+
+    global ANSWER_CACHE_TTL_SECONDS
+    ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS")) if  os.getenv("ANSWER_CACHE_TTL_SECONDS") else ANSWER_CACHE_TTL_SECONDS
+
+    global ANSWER_CACHE_SIZE
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE")) if  os.getenv("ANSWER_CACHE_SIZE") else ANSWER_CACHE_SIZE
+
+    global VECTOR_INDEX_TYPE
+    VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE") if  os.getenv("VECTOR_INDEX_TYPE") else VECTOR_INDEX_TYPE
+
+    global ANN_AUTO_INDEX_TYPE
+    ANN_AUTO_INDEX_TYPE = os.getenv("ANN_AUTO_INDEX_TYPE") if  os.getenv("ANN_AUTO_INDEX_TYPE") else ANN_AUTO_INDEX_TYPE
+
+    if VECTOR_INDEX_TYPE not in ('flat', 'ivf_flat', 'ivf_pq', 'hnsw', 'auto') or ANN_AUTO_INDEX_TYPE not in ('ivf_flat', 'ivf_pq', 'hnsw'):
+        raise ValueError("VECTOR_INDEX_TYPE or ANN_AUTO_INDEX_TYPE has an invalid value, expected 'flat', 'ivf_flat', 'ivf_pq', 'hnsw' or 'auto'.")
+
+    global ANN_MIN_VECTORS
+    ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS")) if  os.getenv("ANN_MIN_VECTORS") else ANN_MIN_VECTORS
+
+    global ANN_TRAIN_SAMPLE_SIZE
+    ANN_TRAIN_SAMPLE_SIZE = int(os.getenv("ANN_TRAIN_SAMPLE_SIZE")) if  os.getenv("ANN_TRAIN_SAMPLE_SIZE") else ANN_TRAIN_SAMPLE_SIZE
+
+    global IVF_NPROBE
+    IVF_NPROBE = int(os.getenv("IVF_NPROBE")) if  os.getenv("IVF_NPROBE") else IVF_NPROBE
+
+    global HNSW_EF_SEARCH
+    HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH")) if  os.getenv("HNSW_EF_SEARCH") else HNSW_EF_SEARCH
+
+    global HNSW_M
+    HNSW_M = int(os.getenv("HNSW_M")) if  os.getenv("HNSW_M") else HNSW_M
+
+    global PQ_M
+    PQ_M = int(os.getenv("PQ_M")) if  os.getenv("PQ_M") else PQ_M
+
+    global DEDUP_ENABLED
+    DEDUP_ENABLED = os.getenv("DEDUP_ENABLED").lower() in ('1', 'true', 'yes') if os.getenv("DEDUP_ENABLED") else DEDUP_ENABLED
+
+    global DEDUP_SIMILARITY_THRESHOLD
+    DEDUP_SIMILARITY_THRESHOLD = float(os.getenv("DEDUP_SIMILARITY_THRESHOLD")) if  os.getenv("DEDUP_SIMILARITY_THRESHOLD") else DEDUP_SIMILARITY_THRESHOLD
+
+    global SCRAPE_DEADLINE
+    SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE")) if  os.getenv("SCRAPE_DEADLINE") else SCRAPE_DEADLINE
+
+    global SCRAPE_MAX_PAGES
+    SCRAPE_MAX_PAGES = int(os.getenv("SCRAPE_MAX_PAGES")) if  os.getenv("SCRAPE_MAX_PAGES") else SCRAPE_MAX_PAGES
+
+    global PIPELINE_MIN_PAGES
+    PIPELINE_MIN_PAGES = int(os.getenv("PIPELINE_MIN_PAGES")) if  os.getenv("PIPELINE_MIN_PAGES") else PIPELINE_MIN_PAGES
+
+    global PIPELINE_SCRAPE_DEADLINE
+    PIPELINE_SCRAPE_DEADLINE = float(os.getenv("PIPELINE_SCRAPE_DEADLINE")) if  os.getenv("PIPELINE_SCRAPE_DEADLINE") else PIPELINE_SCRAPE_DEADLINE
+
+    global PIPELINE_QUEUE_SIZE
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE")) if  os.getenv("PIPELINE_QUEUE_SIZE") else PIPELINE_QUEUE_SIZE
+
+    global SEARCH_CACHE_TTL
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL")) if  os.getenv("SEARCH_CACHE_TTL") else SEARCH_CACHE_TTL
+
+    global VECTOR_INDEX_DIR
+    VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR") if  os.getenv("VECTOR_INDEX_DIR") else VECTOR_INDEX_DIR
+
+    global EMBEDDING_CACHE_PATH
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") if  os.getenv("EMBEDDING_CACHE_PATH") else EMBEDDING_CACHE_PATH
+
+    global EMBEDDING_CACHE_SIZE
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE")) if  os.getenv("EMBEDDING_CACHE_SIZE") else EMBEDDING_CACHE_SIZE
+
+    global EMBEDDING_BATCH_SIZE
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE")) if  os.getenv("EMBEDDING_BATCH_SIZE") else EMBEDDING_BATCH_SIZE
+
     if (not DEVICE) or (DEVICE != 'cuda' and DEVICE != 'cpu'):
         raise ValueError("DEVICE is not set in 'config.py' file or has an invalid value.")
 
@@ -1,29 +1,253 @@
+import asyncio
 import logging
-from src.scraping.scraper import scrape_urls
+import time
+from typing import Iterator, List, Optional, Set, Tuple
+from src import config
+from src.scraping.scraper import scrape_urls, scrape_urls_stream
 from src.api.search_client import get_search_results
-from src.processing.text_processor import process_scraped_data
+from src.processing.text_processor import iter_chunks, process_scraped_data
+from src.processing.deduplication import ChunkDeduplicator
+from src.rag_core.answer_cache import AnswerCache
 from src.rag_core.retriever import Retriever
 from src.rag_core.generator import Generator
+from src.processing.text_processor import Document
+from src.rag_core.generator import NO_CONTEXT_ANSWER
 from src.config import setup_logging, load_env_values
 
 
 setup_logging()
 
-def pipeline(query: str, retriever: Retriever, generator: Generator):
+logger = logging.getLogger(__name__)
+
+_answer_cache: Optional[AnswerCache] = None
+
+def create_answer_cache() -> Optional[AnswerCache]:
+    if not config.ANSWER_CACHE_ENABLED:
+        return None
+
+    return AnswerCache(
+        similarity_threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+        max_entries=config.ANSWER_CACHE_SIZE
+    )
+
+def get_answer_cache(answer_cache: Optional[AnswerCache] = None) -> Optional[AnswerCache]:
+    """
+    Returns 'answer_cache' if given, else the process-wide answer cache, created on first use
+    and shared by every query the process answers, like the loaded Retriever and Generator.
+
+    Returns:
+        The answer cache, or None when 'config.ANSWER_CACHE_ENABLED' is off and no cache is given.
+    """
+    global _answer_cache
+
+    if answer_cache is not None or not config.ANSWER_CACHE_ENABLED:
+        return answer_cache
+
+    if _answer_cache is None:
+        _answer_cache = create_answer_cache()
+    return _answer_cache
+
+def lookup_answer(query: str, retriever: Retriever, answer_cache: Optional[AnswerCache]):
+    """
+    Embeds the query and looks it up in the answer cache.
+
+    Returns:
+        The query embedding, to be reused by retrieval and 'store_answer', and the cached answer or None.
+    """
+    if answer_cache is None:
+        return None, None
+
+    started_at = time.perf_counter()
+    query_vector = retriever.embedding_model.embed_query(query)
+    cached = answer_cache.lookup(query_vector)
+
+    if cached is not None:
+        logger.info(
+            f"Answer cache hit in {(time.perf_counter() - started_at) * 1000:.1f}ms: '{query}' matches '{cached.query}' "
+            f"(similarity {cached.similarity:.3f}), stats: {answer_cache.stats}"
+        )
+    return query_vector, cached
+
+def store_answer(answer_cache: Optional[AnswerCache], query: str, query_vector, answer: str, source_urls: Set[str]):
+    """
+    Caches an answer, unless there was no context to answer from.
+    """
+    if answer_cache is not None and source_urls and answer != NO_CONTEXT_ANSWER:
+        answer_cache.put(query, query_vector, answer, source_urls)
+
+def retrieve_context_docs(query: str, retriever: Retriever, query_vector=None) -> List[Document]:
     urls_to_scrape = get_search_results(query=query)
      
     scraped_data = scrape_urls(urls=urls_to_scrape)
     
-    documents = process_scraped_data(scraped_content=scraped_data)
+    documents = iter_chunks(scraped_content=scraped_data)
+
+    deduplicator = ChunkDeduplicator() if config.DEDUP_ENABLED else None
+    if deduplicator is not None:
+        documents = deduplicator.iter_unique(documents)
 
     retriever.build_vector_store(documents=documents)
 
-    context_docs = retriever.retrieve_context(query=query)
+    if deduplicator is not None:
+        deduplicator.log_stats()
+
+    return retriever.retrieve_context(query=query, query_vector=query_vector, source_urls=set(scraped_data))
+
+def collect_source_urls(context_docs: List[Document]) -> Set[str]:
+    """
+    Every URL the context was found on, including the mirrors collapsed by deduplication.
+    """
+    return set(
+        url for doc in context_docs for url in doc.metadata.get('source_urls', [doc.metadata['source_url']])
+    )
+
+def pipeline(query: str, retriever: Retriever, generator: Generator, answer_cache: Optional[AnswerCache] = None):
+    """
+    Answers a query from freshly searched and scraped pages.
+    Paraphrases of an earlier query are answered from the answer cache, without search, scraping or generation.
+    Without an 'answer_cache' the process-wide one is used, see 'get_answer_cache'.
+    """
+    answer_cache = get_answer_cache(answer_cache)
+    query_vector, cached = lookup_answer(query, retriever, answer_cache)
+    if cached is not None:
+        return cached.answer, cached.source_urls
+
+    context_docs = retrieve_context_docs(query=query, retriever=retriever, query_vector=query_vector)
 
-    source_urls = set(doc.metadata['source_url'] for doc in context_docs)
+    source_urls = collect_source_urls(context_docs)
 
     final_answer = generator.generate_answer(query=query, context_docs=context_docs)
 
+    store_answer(answer_cache, query, query_vector, final_answer, source_urls)
+
+    return final_answer, source_urls
+
+def pipeline_stream(query: str, retriever: Retriever, generator: Generator, answer_cache: Optional[AnswerCache] = None) -> Tuple[Iterator[str], Set[str]]:
+    """
+    Same as 'pipeline', but the answer is returned as an iterator of text deltas produced as the model generates.
+    A cached answer is returned as a single delta, a generated one is cached once the stream is exhausted.
+    """
+    answer_cache = get_answer_cache(answer_cache)
+    query_vector, cached = lookup_answer(query, retriever, answer_cache)
+    if cached is not None:
+        return iter([cached.answer]), cached.source_urls
+
+    context_docs = retrieve_context_docs(query=query, retriever=retriever, query_vector=query_vector)
+
+    source_urls = collect_source_urls(context_docs)
+
+    answer_stream = generator.generate_answer_stream(query=query, context_docs=context_docs)
+
+    def caching_stream():
+        deltas = []
+        for delta in answer_stream:
+            deltas.append(delta)
+            yield delta
+        store_answer(answer_cache, query, query_vector, "".join(deltas).strip(), source_urls)
+
+    return (caching_stream() if answer_cache is not None else answer_stream), source_urls
+
+async def pipeline_async(
+    query: str,
+    retriever: Retriever,
+    generator: Generator,
+    min_pages: Optional[int] = None,
+    deadline: Optional[float] = None,
+    answer_cache: Optional[AnswerCache] = None
+):
+    """
+    Async variant of 'pipeline' with overlapped stages: pages are chunked and embedded as soon as
+    each one is scraped, and retrieval starts once 'min_pages' pages are indexed or 'deadline'
+    seconds have passed since scraping started, so a single slow site does not set the latency.
+
+    Args:
+        query: the user's query.
+        retriever: a loaded Retriever.
+        generator: a loaded Generator, or anything exposing 'generate_answer' (e.g. a GenerationScheduler).
+        min_pages: pages to index before retrieving, defaults to 'config.PIPELINE_MIN_PAGES'.
+        deadline: seconds to wait for 'min_pages', defaults to 'config.PIPELINE_SCRAPE_DEADLINE'.
+        answer_cache: answers paraphrases of earlier queries without search, scraping or generation,
+                      defaults to the process-wide cache of 'get_answer_cache'.
+
+    Returns:
+        The answer and the set of source URLs it was generated from.
+    """
+    min_pages = min_pages or config.PIPELINE_MIN_PAGES
+    deadline = config.PIPELINE_SCRAPE_DEADLINE if deadline is None else deadline
+    answer_cache = get_answer_cache(answer_cache)
+
+    query_vector, cached = await asyncio.to_thread(lookup_answer, query, retriever, answer_cache)
+    if cached is not None:
+        return cached.answer, cached.source_urls
+
+    urls_to_scrape = await asyncio.to_thread(get_search_results, query=query)
+
+    pages: asyncio.Queue = asyncio.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+    enough_pages = asyncio.Event()
+    index_lock = asyncio.Lock()
+    state = {"indexed_pages": 0, "stopped": False, "indexed_urls": set()}
+    deduplicator = ChunkDeduplicator() if config.DEDUP_ENABLED else None
+    started_at = time.perf_counter()
+
+    async def scrape_stage():
+        try:
+            async for url, text in scrape_urls_stream(urls_to_scrape, deadline=deadline):
+                await pages.put((url, text))
+        finally:
+            # Once the pipeline stopped nothing drains the queue anymore, so the end marker is only sent if there is room.
+            try:
+                pages.put_nowait(None)
+            except asyncio.QueueFull:
+                if not state["stopped"]:
+                    await pages.put(None)
+
+    async def index_stage():
+        while (page := await pages.get()) is not None:
+            async with index_lock:
+                if state["stopped"]:
+                    break
+
+                documents = process_scraped_data(scraped_content=dict([page]))
+                if deduplicator is not None:
+                    documents = deduplicator.add(documents)
+                await asyncio.to_thread(retriever.build_vector_store, documents=documents)
+
+            state["indexed_pages"] += 1
+            state["indexed_urls"].add(page[0])
+            logger.info(f"Indexed page {state['indexed_pages']} ({page[0]}) after {time.perf_counter() - started_at:.1f}s.")
+            if state["indexed_pages"] >= min_pages:
+                enough_pages.set()
+
+        enough_pages.set()
+
+    scrape_task = asyncio.create_task(scrape_stage())
+    index_task = asyncio.create_task(index_stage())
+
+    try:
+        await asyncio.wait_for(enough_pages.wait(), timeout=deadline)
+    except asyncio.TimeoutError:
+        logger.warning(f"Scrape deadline of {deadline}s reached with {state['indexed_pages']} pages indexed, retrieving with what is available.")
+
+    async with index_lock:
+        state["stopped"] = True
+        context_docs = await asyncio.to_thread(
+            retriever.retrieve_context, query=query, query_vector=query_vector, source_urls=set(state["indexed_urls"])
+        )
+
+    scrape_task.cancel()
+    index_task.cancel()
+    await asyncio.gather(scrape_task, index_task, return_exceptions=True)
+
+    if deduplicator is not None:
+        deduplicator.log_stats()
+
+    source_urls = collect_source_urls(context_docs)
+
+    final_answer = await asyncio.to_thread(generator.generate_answer, query=query, context_docs=context_docs)
+
+    store_answer(answer_cache, query, query_vector, final_answer, source_urls)
+
     return final_answer, source_urls
 
 def main():
@@ -37,10 +261,12 @@ def main():
     
     user_input = input("Your Search Query: ")
 
-    final_answer, source_urls = pipeline(query=user_input, retriever=retriever, generator=generator)
+    answer_stream, source_urls = pipeline_stream(query=user_input, retriever=retriever, generator=generator)
 
     print("\n--- FINAL ANSWER ---")
-    print(final_answer)
+    for delta in answer_stream:
+        print(delta, end="", flush=True)
+    print()
     print("\n--- SOURCES ---")
     for url in source_urls:
         print(f"- {url}")
@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src import config
+from src.processing.text_processor import Document
+
+
+logger = logging.getLogger(__name__)
+
+MINHASH_PERMUTATIONS = 64
+
+# Signatures are split into bands of rows, two chunks become candidates when a whole band matches,
+# which happens with high probability above a Jaccard similarity of about (1 / bands) ** (1 / rows).
+MINHASH_BANDS = 16
+MINHASH_ROWS = MINHASH_PERMUTATIONS // MINHASH_BANDS
+
+SHINGLE_SIZE = 3
+
+_WORD = re.compile(r"\w+")
+
+# Multiply-shift hash functions, one per permutation: h(x) = ((a * x + b) mod 2^64) >> 32 with odd 'a'.
+_rng = np.random.default_rng(seed=1)
+_HASH_A = _rng.integers(1, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases and collapses whitespace, so chunks differing only in formatting hash the same."""
+    return " ".join(text.lower().split())
+
+
+def shingles(text: str) -> Set[str]:
+    """The set of overlapping word 3-grams of a text, a single shingle for very short texts."""
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """
+    Returns the MinHash signature of a text's shingle set. The fraction of equal positions in two
+    signatures estimates the Jaccard similarity of the two shingle sets.
+    """
+    values = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)), dtype=np.uint64)
+    hashed = (values[:, None] * _HASH_A + _HASH_B) >> np.uint64(32)
+    return hashed.min(axis=0)
+
+
+class ChunkDeduplicator:
+    """
+    Collapses exact and near-duplicate chunks, e.g. from syndicated copies and mirrors of an article.
+
+    Exact duplicates are found by the hash of the normalized text, near duplicates by MinHash
+    signatures whose estimated Jaccard similarity is at least 'similarity_threshold', looked up
+    through banded LSH buckets instead of comparing every pair. The first chunk seen is kept and
+    collects the source URLs of every chunk collapsed into it in 'metadata["source_urls"]'.
+
+    The deduplicator is stateful, so pages added one at a time are also deduplicated against each other.
+    """
+
+    def __init__(self, similarity_threshold: Optional[float] = None):
+        self.similarity_threshold = (
+            config.DEDUP_SIMILARITY_THRESHOLD if similarity_threshold is None else similarity_threshold
+        )
+        self._exact: Dict[str, Document] = {}
+        self._signatures: List[Tuple[np.ndarray, Document]] = []
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        self.num_seen = 0
+        self.num_exact = 0
+        self.num_near = 0
+
+    def _bands(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS].tobytes()) for band in range(MINHASH_BANDS)
+        ]
+
+    def _find_near_duplicate(self, signature: np.ndarray) -> Optional[Document]:
+        candidates = {row for key in self._bands(signature) for row in self._buckets.get(key, ())}
+        for row in sorted(candidates):
+            other, doc = self._signatures[row]
+            if np.mean(signature == other) >= self.similarity_threshold:
+                return doc
+        return None
+
+    def _collapse(self, kept: Document, duplicate: Document):
+        source_urls = kept.metadata.setdefault("source_urls", [kept.metadata["source_url"]])
+        for url in duplicate.metadata.get("source_urls", [duplicate.metadata["source_url"]]):
+            if url not in source_urls:
+                source_urls.append(url)
+
+    def add(self, documents: List[Document]) -> List[Document]:
+        """
+        Deduplicates the documents against each other and everything added before.
+
+        Returns:
+            The documents that are not duplicates, in their original order.
+        """
+        return list(self.iter_unique(documents))
+
+    def iter_unique(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Like 'add', but lazily, for chunks streamed from 'iter_chunks'.
+        """
+        for doc in documents:
+            self.num_seen += 1
+
+            digest = hashlib.sha1(normalize_text(doc.page_content).encode("utf-8")).hexdigest()
+            kept = self._exact.get(digest)
+            if kept is not None:
+                self._collapse(kept, doc)
+                self.num_exact += 1
+                continue
+
+            signature = minhash(doc.page_content)
+            kept = self._find_near_duplicate(signature) if self.similarity_threshold <= 1 else None
+            if kept is not None:
+                self._collapse(kept, doc)
+                self.num_near += 1
+                continue
+
+            doc.metadata.setdefault("source_urls", [doc.metadata["source_url"]])
+            self._exact[digest] = doc
+            for key in self._bands(signature):
+                self._buckets[key].append(len(self._signatures))
+            self._signatures.append((signature, doc))
+            yield doc
+
+    def log_stats(self):
+        logger.info(
+            f"Deduplication dropped {self.num_exact} exact and {self.num_near} near-duplicate chunks, "
+            f"kept {self.num_seen - self.num_exact - self.num_near} of {self.num_seen}."
+        )
+
@@ -1,18 +1,310 @@
-from typing import List, Dict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from array import array
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
 from src import config
+from src.processing.token_splitter import EmbeddingTokenSplitter
 import logging
+import numpy as np
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+TOKENIZE_BATCH_SIZE = 32
+
+@dataclass(slots=True)
 class Document:
     """A simple data class to hold a chunk of text and its metadata."""
     page_content: str
-    metadata: Dict[str, str]
+    metadata: Dict[str, Any]
+
+class DocumentBatch:
+    """
+    A compact, columnar collection of chunks, for corpora too large to keep as one 'Document' each.
+
+    All chunk text lives in a single UTF-8 buffer addressed by an offsets array, source URLs are
+    interned in a table and referenced by id, and chunk indices and start offsets are int arrays.
+    The 'source_urls' lists from deduplication are a flag per row, the URL ids of the chunks that
+    were also found on other pages are stored in one flat id array, each list prefixed by its length.
+    Any other metadata is kept per row only where present.
+
+    Indexing or iterating builds 'Document' objects on demand, so callers keep using
+    'doc.page_content' and 'doc.metadata'. Those are copies, changing them does not change the batch.
+    """
+
+    __slots__ = (
+        "_text", "_offsets", "_url_ids", "_chunk_indices", "_start_indices", "_has_source_urls", "_mirror_offsets",
+        "_mirror_url_ids", "_urls", "_url_ids_by_url", "_url_has_rows", "_extra"
+    )
+
+    def __init__(self, documents: Iterable[Document] = ()):
+        self._text = bytearray()
+        self._offsets = array("q", [0])
+        self._url_ids = array("l")
+        self._chunk_indices = array("l")
+        self._start_indices = array("q")
+        self._has_source_urls = bytearray()
+        # Where the 'source_urls' ids of a row found on more pages than its own start, -1 for the others.
+        self._mirror_offsets = array("q")
+        self._mirror_url_ids = array("l")
+        self._urls: List[str] = []
+        self._url_ids_by_url: Dict[str, int] = {}
+        # Mirror URLs share the table, only URLs that are some row's source URL are listed in 'urls'.
+        self._url_has_rows = bytearray()
+        self._extra: Dict[int, Dict[str, Any]] = {}
+
+        for doc in documents:
+            self.append(doc)
+
+    def __len__(self) -> int:
+        return len(self._url_ids)
+
+    def __getitem__(self, row: int) -> Document:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("DocumentBatch index out of range")
+
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+
+    def __iter__(self) -> Iterator[Document]:
+        for row in range(len(self)):
+            yield self[row]
+
+    @property
+    def urls(self) -> List[str]:
+        """The source URLs of the rows, in the order they were first added."""
+        return [url for url, has_rows in zip(self._urls, self._url_has_rows) if has_rows]
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the text buffer and the columns, not counting the URL table and extra metadata."""
+        arrays = (self._offsets, self._url_ids, self._chunk_indices, self._start_indices, self._mirror_offsets, self._mirror_url_ids)
+        return len(self._text) + len(self._has_source_urls) + sum(len(column) * column.itemsize for column in arrays)
+
+    def append(self, doc: Document):
+        metadata = dict(doc.metadata)
+        url_id = self._intern(metadata.pop("source_url"))
+        self._url_has_rows[url_id] = 1
+
+        self._text += doc.page_content.encode("utf-8")
+        self._offsets.append(len(self._text))
+        self._url_ids.append(url_id)
+        self._set_columns(len(self) - 1, metadata)
+
+    def text(self, row: int) -> str:
+        return self._text[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+    def source_url(self, row: int) -> str:
+        return self._urls[self._url_ids[row]]
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        metadata = {"source_url": self.source_url(row)}
+        if self._chunk_indices[row] >= 0:
+            metadata["chunk_index"] = self._chunk_indices[row]
+        if self._start_indices[row] >= 0:
+            metadata["start_index"] = self._start_indices[row]
+        if self._has_source_urls[row]:
+            metadata["source_urls"] = self._source_urls(row)
+        metadata.update(self._extra.get(row, {}))
+        return metadata
+
+    def set_metadata(self, row: int, metadata: Dict[str, Any]):
+        """
+        Replaces the metadata of a row, its source URL can not change.
+        """
+        metadata = dict(metadata)
+        if metadata.pop("source_url", self.source_url(row)) != self.source_url(row):
+            raise ValueError("The source URL of a DocumentBatch row can not be changed.")
+
+        self._set_columns(row, metadata)
+
+    def select(self, rows: Iterable[int]) -> "DocumentBatch":
+        """
+        Returns a new batch holding only the given rows, in that order, with a URL table of only their URLs.
+        """
+        return DocumentBatch(self[row] for row in rows)
+
+    def delete_rows(self, rows: Iterable[int]):
+        """
+        Removes the given rows in place, the rows after them move up and keep their order.
+
+        Every column is compacted with one numpy mask, no 'Document' is built. URL ids stay the same,
+        a URL left without rows stays interned but is no longer listed in 'urls'.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.fromiter(rows, dtype=np.int64)] = False
+        if keep.all():
+            return
+
+        lengths = np.diff(np.frombuffer(self._offsets, dtype=np.int64))
+        self._text = bytearray(np.frombuffer(self._text, dtype=np.uint8)[np.repeat(keep, lengths)].tobytes())
+        self._offsets = _to_column("q", np.concatenate([[0], np.cumsum(lengths[keep])]))
+
+        for name in ("_url_ids", "_chunk_indices", "_start_indices"):
+            column = getattr(self, name)
+            setattr(self, name, _to_column(column.typecode, np.frombuffer(column, dtype=column.typecode)[keep]))
+        self._has_source_urls = bytearray(np.frombuffer(self._has_source_urls, dtype=np.uint8)[keep].tobytes())
+
+        # The kept 'source_urls' lists, each its length followed by its URL ids, are moved up in one gather.
+        mirror_offsets = np.frombuffer(self._mirror_offsets, dtype=np.int64)[keep]
+        mirrored = mirror_offsets >= 0
+        mirror_url_ids = np.frombuffer(self._mirror_url_ids, dtype=self._mirror_url_ids.typecode)
+        starts = mirror_offsets[mirrored]
+        sizes = mirror_url_ids[starts] + 1
+        new_starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self._mirror_url_ids = _to_column("l", mirror_url_ids[np.repeat(starts - new_starts, sizes) + np.arange(sizes.sum())])
+        mirror_offsets[mirrored] = new_starts
+        self._mirror_offsets = _to_column("q", mirror_offsets)
+
+        url_has_rows = np.zeros(len(self._urls), dtype=np.uint8)
+        url_has_rows[np.frombuffer(self._url_ids, dtype=self._url_ids.typecode)] = 1
+        self._url_has_rows = bytearray(url_has_rows.tobytes())
+
+        new_rows = np.cumsum(keep) - 1
+        self._extra = {int(new_rows[row]): metadata for row, metadata in self._extra.items() if keep[row]}
+
+    def _source_urls(self, row: int) -> List[str]:
+        start = self._mirror_offsets[row]
+        if start < 0:
+            return [self.source_url(row)]
+
+        count = self._mirror_url_ids[start]
+        return [self._urls[url_id] for url_id in self._mirror_url_ids[start + 1:start + 1 + count]]
+
+    def _intern(self, url: str) -> int:
+        url_id = self._url_ids_by_url.get(url)
+        if url_id is None:
+            url_id = self._url_ids_by_url[url] = len(self._urls)
+            self._urls.append(url)
+            self._url_has_rows.append(0)
+        return url_id
+
+    def _set_columns(self, row: int, metadata: Dict[str, Any]):
+        """Stores everything but the source URL, -1 marks a missing chunk or start index."""
+        chunk_index = metadata.pop("chunk_index", -1)
+        start_index = metadata.pop("start_index", -1)
+        source_urls = metadata.pop("source_urls", None)
+        mirror_offset = -1
+
+        # Most chunks are only found on their own page, for those the flag is enough.
+        if source_urls is not None and list(source_urls) != [self.source_url(row)]:
+            url_ids = [self._intern(url) for url in source_urls]
+            previous = self._mirror_offsets[row] if row < len(self._mirror_offsets) else -1
+            if previous >= 0 and self._mirror_url_ids[previous] >= len(url_ids):
+                # A list that does not grow, e.g. when a reused chunk's metadata is set again, is rewritten in place.
+                mirror_offset = previous
+                self._mirror_url_ids[previous:previous + 1 + len(url_ids)] = array("l", [len(url_ids), *url_ids])
+            else:
+                mirror_offset = len(self._mirror_url_ids)
+                self._mirror_url_ids.append(len(url_ids))
+                self._mirror_url_ids.extend(url_ids)
+
+        if row == len(self._chunk_indices):
+            self._chunk_indices.append(chunk_index)
+            self._start_indices.append(start_index)
+            self._has_source_urls.append(source_urls is not None)
+            self._mirror_offsets.append(mirror_offset)
+        else:
+            self._chunk_indices[row] = chunk_index
+            self._start_indices[row] = start_index
+            self._has_source_urls[row] = source_urls is not None
+            self._mirror_offsets[row] = mirror_offset
+
+        if metadata:
+            self._extra[row] = metadata
+        else:
+            self._extra.pop(row, None)
+
+def _to_column(typecode: str, values: np.ndarray) -> array:
+    """Copies numpy values into a new 'array' column of the given type code."""
+    column = array(typecode)
+    column.frombytes(np.ascontiguousarray(values, dtype=typecode).tobytes())
+    return column
+
+@lru_cache(maxsize=8)
+def _get_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """
+    Returns the splitter for the given chunk size and overlap, built once and reused for every page.
+    Keyed on both values, so changing 'config.CHUNK_SIZE' or 'config.CHUNK_OVERLAP' takes effect immediately.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        add_start_index=True,
+    )
+
+@lru_cache(maxsize=4)
+def _get_token_splitter(model_id: str, window_tokens: int, overlap_tokens: int) -> Optional[EmbeddingTokenSplitter]:
+    """
+    Returns the token splitter for the embedding model, loaded once. None when its tokenizer can not be loaded.
+    """
+    try:
+        splitter = EmbeddingTokenSplitter.from_pretrained(
+            model_id, window_tokens, overlap_tokens, cache_dir=str(config.HF_HOME), cache_size=config.CHUNK_SPAN_CACHE_SIZE
+        )
+    except Exception as e:
+        logger.error(f"Could not load the tokenizer of '{model_id}' for token chunking, falling back to character chunking. Error: {e}")
+        return None
+
+    logger.info(f"Chunking by '{model_id}' tokens, {splitter.chunk_tokens} per chunk with {splitter.overlap_tokens} overlap.")
+    return splitter
+
+def _split_pages(pages: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, List[Tuple[int, str]]]]:
+    """
+    Yields every page's URL with its (start_index, chunk_text) pairs, in the configured 'CHUNKING_MODE'.
+    In 'tokens' mode pages are tokenized 'TOKENIZE_BATCH_SIZE' at a time.
+    """
+    token_splitter = None
+    if config.CHUNKING_MODE == "tokens":
+        token_splitter = _get_token_splitter(config.EMBEDDING_MODEL_ID, config.CHUNK_TOKEN_SIZE, config.CHUNK_TOKEN_OVERLAP)
+
+    if token_splitter is None:
+        text_splitter = _get_text_splitter(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+        for url, text in pages:
+            yield url, [(chunk.metadata["start_index"], chunk.page_content) for chunk in text_splitter.create_documents([text])]
+        return
+
+    pages = iter(pages)
+    while group := list(islice(pages, TOKENIZE_BATCH_SIZE)):
+        for (url, text), spans in zip(group, token_splitter.split_spans([text for _, text in group])):
+            yield url, [(start, text[start:end]) for start, end in spans]
+
+def iter_chunks(scraped_content: Dict[str, str]) -> Iterator[Document]:
+    """
+    Lazily chunks the raw scraped text, one page at a time.
+
+    Only the chunks of the page being split are held in memory, so a consumer that works
+    in fixed-size batches (e.g. 'Retriever.build_vector_store') never needs the whole corpus
+    chunked up front.
+
+    With 'config.CHUNKING_MODE' set to 'tokens', chunks are cut by the embedding model's tokenizer
+    to fit its 'CHUNK_TOKEN_SIZE' window, instead of every 'CHUNK_SIZE' characters.
+
+    Args:
+        scraped_content: A dictionary where keys are URLs and values are the
+                         raw text content from those URLs.
+
+    Yields:
+        Document objects, each a chunk of a page with its source URL, chunk index and the
+        character offset it starts at in the page ('start_index') as metadata.
+    """
+
+    num_chunks = 0
+    pages = ((url, text) for url, text in scraped_content.items() if text)
+    for url, chunks in _split_pages(pages):
+        for i, (start_index, chunk_text) in enumerate(chunks):
+            num_chunks += 1
+            yield Document(
+                page_content=chunk_text,
+                metadata={"source_url": url, "chunk_index": i, "start_index": start_index}
+            )
+
+    logger.info(f"Created {num_chunks} text chunks from the documents.")
 
 def process_scraped_data(scraped_content: Dict[str, str]) -> List[Document]:
     """
@@ -35,26 +327,4 @@ def process_scraped_data(scraped_content: Dict[str, str]) -> List[Document]:
 
     logger.info(f"Processing {len(scraped_content)} scraped documents...")
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=config.CHUNK_SIZE,
-        chunk_overlap=config.CHUNK_OVERLAP,
-        length_function=len,
-        add_start_index=True,
-    )
-
-    all_chunks = []
-    for url, text in scraped_content.items():
-        if not text:
-            continue 
-        
-        chunks = text_splitter.split_text(text)
-        
-        for i, chunk_text in enumerate(chunks):
-            doc = Document(
-                page_content=chunk_text,
-                metadata={"source_url": url, "chunk_index": i}
-            )
-            all_chunks.append(doc)
-    
-    logger.info(f"Created {len(all_chunks)} text chunks from the documents.")
-    return all_chunks
\ No newline at end of file
+    return list(iter_chunks(scraped_content))
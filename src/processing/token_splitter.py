@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from tokenizers import Tokenizer
+
+
+logger = logging.getLogger(__name__)
+
+# Characters a window preferably ends on, and how far back from a full window it may end to do so.
+SENTENCE_ENDS = ".!?"
+SENTENCE_SEARCH_FRACTION = 0.25
+
+Span = Tuple[int, int]
+
+
+def resolve_model_id(model_id: str) -> str:
+    """
+    Bare sentence-transformers names like 'all-MiniLM-L6-v2' live under the 'sentence-transformers/' organization on the Hub.
+    """
+    if "/" in model_id or os.path.isdir(model_id):
+        return model_id
+    return f"sentence-transformers/{model_id}"
+
+
+class EmbeddingTokenSplitter:
+    """
+    Splits text into chunks that fit the embedding model's input window exactly.
+
+    Every page is tokenized once with the model's own fast (Rust) tokenizer, pages are encoded
+    together in a single batched call, and windows of at most 'chunk_tokens' tokens overlapping by
+    'overlap_tokens' are cut from the token offsets. Windows only end between two words, preferably
+    after a sentence, so a chunk re-tokenizes to the same tokens and is never truncated by the model.
+
+    Chunk spans are cached by page content, re-scraped pages that did not change are not re-tokenized.
+    """
+
+    def __init__(self, tokenizer: Tokenizer, chunk_tokens: int, overlap_tokens: int = 0, cache_size: int = 1024):
+        if chunk_tokens <= 0:
+            raise ValueError(f"chunk_tokens must be positive, got {chunk_tokens}.")
+
+        self.tokenizer = tokenizer
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+        self.cache_size = cache_size
+        self._spans: "OrderedDict[bytes, List[Span]]" = OrderedDict()
+
+    @classmethod
+    def from_pretrained(cls, model_id: str, window_tokens: int, overlap_tokens: int = 0, cache_dir: Optional[str] = None, cache_size: int = 1024) -> "EmbeddingTokenSplitter":
+        """
+        Loads the fast tokenizer of an embedding model.
+
+        Args:
+            model_id: the embedding model, e.g. 'config.EMBEDDING_MODEL_ID'.
+            window_tokens: the model's maximum input length, special tokens included.
+            overlap_tokens: the number of tokens consecutive chunks share.
+            cache_dir: where Hugging Face models are cached, e.g. 'config.HF_HOME'.
+        """
+        from transformers import AutoTokenizer
+
+        pretrained = AutoTokenizer.from_pretrained(resolve_model_id(model_id), cache_dir=cache_dir, use_fast=True)
+        if not pretrained.is_fast:
+            raise ValueError(f"No fast tokenizer available for '{model_id}'.")
+
+        # A copy of the backend without the truncation and padding the model ships with, pages are tokenized whole.
+        tokenizer = Tokenizer.from_str(pretrained.backend_tokenizer.to_str())
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+
+        chunk_tokens = window_tokens - pretrained.num_special_tokens_to_add(pair=False)
+        return cls(tokenizer, chunk_tokens, overlap_tokens, cache_size)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Returns the number of tokens of each text without special tokens, in one batched call.
+        """
+        return [len(encoding.ids) for encoding in self.tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+    def split_spans(self, texts: List[str]) -> List[List[Span]]:
+        """
+        Returns the (start, end) character spans of the chunks of every text.
+        Texts missing from the cache are tokenized together in a single batch.
+        """
+        keys = [hashlib.sha1(text.encode("utf-8")).digest() for text in texts]
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._spans and key not in missing:
+                missing[key] = text
+
+        if missing:
+            encodings = self.tokenizer.encode_batch(list(missing.values()), add_special_tokens=False)
+            for key, text, encoding in zip(missing, missing.values(), encodings):
+                self._remember(key, self._windows(text, encoding.offsets, encoding.word_ids))
+
+        spans = []
+        for key in keys:
+            self._spans.move_to_end(key)
+            spans.append(self._spans[key])
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans([text])[0]]
+
+    def _remember(self, key: bytes, spans: List[Span]):
+        self._spans[key] = spans
+        while len(self._spans) > self.cache_size:
+            self._spans.popitem(last=False)
+
+    def _windows(self, text: str, offsets: List[Span], word_ids: List[Optional[int]]) -> List[Span]:
+        num_tokens = len(offsets)
+
+        def is_word_boundary(position: int) -> bool:
+            return word_ids[position] is None or word_ids[position] != word_ids[position - 1]
+
+        spans = []
+        start = 0
+        while start < num_tokens:
+            end = min(start + self.chunk_tokens, num_tokens)
+
+            if end < num_tokens:
+                boundaries = [position for position in range(end, start, -1) if is_word_boundary(position)]
+                earliest_sentence_end = end - int(self.chunk_tokens * SENTENCE_SEARCH_FRACTION)
+                sentence_ends = [
+                    position for position in boundaries
+                    if position >= earliest_sentence_end and text[offsets[position - 1][1] - 1] in SENTENCE_ENDS
+                ]
+                # A single word longer than the window can only be cut inside the word.
+                end = sentence_ends[0] if sentence_ends else boundaries[0] if boundaries else end
+
+            spans.append((offsets[start][0], offsets[end - 1][1]))
+            if end == num_tokens:
+                break
+
+            # The overlap starts at a word boundary too, moved back over a split word rather than forward.
+            next_start = max(end - self.overlap_tokens, start + 1)
+            while next_start > start + 1 and not is_word_boundary(next_start):
+                next_start -= 1
+            while next_start < end and not is_word_boundary(next_start):
+                next_start += 1
+            start = next_start
+
+        return spans
@@ -0,0 +1,199 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Training k-means wants at least this many points per centroid.
+MIN_POINTS_PER_CENTROID = 39
+
+# Vectors are copied into the index this many rows at a time, so a memory-mapped matrix is never read whole.
+ADD_BLOCK_ROWS = 8192
+
+
+@dataclass
+class AnnParams:
+    """
+    How 'VectorIndex' searches its vectors.
+
+    'index_type' is one of 'INDEX_TYPES' or 'auto'. 'auto' searches exactly below 'min_vectors' chunks
+    and switches to 'auto_index_type' above it, any explicit type is used from 'min_vectors' on too.
+    """
+    index_type: str = "auto"
+    auto_index_type: str = "hnsw"
+    min_vectors: int = 20000
+    train_sample_size: int = 50000
+    nprobe: int = 16
+    ef_search: int = 64
+    hnsw_m: int = 32
+    pq_m: int = 48
+    # IVF-PQ fetches this many times k candidates to re-score exactly, its compressed scores are coarse.
+    refine_factor: int = 20
+    rebuild_fraction: float = 0.2
+
+    @classmethod
+    def from_config(cls) -> "AnnParams":
+        from src import config
+
+        return cls(
+            index_type=config.VECTOR_INDEX_TYPE,
+            auto_index_type=config.ANN_AUTO_INDEX_TYPE,
+            min_vectors=config.ANN_MIN_VECTORS,
+            train_sample_size=config.ANN_TRAIN_SAMPLE_SIZE,
+            nprobe=config.IVF_NPROBE,
+            ef_search=config.HNSW_EF_SEARCH,
+            hnsw_m=config.HNSW_M,
+            pq_m=config.PQ_M,
+        )
+
+    def resolve(self, num_vectors: int) -> str:
+        """The index type to search 'num_vectors' vectors with."""
+        if self.index_type == "flat" or num_vectors < self.min_vectors:
+            return "flat"
+        return self.auto_index_type if self.index_type == "auto" else self.index_type
+
+
+class AnnIndex:
+    """
+    A FAISS approximate-nearest-neighbor index over the rows of an L2-normalized vector matrix.
+
+    It is an accelerator, the matrix stays the source of truth: ANN candidates are re-scored
+    exactly against it, which also undoes the quantization error of IVF-PQ. Vectors appended to
+    the matrix are added incrementally. Deleted rows are filtered out of searches by an ID selector
+    instead of being removed, FAISS cannot remove from HNSW graphs, and the index asks for a
+    rebuild once 'rebuild_fraction' of it is deleted.
+    """
+
+    def __init__(self, index, index_type: str, slot_rows: np.ndarray, params: AnnParams):
+        self.index = index
+        self.index_type = index_type
+        self.params = params
+        # The matrix row every FAISS id points to, -1 once the row is deleted.
+        self.slot_rows = slot_rows
+        self._live_bitmap: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.slot_rows >= 0))
+
+    @property
+    def needs_rebuild(self) -> bool:
+        num_deleted = len(self.slot_rows) - len(self)
+        return num_deleted > self.params.rebuild_fraction * max(len(self.slot_rows), 1)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, index_type: str, params: AnnParams, rows: Optional[np.ndarray] = None) -> "AnnIndex":
+        """
+        Trains an index of the given type on a random sample of the vectors and adds all of them,
+        or only the given rows of the matrix (e.g. the ones not deleted).
+        """
+        import faiss
+
+        if index_type not in INDEX_TYPES or index_type == "flat":
+            raise ValueError(f"Unknown ANN index type '{index_type}', expected one of {INDEX_TYPES[1:]}.")
+
+        started_at = time.perf_counter()
+        rows = np.arange(len(vectors), dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+        num_vectors, dimension = len(rows), vectors.shape[1]
+        factory = cls._factory_string(index_type, num_vectors, dimension, params)
+        index = faiss.index_factory(dimension, factory, faiss.METRIC_INNER_PRODUCT)
+
+        if not index.is_trained:
+            sample_size = min(num_vectors, params.train_sample_size)
+            sample = np.random.default_rng(0).choice(num_vectors, size=sample_size, replace=False)
+            index.train(np.ascontiguousarray(vectors[rows[np.sort(sample)]], dtype=np.float32))
+
+        ann = cls(index, index_type, np.empty(0, dtype=np.int64), params)
+        for start in range(0, num_vectors, ADD_BLOCK_ROWS):
+            block = rows[start:start + ADD_BLOCK_ROWS]
+            ann.add(vectors[block], block)
+
+        logger.info(f"Built '{factory}' index over {num_vectors} vectors in {time.perf_counter() - started_at:.2f}s.")
+        return ann
+
+    @staticmethod
+    def _factory_string(index_type: str, num_vectors: int, dimension: int, params: AnnParams) -> str:
+        if index_type == "hnsw":
+            return f"HNSW{params.hnsw_m}"
+
+        nlist = int(min(4 * math.sqrt(num_vectors), max(num_vectors // MIN_POINTS_PER_CENTROID, 1)))
+        nlist = max(nlist, 1)
+        if index_type == "ivf_flat":
+            return f"IVF{nlist},Flat"
+
+        pq_m = params.pq_m
+        while dimension % pq_m:
+            pq_m -= 1
+        nbits = int(min(8, max(1, math.log2(max(num_vectors // MIN_POINTS_PER_CENTROID, 2)))))
+        return f"IVF{nlist},PQ{pq_m}x{nbits}"
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray):
+        """Adds the vectors of the given matrix rows."""
+        self.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        self.slot_rows = np.concatenate([self.slot_rows, np.asarray(rows, dtype=np.int64)])
+        self._live_bitmap = None
+
+    def delete_rows(self, rows: np.ndarray):
+        """Stops returning the given matrix rows, their vectors stay in the index until it is rebuilt."""
+        self.slot_rows[np.isin(self.slot_rows, rows)] = -1
+        self._live_bitmap = None
+
+    def remap_rows(self, new_rows: np.ndarray):
+        """
+        Follows a deletion in the matrix, 'new_rows' maps every old row to its new row or -1.
+        """
+        live = self.slot_rows >= 0
+        self.slot_rows[live] = new_rows[self.slot_rows[live]]
+        self._live_bitmap = None
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the rows and exact scores of the approximate top-k of a normalized query.
+        With 'rows', only those matrix rows are searched, through the same ID selector as deletes.
+        Fewer than k rows may come back then, e.g. when none of the probed IVF lists holds one of them.
+        """
+        import faiss
+
+        num_candidates = min(k * (self.params.refine_factor if self.index_type == "ivf_pq" else 1), len(self.slot_rows))
+
+        selector = None
+        bitmap = None
+        if rows is not None:
+            bitmap = np.packbits(np.isin(self.slot_rows, rows), bitorder="little")
+        elif len(self) < len(self.slot_rows):
+            if self._live_bitmap is None:
+                self._live_bitmap = np.packbits(self.slot_rows >= 0, bitorder="little")
+            bitmap = self._live_bitmap
+        if bitmap is not None:
+            selector = faiss.IDSelectorBitmap(len(self.slot_rows), faiss.swig_ptr(bitmap))
+
+        if self.index_type == "hnsw":
+            params = faiss.SearchParametersHNSW(efSearch=max(self.params.ef_search, num_candidates), sel=selector)
+        else:
+            params = faiss.SearchParametersIVF(nprobe=self.params.nprobe, sel=selector)
+
+        _, ids = self.index.search(query.reshape(1, -1).astype(np.float32), num_candidates, params=params)
+        rows = self.slot_rows[ids[0][ids[0] >= 0]]
+        rows = np.sort(rows[rows >= 0])
+
+        scores = np.asarray(vectors[rows] @ query)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return rows[top], scores[top]
+
+    def save(self, path: str):
+        import faiss
+
+        faiss.write_index(self.index, f"{path}.faiss")
+        np.save(f"{path}.rows.npy", self.slot_rows)
+
+    @classmethod
+    def load(cls, path: str, index_type: str, params: AnnParams) -> "AnnIndex":
+        import faiss
+
+        return cls(faiss.read_index(f"{path}.faiss"), index_type, np.load(f"{path}.rows.npy"), params)
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class CachedAnswer:
+    query: str
+    answer: str
+    source_urls: Set[str]
+    created_at: float
+    similarity: float = 1.0
+
+
+class AnswerCache:
+    """
+    A semantic cache of final answers, keyed by query embedding.
+
+    A query whose embedding has a cosine similarity of at least 'similarity_threshold' with a
+    cached query gets that query's answer, so paraphrases of a question already answered skip
+    search, scraping and generation. Query vectors are kept L2-normalized in one preallocated
+    float32 matrix and a lookup is a single matrix-vector product. Entries expire after
+    'ttl_seconds', since the web pages behind an answer change, and the least recently used
+    entry is evicted once 'max_entries' are cached.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.92, ttl_seconds: float = 86400, max_entries: int = 1000, clock: Callable[[], float] = time.time):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+        self._vectors: Optional[np.ndarray] = None
+        self._created_at = np.full(max_entries, -np.inf)
+        self._entries: Dict[int, CachedAnswer] = {}
+        # Occupied slots, least recently used first.
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+    def lookup(self, query_vector) -> Optional[CachedAnswer]:
+        """
+        Returns the cached answer of the most similar live query, or None if none reaches the threshold.
+        """
+        query = self._normalize(query_vector)
+
+        with self._lock:
+            if self._vectors is None or not self._entries:
+                self.misses += 1
+                return None
+
+            scores = self._vectors @ query
+            scores[self._created_at <= self.clock() - self.ttl_seconds] = -np.inf
+            slot = int(np.argmax(scores))
+
+            if scores[slot] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._lru.move_to_end(slot)
+            entry = self._entries[slot]
+            return CachedAnswer(entry.query, entry.answer, set(entry.source_urls), entry.created_at, float(scores[slot]))
+
+    def put(self, query: str, query_vector, answer: str, source_urls: Set[str]):
+        """
+        Caches an answer, taking the slot of an expired entry or else of the least recently used one when full.
+        """
+        vector = self._normalize(query_vector)
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+
+            now = self.clock()
+            if len(self._entries) < self.max_entries:
+                slot = len(self._entries)
+            else:
+                expired = np.flatnonzero(self._created_at <= now - self.ttl_seconds)
+                slot = int(expired[0]) if len(expired) else next(iter(self._lru))
+
+            self._vectors[slot] = vector
+            self._created_at[slot] = now
+            self._entries[slot] = CachedAnswer(query, answer, set(source_urls), now)
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._lru.clear()
+            self._created_at[:] = -np.inf
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1)
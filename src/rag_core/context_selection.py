@@ -0,0 +1,137 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.processing.text_processor import Document
+
+
+def mmr_select(
+    query_vector,
+    vectors,
+    k: int,
+    relevance: Optional[Sequence[float]] = None,
+    lambda_mult: float = 0.5,
+    groups: Optional[Sequence[str]] = None,
+    max_per_group: Optional[int] = None
+) -> List[int]:
+    """
+    Picks k candidates by maximal marginal relevance: each pick maximizes
+    'lambda_mult * relevance - (1 - lambda_mult) * max similarity to the candidates picked so far'.
+
+    The candidate similarity matrix is computed once, every pick is then a vectorized update of
+    the redundancy of all remaining candidates. Candidates of a group (e.g. a source URL) that
+    already has 'max_per_group' picks are skipped.
+
+    Args:
+        query_vector: the embedded query.
+        vectors: one embedding per candidate.
+        k: the number of candidates to pick.
+        relevance: the relevance of every candidate, the cosine similarity to the query when None.
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only.
+        groups: the group of every candidate, for 'max_per_group'.
+        max_per_group: the most candidates picked from one group, no limit when None.
+
+    Returns:
+        The indices of the picked candidates, in pick order.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not len(vectors) or k <= 0:
+        return []
+
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    if relevance is None:
+        query = np.asarray(query_vector, dtype=np.float32)
+        relevance = vectors @ (query / (np.linalg.norm(query) or 1))
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    similarity = vectors @ vectors.T
+    redundancy = np.zeros(len(vectors), dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+
+    if groups is not None and max_per_group:
+        _, group_ids = np.unique(np.asarray(groups), return_inverse=True)
+        group_counts = np.zeros(group_ids.max() + 1, dtype=np.int64)
+    else:
+        group_ids = None
+
+    selected = []
+    while len(selected) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        pick = int(np.argmax(np.where(available, scores, -np.inf)))
+
+        selected.append(pick)
+        available[pick] = False
+        redundancy = similarity[pick] if len(selected) == 1 else np.maximum(redundancy, similarity[pick])
+
+        if group_ids is not None:
+            group_counts[group_ids[pick]] += 1
+            if group_counts[group_ids[pick]] >= max_per_group:
+                available &= group_ids != group_ids[pick]
+
+    return selected
+
+
+def merge_adjacent_chunks(documents: List[Document]) -> List[Document]:
+    """
+    Merges chunks of the same source that are neighbors on the page into one span.
+
+    Neighbors are chunks with consecutive 'chunk_index' values. When both carry a 'start_index',
+    the text they share through the chunk overlap is dropped exactly, otherwise they are joined
+    by a newline. A merged span takes the place of its best-ranked chunk.
+
+    Args:
+        documents: the context chunks, best first.
+
+    Returns:
+        The merged documents, best first.
+    """
+    spans: Dict[int, List[Document]] = {}
+    span_of: Dict[tuple, int] = {}
+
+    for position, doc in enumerate(documents):
+        url, chunk_index = doc.metadata["source_url"], doc.metadata.get("chunk_index")
+        if chunk_index is None:
+            spans[position] = [doc]
+            continue
+
+        neighbors = {span_of.get((url, chunk_index - 1)), span_of.get((url, chunk_index + 1))} - {None}
+        if not neighbors:
+            spans[position] = [doc]
+            span_of[(url, chunk_index)] = position
+            continue
+
+        # The chunk joins the earliest ranked neighboring span, and bridges it with the other one if it has two.
+        target, *others = sorted(neighbors)
+        spans[target].append(doc)
+        span_of[(url, chunk_index)] = target
+        for other in others:
+            for moved in spans.pop(other):
+                spans[target].append(moved)
+                span_of[(url, moved.metadata["chunk_index"])] = target
+
+    return [_join_span(chunks) if len(chunks) > 1 else chunks[0] for _, chunks in sorted(spans.items())]
+
+
+def _join_span(chunks: List[Document]) -> Document:
+    chunks = sorted(chunks, key=lambda doc: doc.metadata["chunk_index"])
+
+    text = chunks[0].page_content
+    end = _end_index(chunks[0])
+    for doc in chunks[1:]:
+        start = doc.metadata.get("start_index")
+        if end is not None and start is not None and start <= end:
+            text += doc.page_content[end - start:]
+        else:
+            text += "\n" + doc.page_content
+
+        doc_end = _end_index(doc)
+        end = max(end, doc_end) if end is not None and doc_end is not None else doc_end
+
+    metadata = dict(chunks[0].metadata)
+    metadata["chunk_indices"] = [doc.metadata["chunk_index"] for doc in chunks]
+    return Document(page_content=text, metadata=metadata)
+
+
+def _end_index(doc: Document) -> Optional[int]:
+    start = doc.metadata.get("start_index")
+    return None if start is None else start + len(doc.page_content)
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+SQLITE_MAX_VARIABLES = 900
+
+
+class EmbeddingCache:
+    """
+    A content-addressed cache of embedding vectors.
+
+    Keys are the sha256 of the embedding model id and the chunk text, so the same text is only
+    ever encoded once per model. Vectors are float32 arrays held in an in-memory LRU and
+    backed by a SQLite file, so the cache survives restarts.
+    """
+
+    def __init__(self, model_id: str, path: Optional[str] = None, max_entries: int = 10000):
+        self.model_id = model_id
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries_in_memory": len(self._memory),
+        }
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_id}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> List[np.ndarray]:
+        """
+        Returns one vector per text, only the texts missing from the cache are sent to 'embed_fn', in a single batch.
+
+        Args:
+            texts: the texts to embed.
+            embed_fn: a function embedding a list of texts, e.g. 'HuggingFaceEmbeddings.embed_documents'.
+
+        Returns:
+            A list of float32 vectors in the same order as 'texts'.
+        """
+        keys = [self.key(text) for text in texts]
+
+        with self._lock:
+            found = self._get_many(keys)
+
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in found:
+                    missing.setdefault(key, text)
+
+            num_missing = sum(key not in found for key in keys)
+            self.hits += len(keys) - num_missing
+            self.misses += num_missing
+
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+
+            with self._lock:
+                self._put_many(computed)
+            found.update(computed)
+
+        logger.debug(f"Embedding cache: {len(keys) - len(missing)} hits, {len(missing)} encoded, hit rate {self.stats['hit_rate']:.1%} overall.")
+        return [found[key] for key in keys]
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+        return self._connection
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+
+        db = self._db()
+        remaining = list({key for key in keys if key not in found})
+        if db is None or not remaining:
+            return found
+
+        for start in range(0, len(remaining), SQLITE_MAX_VARIABLES):
+            batch = remaining[start:start + SQLITE_MAX_VARIABLES]
+            rows = db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                found[key] = vector
+                self._remember(key, vector)
+
+        return found
+
+    def _put_many(self, vectors: Dict[str, np.ndarray]):
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+
+        db = self._db()
+        if db is None:
+            return
+
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.tobytes()) for key, vector in vectors.items()]
+            )
@@ -1,15 +1,98 @@
+import copy
+import time
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
-from typing import List
+from collections import OrderedDict
+from threading import Event, Thread
+from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+from typing import Iterator, List, Tuple
 
 import logging
 
 from src import config
 from src.processing.text_processor import Document
+from src.rag_core.context_selection import merge_adjacent_chunks
+from src.utils.helpers import resident_memory_mb
 
 
 logger = logging.getLogger(__name__)
 
+ANSWER_MARKER = "**Answer:**"
+
+NO_CONTEXT_ANSWER = "I could not find any relevant information to answer your query."
+
+# The static instruction block every prompt starts with, its past-key-values are computed once
+# at load time. It ends on a newline so the tokenization boundary with the context is stable.
+PROMPT_PREFIX = """
+        **Instruction:**
+        You are an AI assistant. Your task is to provide a clear and concise answer to the following user query based ONLY on the provided context.
+        Do not use any external knowledge. If the context does not contain the answer, state that you cannot answer based on the information given.
+        Cite the source URL for the information you use.
+
+        **Context:**
+"""
+
+GENERATOR_BACKENDS = {
+    "bnb-4bit": "_load_bnb_4bit",
+    "int8-dynamic": "_load_int8_dynamic",
+    "bf16-compile": "_load_bf16_compile",
+    "onnx": "_load_onnx",
+}
+
+
+class AnswerStreamFilter:
+    """
+    Incrementally cleans streamed model output the way 'generate_answer' cleans the full text:
+    leading whitespace and an echoed '**Answer:**' marker are dropped, everything after is passed through.
+    """
+
+    def __init__(self, marker: str = ANSWER_MARKER):
+        self.marker = marker
+        self._buffer = ""
+        self._marker_checked = False
+        self._started = False
+
+    def feed(self, text: str) -> str:
+        """Returns the part of 'text' that can already be shown, possibly empty."""
+        if self._started:
+            return text
+
+        self._buffer += text
+        head = self._buffer.lstrip()
+
+        if not self._marker_checked:
+            if len(head) < len(self.marker) and self.marker.startswith(head):
+                return ""
+
+            self._marker_checked = True
+            if head.startswith(self.marker):
+                head = head[len(self.marker):].lstrip()
+
+        self._buffer = ""
+        if not head:
+            return ""
+
+        self._started = True
+        return head
+
+    def flush(self) -> str:
+        """Returns whatever was held back when the stream ended."""
+        head = "" if self._started else self._buffer.lstrip()
+        self._buffer = ""
+        return head
+
+
+class StopOnEvent(StoppingCriteria):
+    """
+    Stops 'model.generate' at the next token once 'event' is set, e.g. when the consumer of a stream went away.
+    """
+
+    def __init__(self, event: Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
 class Generator:
     """
     Manages a locally-run Hugging Face model for text generation.
@@ -21,6 +104,9 @@ class Generator:
             cls._instance = super(Generator, cls).__new__(cls)
             cls._instance.model = None
             cls._instance.tokenizer = None
+            cls._instance.prefix_cache = None
+            cls._instance._token_counts = OrderedDict()
+            cls._instance.context_stats = {"queries": 0, "chunks_merged": 0, "tokens_saved": 0}
         else:
             logger.warning(f"generator already defined, 'Generator' class should only be instantiated once.")
 
@@ -28,54 +114,259 @@ class Generator:
 
     def load_model(self):
         """
-        Initializes the Generator by loading the LLM model.
+        Initializes the Generator by loading the LLM model with the backend selected by 'config.GENERATOR_BACKEND'.
         This is a resource-intensive operation and should be done only once.
         """
         if self.model is None:
             logger.info("Initializing local generator...")
             self.device = config.DEVICE
             self.model_id = config.MODEL_ID
+            self.backend = self._resolve_backend()
 
-            try:
-                bnb_config = BitsAndBytesConfig(
-                    load_in_4bit=True,
-                    bnb_4bit_quant_type="nf4",
-                    bnb_4bit_compute_dtype=torch.bfloat16,
-                    llm_int8_enable_fp32_cpu_offload=True
-                )
+            started_at = time.perf_counter()
 
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    self.model_id,
-                    quantization_config=bnb_config,
-                    cache_dir=str(config.HF_HOME),
-                    device_map="auto"
-                )
+            try:
+                self.model = getattr(self, GENERATOR_BACKENDS[self.backend])()
 
                 self.tokenizer = AutoTokenizer.from_pretrained(self.model_id, cache_dir=str(config.HF_HOME))
             except Exception as e :
                 logger.error(f"Could Not load Generator Model, original error message: {e}")
                 return
 
-            logger.info("Model and tokenizer loaded successfully.")
+            memory_mb = resident_memory_mb()
+            logger.info(
+                f"Model and tokenizer loaded successfully with the '{self.backend}' backend in "
+                f"{time.perf_counter() - started_at:.1f}s"
+                + (f", resident memory {memory_mb:.0f} MB." if memory_mb is not None else ".")
+            )
+
+            self._build_prefix_cache()
         else:
             logger.warning(f"Generator Model already loaded, 'generator.load_model' should only be called once.")
 
+    def _resolve_backend(self) -> str:
+        backend = config.GENERATOR_BACKEND
+
+        if backend == "auto":
+            return "bnb-4bit" if self.device == "cuda" else "int8-dynamic"
+
+        if backend == "bnb-4bit" and self.device != "cuda":
+            logger.warning("The 'bnb-4bit' backend needs a GPU, falling back to 'int8-dynamic' on cpu.")
+            return "int8-dynamic"
+
+        return backend
+
+    def _load_bnb_4bit(self):
+        bnb_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.bfloat16,
+            llm_int8_enable_fp32_cpu_offload=True
+        )
+
+        return AutoModelForCausalLM.from_pretrained(
+            self.model_id,
+            quantization_config=bnb_config,
+            cache_dir=str(config.HF_HOME),
+            device_map="auto"
+        )
+
+    def _load_int8_dynamic(self):
+        """fp32 weights with every 'nn.Linear' dynamically quantized to int8, the fastest plain-torch path on cpu."""
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_id,
+            torch_dtype=torch.float32,
+            cache_dir=str(config.HF_HOME)
+        )
+        model.eval()
+
+        try:
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            logger.warning(f"Could Not quantize Generator Model to int8, using fp32 weights, original error message: {e}")
+            return model
+
+    def _load_bf16_compile(self):
+        """bf16 weights with the forward pass compiled by 'torch.compile', for cpus with native bf16 support."""
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_id,
+            torch_dtype=torch.bfloat16,
+            cache_dir=str(config.HF_HOME)
+        )
+        model.eval()
+
+        try:
+            model.forward = torch.compile(model.forward)
+        except Exception as e:
+            logger.warning(f"Could Not compile Generator Model, running it eagerly, original error message: {e}")
+
+        return model
+
+    def _load_onnx(self):
+        """An ONNX Runtime export of the model, needs the optional 'optimum[onnxruntime]' package."""
+        try:
+            from optimum.onnxruntime import ORTModelForCausalLM
+        except ImportError:
+            logger.warning("The 'onnx' backend needs 'optimum[onnxruntime]' installed, falling back to 'int8-dynamic'.")
+            self.backend = "int8-dynamic"
+            return self._load_int8_dynamic()
+
+        return ORTModelForCausalLM.from_pretrained(self.model_id, export=True, cache_dir=str(config.HF_HOME))
+
+    def _build_prefix_cache(self):
+        """
+        Prefills the static 'PROMPT_PREFIX' once and keeps its past-key-values, so each request
+        only prefills from the context onward. Controlled by 'config.PREFIX_CACHE_ENABLED'.
+        """
+        self.prefix_cache = None
+        self.prefix_cache_stats = {"hits": 0, "misses": 0, "saved_ms": 0.0}
+
+        if not config.PREFIX_CACHE_ENABLED:
+            logger.info("Prefix cache disabled, every request prefills the full prompt.")
+            return
+
+        if self.backend == "onnx":
+            logger.info("Prefix cache is not supported by the 'onnx' backend.")
+            return
+
+        try:
+            self.prefix_ids = self.tokenizer(PROMPT_PREFIX, return_tensors="pt")["input_ids"].to(self.device)
+
+            started_at = time.perf_counter()
+            with torch.no_grad():
+                self.prefix_cache = self.model(input_ids=self.prefix_ids, use_cache=True).past_key_values
+            self.prefix_prefill_ms = (time.perf_counter() - started_at) * 1000
+        except Exception as e:
+            self.prefix_cache = None
+            logger.warning(f"Could Not build the prompt prefix cache, original error message: {e}")
+            return
+
+        logger.info(f"Cached past-key-values for the {self.prefix_ids.shape[-1]}-token prompt prefix (prefill took {self.prefix_prefill_ms:.0f} ms).")
+
+    def _prefix_cache_kwargs(self, input_ids) -> dict:
+        """
+        Returns the 'generate' kwargs that reuse the cached prefix, or nothing when the prompt does
+        not start with the exact prefix tokens (e.g. batched, left-padded prompts).
+        """
+        if self.prefix_cache is None:
+            return {}
+
+        prefix_length = self.prefix_ids.shape[-1]
+        if (
+            input_ids.shape[0] != 1
+            or input_ids.shape[-1] <= prefix_length
+            or not torch.equal(input_ids[0, :prefix_length], self.prefix_ids[0])
+        ):
+            self.prefix_cache_stats["misses"] += 1
+            return {}
+
+        self.prefix_cache_stats["hits"] += 1
+        self.prefix_cache_stats["saved_ms"] += self.prefix_prefill_ms
+        logger.info(f"Reusing cached prompt prefix ({prefix_length} tokens), saving ~{self.prefix_prefill_ms:.0f} ms of prefill.")
+
+        return {"past_key_values": copy.deepcopy(self.prefix_cache)}
+
+    def _log_throughput(self, num_new_tokens: int, started_at: float):
+        elapsed = time.perf_counter() - started_at
+        tokens_per_second = num_new_tokens / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Generated {num_new_tokens} tokens in {elapsed:.2f}s ({tokens_per_second:.1f} tokens/sec, '{self.backend}' backend).")
+
+
+    @property
+    def _max_prompt_tokens(self) -> int:
+        return config.GENERATION_CONTEXT_WINDOW - config.GENERATION_MAX_NEW_TOKENS
+
+    @staticmethod
+    def _format_context_doc(doc: Document) -> str:
+        return f"Source URL: {doc.metadata['source_url']}\nContent: {doc.page_content}"
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Returns the number of tokens in 'text', counts are cached so every chunk is only tokenized once.
+        """
+        count = self._token_counts.get(text)
+        if count is not None:
+            self._token_counts.move_to_end(text)
+            return count
+
+        count = len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+        self._token_counts[text] = count
+        if len(self._token_counts) > config.TOKEN_COUNT_CACHE_SIZE:
+            self._token_counts.popitem(last=False)
+
+        return count
+
+    def pack_context(self, query: str, context_docs: List[Document]) -> List[Document]:
+        """
+        Selects the highest-ranked context documents that fit the token budget, instead of letting
+        the tokenizer truncate the end of the prompt (which holds the query and answer marker).
+
+        The budget is 'config.GENERATION_CONTEXT_TOKEN_BUDGET', capped by what the context window has left
+        once the prompt without context and 'config.GENERATION_MAX_NEW_TOKENS' are accounted for.
+        When no document fits, nothing is returned and the callers answer with 'NO_CONTEXT_ANSWER'
+        rather than letting the model answer from its own memory.
+        With 'config.MERGE_ADJACENT_CHUNKS', neighboring chunks of a page are first merged into one span,
+        which drops their overlap and repeated source headers, and the prompt tokens saved are logged.
+
+        Args:
+            query: the user's query.
+            context_docs: the retrieved documents, best first.
+
+        Returns:
+            The documents to put in the prompt, in their original order, empty when none fits.
+        """
+        if not context_docs:
+            return context_docs
+
+        if config.MERGE_ADJACENT_CHUNKS:
+            context_docs = self._merge_context(context_docs)
+
+        fixed_tokens = self.count_tokens(self._build_prompt(query, []))
+        separator_tokens = self.count_tokens("\n\n")
+        budget = max(min(config.GENERATION_CONTEXT_TOKEN_BUDGET, self._max_prompt_tokens - fixed_tokens), 0)
+
+        packed = []
+        used = 0
+        for doc in context_docs:
+            doc_tokens = self.count_tokens(self._format_context_doc(doc)) + (separator_tokens if packed else 0)
+            if used + doc_tokens > budget:
+                continue
+
+            packed.append(doc)
+            used += doc_tokens
+
+        if len(packed) < len(context_docs):
+            logger.info(f"Packed {len(packed)} of {len(context_docs)} context chunks into {used}/{budget} context tokens.")
+        if not packed:
+            logger.warning(f"No context chunk fits the token budget of {budget} tokens, answering without generation.")
+
+        return packed
+
+    def _context_tokens(self, context_docs: List[Document]) -> int:
+        separator_tokens = self.count_tokens("\n\n")
+        return sum(self.count_tokens(self._format_context_doc(doc)) for doc in context_docs) + separator_tokens * (len(context_docs) - 1)
+
+    def _merge_context(self, context_docs: List[Document]) -> List[Document]:
+        merged = merge_adjacent_chunks(context_docs)
+        self.context_stats["queries"] += 1
+        if len(merged) == len(context_docs):
+            return merged
+
+        tokens_saved = self._context_tokens(context_docs) - self._context_tokens(merged)
+        self.context_stats["chunks_merged"] += len(context_docs) - len(merged)
+        self.context_stats["tokens_saved"] += tokens_saved
+        logger.info(f"Merged {len(context_docs)} context chunks into {len(merged)} spans, saving {tokens_saved} prompt tokens.")
+        return merged
 
     def _build_prompt(self, query: str, context_docs: List[Document]) -> str:
         """
         Builds a structured prompt for the LLM using the retrieved context.
         """
         
-        context_str = "\n\n".join([f"Source URL: {doc.metadata['source_url']}\nContent: {doc.page_content}" for doc in context_docs])
-
-        prompt = f"""
-        **Instruction:**
-        You are an AI assistant. Your task is to provide a clear and concise answer to the following user query based ONLY on the provided context.
-        Do not use any external knowledge. If the context does not contain the answer, state that you cannot answer based on the information given.
-        Cite the source URL for the information you use.
+        context_str = "\n\n".join([Generator._format_context_doc(doc) for doc in context_docs])
 
-        **Context:**
-        {context_str}
+        prompt = PROMPT_PREFIX + f"""        {context_str}
 
         **User Query:**
         {query}
@@ -88,20 +379,143 @@ class Generator:
         """
         Generates an answer based on the query and the provided context documents.
         """
+        context_docs = self.pack_context(query, context_docs)
         if not context_docs:
-            return "I could not find any relevant information to answer your query."
+            return NO_CONTEXT_ANSWER
 
         prompt = self._build_prompt(query, context_docs)
 
-        inputs = self.tokenizer(prompt, return_tensors="pt", max_length=4096, truncation=True).to(self.device)
+        inputs = self.tokenizer(prompt, return_tensors="pt", max_length=self._max_prompt_tokens, truncation=True).to(self.device)
 
-        outputs = self.model.generate(**inputs, max_new_tokens=512, pad_token_id=self.tokenizer.eos_token_id)
+        started_at = time.perf_counter()
+
+        outputs = self.model.generate(
+            **inputs,
+            **self._prefix_cache_kwargs(inputs["input_ids"]),
+            max_new_tokens=config.GENERATION_MAX_NEW_TOKENS,
+            pad_token_id=self.tokenizer.eos_token_id
+        )
+
+        self._log_throughput(int(outputs.shape[-1]) - int(inputs["input_ids"].shape[-1]), started_at)
         
         generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
 
-        answer_marker = "**Answer:**"
-        answer_position = generated_text.find(answer_marker)
+        return self._extract_answer(generated_text)
+
+    @staticmethod
+    def _extract_answer(generated_text: str) -> str:
+        answer_position = generated_text.find(ANSWER_MARKER)
         if answer_position != -1:
-            return generated_text[answer_position + len(answer_marker):].strip()
+            return generated_text[answer_position + len(ANSWER_MARKER):].strip()
         
-        return generated_text.strip()
\ No newline at end of file
+        return generated_text.strip()
+
+    def generate_batch(self, requests: List[Tuple[str, List[Document]]]) -> List[str]:
+        """
+        Generates answers for several (query, context_docs) requests with a single batched 'model.generate' call.
+        Prompts are left-padded so every sequence ends right where generation starts.
+
+        Args:
+            requests: a list of (query, context_docs) pairs.
+
+        Returns:
+            One answer per request, in the same order.
+        """
+        answers = [NO_CONTEXT_ANSWER] * len(requests)
+        to_generate = []
+        prompts = []
+        for i, (query, context_docs) in enumerate(requests):
+            context_docs = self.pack_context(query, context_docs)
+            if context_docs:
+                to_generate.append(i)
+                prompts.append(self._build_prompt(query, context_docs))
+
+        if not to_generate:
+            return answers
+
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        # Padding side is set for this call only, the tokenizer is shared with every other encode.
+        inputs = self.tokenizer(
+            prompts, return_tensors="pt", padding=True, padding_side="left", max_length=self._max_prompt_tokens, truncation=True
+        ).to(self.device)
+
+        started_at = time.perf_counter()
+
+        outputs = self.model.generate(**inputs, max_new_tokens=config.GENERATION_MAX_NEW_TOKENS, pad_token_id=self.tokenizer.pad_token_id)
+
+        # Sequences that finished early are padded up to the longest one, the padding is not generated text.
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+        self._log_throughput(int((new_tokens != self.tokenizer.pad_token_id).sum()), started_at)
+
+        generated_texts = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
+        for i, generated_text in zip(to_generate, generated_texts):
+            answers[i] = self._extract_answer(generated_text)
+
+        return answers
+
+    def generate_answer_stream(self, query: str, context_docs: List[Document]) -> Iterator[str]:
+        """
+        Generates an answer like 'generate_answer', but yields text deltas as tokens are produced.
+        The prompt is never decoded and the answer marker is stripped as the text streams in.
+        When the consumer stops iterating early (closed client, Ctrl-C), generation stops at the next token.
+        """
+        context_docs = self.pack_context(query, context_docs)
+        if not context_docs:
+            yield NO_CONTEXT_ANSWER
+            return
+
+        prompt = self._build_prompt(query, context_docs)
+
+        inputs = self.tokenizer(prompt, return_tensors="pt", max_length=self._max_prompt_tokens, truncation=True).to(self.device)
+
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        prefix_cache_kwargs = self._prefix_cache_kwargs(inputs["input_ids"])
+        generated = {}
+        stop_generation = Event()
+
+        def run_generation():
+            try:
+                generated["outputs"] = self.model.generate(
+                    **inputs,
+                    **prefix_cache_kwargs,
+                    max_new_tokens=config.GENERATION_MAX_NEW_TOKENS,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([StopOnEvent(stop_generation)])
+                )
+            except Exception as e:
+                # 'generate' only ends the stream when it finishes, without the end signal the consumer would wait forever.
+                generated["error"] = e
+                streamer.end()
+
+        started_at = time.perf_counter()
+
+        generation = Thread(target=run_generation, daemon=True)
+        generation.start()
+
+        answer_filter = AnswerStreamFilter()
+        try:
+            for text in streamer:
+                delta = answer_filter.feed(text)
+                if delta:
+                    yield delta
+
+            tail = answer_filter.flush()
+            if tail:
+                yield tail
+        finally:
+            # Without it the thread would keep the model busy until 'max_new_tokens' after the consumer left.
+            stop_generation.set()
+
+        generation.join()
+
+        if "error" in generated:
+            logger.error(f"Streamed generation failed, original error message: {generated['error']}")
+            raise generated["error"]
+
+        if "outputs" in generated:
+            self._log_throughput(int(generated["outputs"].shape[-1]) - int(inputs["input_ids"].shape[-1]), started_at)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.processing.text_processor import Document
+
+
+logger = logging.getLogger(__name__)
+
+ScoreFn = Callable[[List[Tuple[str, str]]], Sequence[float]]
+
+
+class Reranker:
+    """
+    Re-orders retrieved chunks by a cross-encoder's relevance score.
+
+    The bi-encoder embeds query and chunk separately, a cross-encoder reads them together and
+    ranks far more precisely, but costs one forward pass per pair. So only a candidate pool is
+    scored, in batches and in retrieval order: with a latency budget, batches stop once the next
+    one would not fit, and the unscored rest of the pool keeps its retrieval order behind the
+    scored candidates.
+    """
+
+    def __init__(self, score_fn: ScoreFn, batch_size: int = 16, budget_ms: Optional[float] = None):
+        self.score_fn = score_fn
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.calls = 0
+        self.pairs_scored = 0
+        self.pairs_skipped = 0
+        self.total_ms = 0.0
+
+    @classmethod
+    def from_pretrained(cls, model_id: str, device: Optional[str] = None, cache_dir: Optional[str] = None, batch_size: int = 16, budget_ms: Optional[float] = None) -> "Reranker":
+        """
+        Loads a sentence-transformers cross-encoder, e.g. 'cross-encoder/ms-marco-MiniLM-L-6-v2'.
+        """
+        from sentence_transformers import CrossEncoder
+
+        model = CrossEncoder(model_id, device=device, cache_folder=cache_dir)
+
+        def score_fn(pairs: List[Tuple[str, str]]) -> np.ndarray:
+            return model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+
+        return cls(score_fn, batch_size, budget_ms)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "pairs_scored": self.pairs_scored,
+            "pairs_skipped": self.pairs_skipped,
+            "avg_ms": self.total_ms / self.calls if self.calls else 0.0,
+        }
+
+    def rerank(self, query: str, documents: List[Document], k: int) -> List[Tuple[Document, float]]:
+        """
+        Scores the candidates against the query and returns the best k.
+
+        Args:
+            query: the user's query.
+            documents: the candidate pool, best retrieval rank first.
+            k: the number of documents to return.
+
+        Returns:
+            A list of (Document, cross-encoder score) pairs, best first. Candidates the budget left
+            unscored follow the scored ones in retrieval order, with a score of -inf.
+        """
+        if not documents or k <= 0:
+            return []
+
+        started_at = time.perf_counter()
+        scores: List[float] = []
+        batch_ms = 0.0
+
+        for start in range(0, len(documents), self.batch_size):
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            if scores and self.budget_ms and elapsed_ms + batch_ms > self.budget_ms:
+                break
+
+            batch_started_at = time.perf_counter()
+            batch = documents[start:start + self.batch_size]
+            scores.extend(float(score) for score in self.score_fn([(query, doc.page_content) for doc in batch]))
+            batch_ms = (time.perf_counter() - batch_started_at) * 1000
+
+        order = np.argsort(-np.asarray(scores), kind="stable")
+        ranked = [(documents[i], scores[i]) for i in order]
+        ranked += [(doc, float("-inf")) for doc in documents[len(scores):]]
+
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        self.calls += 1
+        self.pairs_scored += len(scores)
+        self.pairs_skipped += len(documents) - len(scores)
+        self.total_ms += elapsed_ms
+
+        if len(scores) < len(documents):
+            logger.warning(f"Rerank budget of {self.budget_ms:.0f}ms reached, scored {len(scores)} of {len(documents)} candidates.")
+        logger.info(f"Reranked {len(scores)} candidates in {elapsed_ms:.1f}ms.")
+        return ranked[:k]
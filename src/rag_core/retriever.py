@@ -1,11 +1,18 @@
-from typing import List
-from langchain_community.vectorstores import FAISS
+from typing import Iterable, List, Optional, Set
 from langchain_huggingface import HuggingFaceEmbeddings
+import numpy as np
 
+import itertools
 import logging
+import time
 
 from src import config
 from src.processing.text_processor import Document
+from src.rag_core.ann_index import AnnParams
+from src.rag_core.context_selection import mmr_select
+from src.rag_core.embedding_cache import EmbeddingCache
+from src.rag_core.reranker import Reranker
+from src.rag_core.vector_index import VectorIndex
 
 
 logger = logging.getLogger(__name__)
@@ -20,6 +27,8 @@ class Retriever:
         if cls._instance is None:
             cls._instance = super(Retriever, cls).__new__(cls)
             cls._instance.embedding_model = None
+            cls._instance.embedding_cache = None
+            cls._instance.reranker = None
         else:
             logger.warning(f"retriever already defined, 'Retriever' class should only be instantiated once.")
         return cls._instance
@@ -44,43 +53,97 @@ class Retriever:
                 logger.error(f'Could Not load Retriever Model, original error message: {e}')
                 return
 
-            self.vector_store = None
+            self.embedding_cache = EmbeddingCache(
+                model_id=config.EMBEDDING_MODEL_ID,
+                path=config.EMBEDDING_CACHE_PATH,
+                max_entries=config.EMBEDDING_CACHE_SIZE
+            )
+
+            if config.RERANK_ENABLED:
+                try:
+                    self.reranker = Reranker.from_pretrained(
+                        config.RERANKER_MODEL_ID,
+                        device=config.DEVICE,
+                        cache_dir=str(config.HF_HOME),
+                        batch_size=config.RERANK_BATCH_SIZE,
+                        budget_ms=config.RERANK_BUDGET_MS
+                    )
+                except Exception as e :
+                    logger.error(f'Could Not load Reranker Model, retrieving without reranking, original error message: {e}')
+
+            index = VectorIndex.load(config.VECTOR_INDEX_DIR, AnnParams.from_config())
+            self.vector_store = index if len(index) else None
 
             logger.info("Embedding model loaded.")
         
         else:
             logger.warning(f"Retriever Model already loaded, 'retriever.load_model' should only be called once.")
 
-    def build_vector_store(self, documents: List[Document]):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
-        Builds the FAISS vector store from a list of processed documents.
+        Embeds a list of texts, going through the embedding cache when one is set up.
+        Only cache misses are sent to the embedding model, in a single batch.
+        """
+        if self.embedding_cache is None:
+            return self.embedding_model.embed_documents(texts)
+
+        vectors = self.embedding_cache.embed(texts, self.embedding_model.embed_documents)
+        logger.info(f"Embedding cache stats: {self.embedding_cache.stats}")
+        return vectors
+
+    def build_vector_store(self, documents: Iterable[Document]):
+        """
+        Upserts processed documents into the persistent vector index.
+        Chunks already embedded for an earlier query (same source URL and content) are reused.
+
+        'documents' may be a generator such as 'iter_chunks', new chunks are embedded in batches of
+        'config.EMBEDDING_BATCH_SIZE' as they stream in, so memory is bounded by the batch size
+        rather than by the number of chunks.
 
         Args:
-            documents: A list of Document objects from the text processor.
+            documents: A list or iterator of Document objects from the text processor.
         """
 
-        if not documents:
+        documents = iter(documents)
+        first = next(documents, None)
+        if first is None:
             logger.warning("No documents provided to build vector store.")
             return
 
-        logger.info(f"Building vector store from {len(documents)} document chunks...")
-        texts = [doc.page_content for doc in documents]
-        metadatas = [doc.metadata for doc in documents]
-        
-        self.vector_store = FAISS.from_texts(
-            texts=texts,
-            embedding=self.embedding_model,
-            metadatas=metadatas
-        )
+        num_chunks = 0
+        def counted():
+            nonlocal num_chunks
+            for doc in itertools.chain([first], documents):
+                num_chunks += 1
+                yield doc
 
-        logger.info("Vector store built successfully.")
+        logger.info("Updating vector store with streamed document chunks...")
 
-    def retrieve_context(self, query: str) -> List[Document]:
+        if self.vector_store is None:
+            self.vector_store = VectorIndex(config.VECTOR_INDEX_DIR, AnnParams.from_config())
+
+        num_embedded = self.vector_store.upsert(counted(), embed_fn=self.embed_documents, batch_size=config.EMBEDDING_BATCH_SIZE)
+        self.vector_store.save()
+
+        logger.info(f"Vector store updated successfully: embedded {num_embedded} new chunks, reused {num_chunks - num_embedded}, {len(self.vector_store)} chunks indexed.")
+
+    def retrieve_context(self, query: str, query_vector: Optional[List[float]] = None, source_urls: Optional[Set[str]] = None) -> List[Document]:
         """
         Retrieves the most relevant document chunks for a given query.
 
+        'config.RETRIEVAL_MODE' picks the ranking: 'dense' embeds the query and searches the vectors,
+        'sparse' only runs BM25 over the chunk text, and 'hybrid' fuses both with reciprocal rank fusion.
+        With a reranker loaded, 'config.RERANK_POOL_SIZE' candidates are retrieved and the reranker orders them.
+        With 'config.MMR_ENABLED', the final chunks are picked from the candidates by maximal marginal relevance,
+        so near-identical chunks and too many chunks of one source do not crowd out the rest.
+
+        The vector store persists across queries, so with 'source_urls' only the chunks of those pages
+        (the ones scraped for this query) are searched, unless 'config.RETRIEVE_FROM_ALL_SOURCES' is set.
+
         Args:
             query: The user's query string.
+            query_vector: The embedded query if the caller already has it, embedded here otherwise.
+            source_urls: The pages retrieval is restricted to, no context is found when it is empty.
 
         Returns:
             A list of the most relevant Document objects.
@@ -89,16 +152,73 @@ class Retriever:
             logger.error("Vector store has not been built yet.")
             return []
 
-        logger.info(f"Retrieving context for query: '{query}'...")
-        retrieved_docs = self.vector_store.similarity_search(
-            query=query,
-            k=config.NUM_RETRIEVED_DOCS
+        if config.RETRIEVE_FROM_ALL_SOURCES:
+            source_urls = None
+        if source_urls is not None and not source_urls:
+            logger.warning("No pages were indexed for this query, no context to retrieve.")
+            return []
+
+        logger.info(f"Retrieving context for query: '{query}' ({config.RETRIEVAL_MODE} retrieval)...")
+        k = config.NUM_RETRIEVED_DOCS
+        num_candidates = max(config.RERANK_POOL_SIZE, k) if self.reranker is not None else k
+        if config.MMR_ENABLED:
+            num_candidates = max(config.MMR_POOL_SIZE, num_candidates)
+
+        started_at = time.perf_counter()
+        if config.RETRIEVAL_MODE != "sparse" and query_vector is None:
+            query_vector = self.embedding_model.embed_query(query)
+
+        if config.RETRIEVAL_MODE == "sparse":
+            results = self.vector_store.keyword_search(query, k=num_candidates, source_urls=source_urls)
+        elif config.RETRIEVAL_MODE == "hybrid":
+            results = self.vector_store.hybrid_search(
+                query_vector, query, k=num_candidates, num_candidates=config.HYBRID_NUM_CANDIDATES, rrf_k=config.RRF_K, source_urls=source_urls
+            )
+        else:
+            results = self.vector_store.search(query_vector, k=num_candidates, source_urls=source_urls)
+
+        custom_docs = [doc for doc, _ in results]
+        logger.info(f"Retrieved {len(custom_docs)} relevant document chunks in {(time.perf_counter() - started_at) * 1000:.1f}ms.")
+
+        # Dense results are ranked by the similarity MMR computes itself, BM25 and fused scores are passed on.
+        relevance = [score for _, score in results] if config.RETRIEVAL_MODE != "dense" else None
+        if self.reranker is not None:
+            reranked = self.reranker.rerank(query, custom_docs, len(custom_docs) if config.MMR_ENABLED else k)
+            custom_docs = [doc for doc, _ in reranked]
+            relevance = [score for _, score in reranked]
+            logger.info(f"Reranker stats: {self.reranker.stats}")
+
+        if config.MMR_ENABLED and custom_docs:
+            custom_docs = self._select_diverse(query_vector, custom_docs, relevance, k)
+
+        return custom_docs
+
+    def _select_diverse(self, query_vector, documents: List[Document], relevance, k: int) -> List[Document]:
+        """
+        Picks k of the candidates by maximal marginal relevance, at most 'config.MAX_CHUNKS_PER_SOURCE' per source URL.
+        Retrieval or reranker scores, when given, are scaled to [0, 1] and replace the similarity to the query as relevance.
+        When none of them is finite (e.g. a reranker returning NaN), relevance falls back to the order the candidates came in.
+        """
+        if relevance is not None:
+            scores = np.asarray(relevance, dtype=np.float32)
+            finite = np.isfinite(scores)
+            if not finite.any():
+                logger.warning(f"None of the {len(scores)} relevance scores is finite, ranking the candidates by their order.")
+                relevance = 1 - np.arange(len(scores), dtype=np.float32) / len(scores)
+            else:
+                low, high = scores[finite].min(), scores[finite].max()
+                relevance = np.where(finite, (scores - low) / ((high - low) or 1), 0.0)
+
+        picked = mmr_select(
+            query_vector,
+            self.vector_store.vectors_of(documents),
+            k,
+            relevance=relevance,
+            lambda_mult=config.MMR_LAMBDA,
+            groups=[doc.metadata["source_url"] for doc in documents],
+            max_per_group=config.MAX_CHUNKS_PER_SOURCE
         )
-        
-        custom_docs = [
-            Document(page_content=doc.page_content, metadata=doc.metadata)
-            for doc in retrieved_docs
-        ]
-        
-        logger.info(f"Retrieved {len(custom_docs)} relevant document chunks.")
-        return custom_docs
\ No newline at end of file
+
+        selected = [documents[i] for i in picked]
+        logger.info(f"Selected {len(selected)} of {len(documents)} candidates from {len({doc.metadata['source_url'] for doc in selected})} sources by MMR.")
+        return selected
@@ -0,0 +1,154 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src import config
+from src.processing.text_processor import Document
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GenerationRequest:
+    """A single caller's query waiting in the scheduler queue."""
+    query: str
+    context_docs: List[Document]
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class GenerationScheduler:
+    """
+    A request queue and micro-batching scheduler in front of a 'Generator'.
+
+    A worker thread collects requests for up to 'max_wait_ms' after the first one arrives, or
+    until 'max_batch_size' are waiting, runs them through one batched 'generate' call and hands
+    every caller its own answer. It exposes 'generate_answer' so it can be passed to
+    'src.main.pipeline' in place of the generator.
+    """
+
+    def __init__(self, generator, max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.generator = generator
+        self.max_batch_size = max_batch_size or config.GENERATION_MAX_BATCH_SIZE
+        self.max_wait_ms = config.GENERATION_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+
+        self._queue: "queue.Queue[Optional[GenerationRequest]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+        self._num_batches = 0
+        self._num_requests = 0
+        self._batch_sizes = deque(maxlen=1000)
+        self._queue_waits_ms = deque(maxlen=1000)
+        self._latencies_ms = deque(maxlen=1000)
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        if self._worker is not None:
+            logger.warning("Generation scheduler already started, 'scheduler.start' should only be called once.")
+            return
+
+        self._worker = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+        self._worker.start()
+        logger.info(f"Generation scheduler started (max batch size {self.max_batch_size}, max wait {self.max_wait_ms} ms).")
+
+    def stop(self):
+        if self._worker is None:
+            return
+
+        self._queue.put(None)
+        self._worker.join()
+        self._worker = None
+
+    def submit(self, query: str, context_docs: List[Document]) -> Future:
+        """
+        Queues a request, the returned future resolves to its answer.
+        """
+        if self._worker is None:
+            raise RuntimeError("Generation scheduler is not running, call 'scheduler.start' first.")
+
+        request = GenerationRequest(query=query, context_docs=context_docs)
+        self._queue.put(request)
+        return request.future
+
+    def generate_answer(self, query: str, context_docs: List[Document]) -> str:
+        """
+        Blocking drop-in for 'Generator.generate_answer', the request is batched with concurrent ones.
+        """
+        return self.submit(query, context_docs).result()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            latencies = np.array(self._latencies_ms) if self._latencies_ms else np.zeros(1)
+            return {
+                "batches": self._num_batches,
+                "requests": self._num_requests,
+                "mean_batch_size": float(np.mean(self._batch_sizes)) if self._batch_sizes else 0.0,
+                "mean_queue_wait_ms": float(np.mean(self._queue_waits_ms)) if self._queue_waits_ms else 0.0,
+                "p50_latency_ms": float(np.percentile(latencies, 50)),
+                "p95_latency_ms": float(np.percentile(latencies, 95)),
+                "queue_depth": self._queue.qsize(),
+            }
+
+    def _collect_batch(self, first: GenerationRequest) -> List[GenerationRequest]:
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if request is None:
+                self._queue.put(None)
+                break
+            batch.append(request)
+
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect_batch(first)
+            started_at = time.monotonic()
+
+            try:
+                answers = self.generator.generate_batch([(r.query, r.context_docs) for r in batch])
+            except Exception as e:
+                logger.error(f"Batched generation failed, original error message: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            finished_at = time.monotonic()
+            for request, answer in zip(batch, answers):
+                request.future.set_result(answer)
+
+            self._record(batch, started_at, finished_at)
+
+    def _record(self, batch: List[GenerationRequest], started_at: float, finished_at: float):
+        with self._stats_lock:
+            self._num_batches += 1
+            self._num_requests += len(batch)
+            self._batch_sizes.append(len(batch))
+            for request in batch:
+                self._queue_waits_ms.append((started_at - request.enqueued_at) * 1000)
+                self._latencies_ms.append((finished_at - request.enqueued_at) * 1000)
+
+        logger.info(
+            f"Generated batch of {len(batch)} in {(finished_at - started_at) * 1000:.0f} ms, "
+            f"slowest request waited {(started_at - batch[0].enqueued_at) * 1000:.0f} ms in queue."
+        )
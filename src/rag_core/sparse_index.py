@@ -0,0 +1,165 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, product codes like 'XJ-900' become 'xj' and '900' in documents and queries alike."""
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    An in-memory inverted index with Okapi BM25 scoring.
+
+    Documents are added and removed one at a time under a caller-chosen key, e.g. the
+    (source URL, content hash) key of 'VectorIndex', so the index can be kept in step with
+    the vector store without ever being rebuilt. Postings map a term to the term frequency
+    in every document containing it, document lengths give the length normalization.
+
+    Searching scores a whole posting list at once with numpy. The array form of a posting list
+    is built when a query first needs it and dropped whenever a document with that term changes.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._terms: Dict[int, Tuple[str, ...]] = {}
+        self._ids: Dict[Hashable, int] = {}
+        self._keys: Dict[int, Hashable] = {}
+        self._next_id = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._ids
+
+    def add(self, key: Hashable, text: str):
+        """
+        Indexes a document, re-adding an indexed key replaces it.
+        """
+        if key in self._ids:
+            self.remove(key)
+
+        doc_id = self._next_id
+        self._next_id += 1
+        self._ids[key] = doc_id
+        self._keys[doc_id] = key
+
+        frequencies = Counter(tokenize(text))
+        for term, frequency in frequencies.items():
+            self._postings[term][doc_id] = frequency
+            self._arrays.pop(term, None)
+
+        if doc_id == len(self._lengths):
+            self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+
+        length = sum(frequencies.values())
+        self._lengths[doc_id] = length
+        self._terms[doc_id] = tuple(frequencies)
+        self._total_length += length
+
+    def add_many(self, documents: Iterable[Tuple[Hashable, str]]):
+        for key, text in documents:
+            self.add(key, text)
+
+    def remove(self, key: Hashable) -> bool:
+        """
+        Removes a document, returns False when the key is not indexed.
+        """
+        doc_id = self._ids.pop(key, None)
+        if doc_id is None:
+            return False
+
+        del self._keys[doc_id]
+        for term in self._terms.pop(doc_id):
+            postings = self._postings[term]
+            del postings[doc_id]
+            self._arrays.pop(term, None)
+            if not postings:
+                del self._postings[term]
+
+        self._total_length -= int(self._lengths[doc_id])
+        self._lengths[doc_id] = 0
+        return True
+
+    def idf(self, term: str) -> float:
+        document_frequency = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, k: int, keys: Optional[Iterable[Hashable]] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Scores every document sharing a term with the query.
+
+        Args:
+            query: the query text, tokenized like the documents.
+            k: the number of results to return.
+            keys: only these documents are returned when given.
+
+        Returns:
+            A list of (key, BM25 score) pairs, best first.
+        """
+        if not len(self) or k <= 0:
+            return []
+
+        average_length = self._total_length / len(self) or 1.0
+        normalization = self.k1 * (1 - self.b + self.b * self._lengths[:self._next_id] / average_length)
+        scores = np.zeros(self._next_id, dtype=np.float32)
+
+        for term, query_frequency in Counter(tokenize(query)).items():
+            if term not in self._postings:
+                continue
+
+            doc_ids, frequencies = self._posting_arrays(term)
+            weight = self.idf(term) * query_frequency
+            scores[doc_ids] += weight * frequencies * (self.k1 + 1) / (frequencies + normalization[doc_ids])
+
+        if keys is not None:
+            allowed = np.zeros(self._next_id, dtype=bool)
+            allowed[[self._ids[key] for key in keys if key in self._ids]] = True
+            scores[~allowed] = 0
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+
+        k = min(k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._keys[doc_id], float(scores[doc_id])) for doc_id in top]
+
+    def _posting_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = self._arrays[term] = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float32, count=len(postings)),
+            )
+        return arrays
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """
+    Fuses several rankings of the same items by summing 1 / (k + rank) over the rankings an item appears in.
+    Only ranks are used, so scores of different scales (cosine similarity, BM25) need no normalization.
+
+    Returns:
+        A list of (item, fused score) pairs, best first.
+    """
+    scores: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1.0 / (k + rank)
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,678 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.processing.text_processor import Document, DocumentBatch
+from src.rag_core.ann_index import AnnIndex, AnnParams
+from src.rag_core.sparse_index import BM25Index, reciprocal_rank_fusion
+
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+RECORDS_FILE = "records.jsonl"
+ANN_FILE_PREFIX = "ann_"
+# The single-file format written before the index was saved incrementally, migrated on the next save.
+LEGACY_VECTORS_FILE = "vectors.npy"
+LEGACY_RECORDS_FILE = "records.json"
+
+# Deleted rows are only marked until this fraction of the rows is deleted, then the index is compacted.
+COMPACT_DELETED_FRACTION = 0.25
+# Vectors are copied this many rows at a time when the vector file is rewritten.
+WRITE_BLOCK_ROWS = 8192
+
+
+def content_hash(text: str) -> str:
+    """Returns the hex sha256 digest of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class VectorMatrix:
+    """
+    The rows of L2-normalized float32 vectors of a 'VectorIndex'.
+
+    Rows saved to disk are memory-mapped from a raw float32 file, rows added since are held in an
+    in-memory buffer that grows by doubling, so appending never copies the mapped rows into memory.
+    """
+
+    def __init__(self, dimension: int, mapped: Optional[np.ndarray] = None):
+        self.dimension = dimension
+        self._mapped = mapped if mapped is not None else np.empty((0, dimension), dtype=np.float32)
+        self._buffer = np.empty((0, dimension), dtype=np.float32)
+        self._num_buffered = 0
+
+    @classmethod
+    def open(cls, path: Path, dimension: int, num_rows: int) -> "VectorMatrix":
+        """Maps the first 'num_rows' rows of a vector file, anything written after them is ignored."""
+        if not num_rows:
+            return cls(dimension)
+        return cls(dimension, np.memmap(path, dtype=np.float32, mode="r", shape=(num_rows, dimension)))
+
+    def __len__(self) -> int:
+        return len(self._mapped) + self._num_buffered
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self), self.dimension
+
+    @property
+    def buffered(self) -> np.ndarray:
+        """The rows added since the matrix was mapped."""
+        return self._buffer[:self._num_buffered]
+
+    def append(self, vectors: np.ndarray):
+        needed = self._num_buffered + len(vectors)
+        if needed > len(self._buffer):
+            grown = np.empty((max(needed, 2 * len(self._buffer), 64), self.dimension), dtype=np.float32)
+            grown[:self._num_buffered] = self.buffered
+            self._buffer = grown
+
+        self._buffer[self._num_buffered:needed] = vectors
+        self._num_buffered = needed
+
+    def take(self, rows) -> np.ndarray:
+        """Copies the given rows into memory."""
+        rows = np.asarray(rows, dtype=np.int64)
+        num_mapped = len(self._mapped)
+        if not self._num_buffered:
+            return np.asarray(self._mapped[rows])
+        if not num_mapped:
+            return self._buffer[rows]
+
+        vectors = np.empty((len(rows), self.dimension), dtype=np.float32)
+        mapped = rows < num_mapped
+        vectors[mapped] = self._mapped[rows[mapped]]
+        vectors[~mapped] = self._buffer[rows[~mapped] - num_mapped]
+        return vectors
+
+    def __getitem__(self, rows) -> np.ndarray:
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(len(self)))
+        return self.take(rows)
+
+    def __matmul__(self, query: np.ndarray) -> np.ndarray:
+        if not self._num_buffered:
+            return np.asarray(self._mapped @ query)
+        if not len(self._mapped):
+            return self.buffered @ query
+        return np.concatenate([self._mapped @ query, self.buffered @ query])
+
+    def write(self, path: Path, rows: np.ndarray):
+        """Writes the given rows to a new vector file, a block at a time."""
+        with open(path, "wb") as f:
+            for start in range(0, len(rows), WRITE_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(self.take(rows[start:start + WRITE_BLOCK_ROWS])).tobytes())
+
+
+class VectorIndex:
+    """
+    A persistent store of chunk embeddings keyed by (source URL, content hash).
+
+    Vectors are kept L2-normalized in a 'VectorMatrix', saved as a raw float32 file that is
+    memory-mapped when loaded. Chunk text and metadata are saved next to it in a JSON-lines log
+    of added, updated and deleted rows. Both files are only appended to: a save writes the rows
+    and log entries of what changed since the last one, so indexing a page costs its own chunks,
+    not the whole corpus. Deleted rows are only marked and skipped by searches, once
+    'COMPACT_DELETED_FRACTION' of the rows is deleted the index is compacted and rewritten.
+
+    In memory, chunks are held in a columnar 'DocumentBatch' rather than one object per chunk,
+    and the rows of every source URL are indexed, so upserting or deleting a page only touches
+    that page's rows. Chunks that were already embedded for an earlier query are reused instead
+    of re-encoded.
+
+    A BM25 index over the same chunks backs 'keyword_search' and 'hybrid_search'. It is built
+    from the stored chunks on first use and kept in step with every later add and delete.
+
+    Dense search is exact by default. With 'ann_params' it goes through a FAISS IVF or HNSW
+    index once the index holds 'ann_params.min_vectors' chunks, see 'AnnIndex', also when it is
+    restricted to the chunks of a few pages. That index is trained when an add, upsert or load
+    crosses the threshold rather than on a query, kept in step with adds and deletes, and saved
+    next to the vectors.
+    """
+
+    def __init__(self, index_dir: Optional[str] = None, ann_params: Optional[AnnParams] = None):
+        self.index_dir = Path(index_dir) if index_dir else None
+        self.ann_params = ann_params or AnnParams()
+        self._vectors: Optional[VectorMatrix] = None
+        self._ann: Optional[AnnIndex] = None
+        self._ann_saved = False
+        self._documents = DocumentBatch()
+        self._hashes: List[str] = []
+        self._rows: Dict[Tuple[str, str], int] = {}
+        self._url_rows: Dict[str, List[int]] = {}
+        self._deleted = bytearray()
+        self._num_deleted = 0
+        self._sparse: Optional[BM25Index] = None
+        # Changes not saved yet, in order: ("add" | "update" | "delete", row).
+        self._pending: List[Tuple[str, int]] = []
+        self._saved_rows = 0
+        # The size of the valid part of the records log, None while nothing is saved in the current format.
+        self._log_size: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def num_rows(self) -> int:
+        """The rows of the vector matrix, including deleted ones not compacted away yet."""
+        return len(self._documents)
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self._vectors is None else self._vectors.dimension
+
+    @property
+    def index_type(self) -> str:
+        """The kind of dense search the current number of chunks gets, 'flat' for exact search."""
+        return self.ann_params.resolve(len(self))
+
+    @property
+    def sparse_index(self) -> BM25Index:
+        """The BM25 index over the stored chunks, built on first access."""
+        if self._sparse is None:
+            started_at = time.perf_counter()
+            self._sparse = BM25Index()
+            self._sparse.add_many((key, self._documents.text(row)) for key, row in self._rows.items())
+            logger.info(f"Built BM25 index over {len(self)} chunks in {time.perf_counter() - started_at:.2f}s.")
+        return self._sparse
+
+    def contains(self, source_url: str, chunk_hash: str) -> bool:
+        return (source_url, chunk_hash) in self._rows
+
+    def sources(self) -> List[str]:
+        return list(self._url_rows)
+
+    def add(self, documents: List[Document], embeddings) -> int:
+        """
+        Adds documents with precomputed embeddings, documents whose key is already indexed are skipped.
+
+        Args:
+            documents: the chunks to add.
+            embeddings: one vector per document.
+
+        Returns:
+            The number of documents actually added.
+        """
+        staged_documents, staged_vectors = [], []
+        num_added = self._stage(documents, embeddings, staged_documents, staged_vectors)
+        self._append(staged_documents, staged_vectors)
+        self._update_ann()
+        return num_added
+
+    def upsert(
+        self,
+        documents: Iterable[Document],
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        batch_size: Optional[int] = None
+    ) -> int:
+        """
+        Makes the index hold exactly the given chunks for every source URL they come from.
+        Chunks that are no longer present on a page are deleted, unchanged ones keep their
+        vectors and only the new ones are sent to 'embed_fn'.
+
+        'documents' may be a generator (e.g. 'iter_chunks'), it is consumed once and new chunks
+        are embedded every 'batch_size' chunks, so only one batch of their text is pending at a time.
+        Chunks, vectors and metadata changes are applied in one go and stale chunks deleted once
+        every chunk was seen, so metadata still added to a chunk while the stream is consumed
+        (e.g. 'source_urls' by 'ChunkDeduplicator.iter_unique') is kept.
+
+        Args:
+            documents: the chunks of one or more pages.
+            embed_fn: a function embedding a list of texts, e.g. 'HuggingFaceEmbeddings.embed_documents'.
+            batch_size: the number of new chunks per 'embed_fn' call, all of them in a single call when None.
+
+        Returns:
+            The number of chunks that had to be embedded.
+        """
+        seen: Set[Tuple[str, str]] = set()
+        pending: List[Document] = []
+        reused: Dict[int, Document] = {}
+        staged_documents: List[Tuple[Document, str]] = []
+        staged_vectors: List[np.ndarray] = []
+        num_embedded = 0
+
+        for doc in documents:
+            key = (doc.metadata["source_url"], content_hash(doc.page_content))
+            if key in seen:
+                continue
+            seen.add(key)
+
+            if key in self._rows:
+                reused[self._rows[key]] = doc
+                continue
+
+            pending.append(doc)
+            if batch_size and len(pending) >= batch_size:
+                num_embedded += self._stage(pending, embed_fn([doc.page_content for doc in pending]), staged_documents, staged_vectors)
+                pending = []
+
+        if pending:
+            num_embedded += self._stage(pending, embed_fn([doc.page_content for doc in pending]), staged_documents, staged_vectors)
+        self._append(staged_documents, staged_vectors)
+
+        for row, doc in reused.items():
+            if self._documents.metadata(row) != doc.metadata:
+                self._documents.set_metadata(row, doc.metadata)
+                self._log("update", row)
+
+        urls = {url for url, _ in seen}
+        stale = [
+            row for url in urls for row in self._url_rows.get(url, ())
+            if (url, self._hashes[row]) not in seen
+        ]
+        self._delete_rows(stale)
+        self._update_ann()
+
+        return num_embedded
+
+    def delete(self, source_url: str) -> int:
+        """
+        Removes every chunk of the given source URL.
+
+        Returns:
+            The number of chunks removed.
+        """
+        rows = list(self._url_rows.get(source_url, ()))
+        self._delete_rows(rows)
+        self._update_ann()
+        return len(rows)
+
+    def vectors_of(self, documents: List[Document]) -> np.ndarray:
+        """
+        Returns the stored, L2-normalized vectors of indexed documents, e.g. search results.
+        """
+        rows = [self._rows[(doc.metadata["source_url"], content_hash(doc.page_content))] for doc in documents]
+        return self._vectors.take(rows)
+
+    def search(self, query_vector, k: int, source_urls: Optional[Set[str]] = None) -> List[Tuple[Document, float]]:
+        """
+        Cosine-similarity search over the indexed chunks, approximate when 'index_type' is not 'flat'.
+
+        Args:
+            query_vector: the embedded query.
+            k: the number of results to return.
+            source_urls: only chunks of these pages are searched when given.
+
+        Returns:
+            A list of (Document, score) pairs, best first.
+        """
+        return [(self._documents[row], score) for row, score in self._search_rows(query_vector, k, self._source_rows(source_urls))]
+
+    def keyword_search(self, query: str, k: int, source_urls: Optional[Set[str]] = None) -> List[Tuple[Document, float]]:
+        """
+        BM25 search over the indexed chunks, finds exact terms (names, codes, error messages) embeddings miss.
+        Only chunks of 'source_urls' are searched when given.
+
+        Returns:
+            A list of (Document, BM25 score) pairs, best first.
+        """
+        return [(self._documents[self._rows[key]], score) for key, score in self.sparse_index.search(query, k, self._source_keys(source_urls))]
+
+    def hybrid_search(self, query_vector, query: str, k: int, num_candidates: int = 20, rrf_k: int = 60, source_urls: Optional[Set[str]] = None) -> List[Tuple[Document, float]]:
+        """
+        Fuses the dense and the BM25 ranking with reciprocal rank fusion.
+
+        Args:
+            query_vector: the embedded query.
+            query: the query text.
+            k: the number of results to return.
+            num_candidates: how many results of each ranking are fused.
+            rrf_k: the rank offset of reciprocal rank fusion, larger values flatten the rank weights.
+            source_urls: only chunks of these pages are searched when given.
+
+        Returns:
+            A list of (Document, fused score) pairs, best first.
+        """
+        num_candidates = max(num_candidates, k)
+        rows = self._source_rows(source_urls)
+        dense_rows = [row for row, _ in self._search_rows(query_vector, num_candidates, rows)]
+        sparse_rows = [self._rows[key] for key, _ in self.sparse_index.search(query, num_candidates, self._source_keys(source_urls))]
+
+        fused = reciprocal_rank_fusion([dense_rows, sparse_rows], k=rrf_k)[:k]
+        return [(self._documents[row], score) for row, score in fused]
+
+    def _source_rows(self, source_urls: Optional[Set[str]]) -> Optional[np.ndarray]:
+        if source_urls is None:
+            return None
+        return np.asarray([row for url in source_urls for row in self._url_rows.get(url, ())], dtype=np.int64)
+
+    def _source_keys(self, source_urls: Optional[Set[str]]) -> Optional[List[Tuple[str, str]]]:
+        if source_urls is None:
+            return None
+        return [(url, self._hashes[row]) for url in source_urls for row in self._url_rows.get(url, ())]
+
+    def _search_rows(self, query_vector, k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Searches every live row, or only 'rows' when given. With an ANN index, a restricted search
+        falls back to exact search over 'rows' when the ANN index finds fewer than k of them.
+        """
+        if not len(self) or k <= 0 or (rows is not None and not len(rows)):
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        if self._ann is not None:
+            found_rows, scores = self._ann.search(self._vectors, query, k, rows)
+            if rows is None or len(found_rows) >= min(k, len(rows)):
+                return [(int(row), float(score)) for row, score in zip(found_rows, scores)]
+            logger.info(f"ANN search found {len(found_rows)} of the {min(k, len(rows))} requested chunks, searching the {len(rows)} source chunks exactly.")
+
+        if rows is None:
+            scores = self._vectors @ query
+            if self._num_deleted:
+                scores[np.frombuffer(self._deleted, dtype=bool)] = -np.inf
+        else:
+            scores = self._vectors.take(rows) @ query
+
+        k = min(k, len(self) if rows is None else len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [(int(i if rows is None else rows[i]), float(scores[i])) for i in top]
+
+    def _live_rows(self) -> np.ndarray:
+        return np.flatnonzero(np.frombuffer(self._deleted, dtype=np.uint8) == 0)
+
+    def _update_ann(self):
+        """
+        Drops the ANN index below the threshold and (re)builds it when the index type changed
+        or too many of its vectors were deleted, so no query pays for training.
+        """
+        index_type = self.index_type
+        if index_type == "flat":
+            self._ann = None
+        elif self._ann is None or self._ann.index_type != index_type or self._ann.needs_rebuild:
+            self._ann = AnnIndex.build(self._vectors, index_type, self.ann_params, rows=self._live_rows())
+            self._ann_saved = False
+
+    def save(self):
+        """
+        Writes what changed since the last save to 'index_dir': the new vectors are appended to the
+        vector file and the added, updated and deleted rows to the records log. The files are
+        rewritten instead when nothing was saved in this format yet, or to compact away deleted rows.
+        """
+        if self.index_dir is None or self._vectors is None:
+            return
+        if self._log_size is not None and not self._pending and (self._ann is None or self._ann_saved):
+            return
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        if self._log_size is None or self._num_deleted > COMPACT_DELETED_FRACTION * self.num_rows:
+            self._rewrite()
+        else:
+            self._append_to_files()
+
+        if self._ann is not None and not self._ann_saved:
+            self._remove_ann_files()
+            self._ann.save(str(self.index_dir / f"{ANN_FILE_PREFIX}{self._ann.index_type}"))
+            self._ann_saved = True
+
+    def _append_to_files(self):
+        vectors_path = self.index_dir / VECTORS_FILE
+        records_path = self.index_dir / RECORDS_FILE
+        num_new = self.num_rows - self._saved_rows
+
+        # Anything past the saved rows and the valid log was left by an interrupted save and is overwritten.
+        with open(vectors_path, "ab") as f:
+            f.truncate(self._saved_rows * self.dimension * 4)
+            f.write(np.ascontiguousarray(self._vectors.buffered).tobytes())
+        with open(records_path, "ab") as f:
+            f.truncate(self._log_size)
+            f.write("".join(f"{json.dumps(self._log_entry(op, row))}\n" for op, row in self._pending).encode("utf-8"))
+            self._log_size = f.tell()
+
+        self._pending = []
+        self._saved_rows = self.num_rows
+        self._vectors = VectorMatrix.open(vectors_path, self.dimension, self.num_rows)
+
+        logger.info(f"Saved {num_new} new chunks to the vector index in {self.index_dir}, {len(self)} chunks indexed.")
+
+    def _rewrite(self):
+        """Compacts away the deleted rows and writes both files from scratch."""
+        vectors_path = self.index_dir / VECTORS_FILE
+        records_path = self.index_dir / RECORDS_FILE
+
+        live_rows = self._live_rows()
+        self._vectors.write(Path(f"{vectors_path}.tmp"), live_rows)
+        self._compact(live_rows)
+
+        with open(f"{records_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(f"{json.dumps({'dimension': self.dimension})}\n")
+            for row in range(self.num_rows):
+                f.write(f"{json.dumps(self._log_entry('add', row))}\n")
+            log_size = f.tell()
+
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+        os.replace(f"{records_path}.tmp", records_path)
+        for legacy_file in (LEGACY_VECTORS_FILE, LEGACY_RECORDS_FILE):
+            (self.index_dir / legacy_file).unlink(missing_ok=True)
+        # An ANN index is only valid for the rows it was saved with.
+        self._remove_ann_files()
+        self._ann_saved = False
+
+        self._pending = []
+        self._saved_rows = self.num_rows
+        self._log_size = log_size
+        self._vectors = VectorMatrix.open(vectors_path, self.dimension, self.num_rows)
+
+        logger.info(f"Saved vector index with {len(self)} chunks to {self.index_dir}.")
+
+    def _remove_ann_files(self):
+        for path in self.index_dir.glob(f"{ANN_FILE_PREFIX}*"):
+            path.unlink()
+
+    def _log_entry(self, op: str, row: int) -> dict:
+        if op == "add":
+            return {
+                "op": "add",
+                "source_url": self._documents.source_url(row),
+                "content_hash": self._hashes[row],
+                "page_content": self._documents.text(row),
+                "metadata": self._documents.metadata(row),
+            }
+        if op == "update":
+            return {"op": "update", "row": row, "metadata": self._documents.metadata(row)}
+        return {"op": "delete", "row": row}
+
+    @classmethod
+    def load(cls, index_dir: Optional[str], ann_params: Optional[AnnParams] = None) -> "VectorIndex":
+        """
+        Opens the index saved in 'index_dir', vectors are memory-mapped rather than read into memory.
+        Returns an empty index if nothing was saved there yet.
+        """
+        index = cls(index_dir, ann_params)
+        if index.index_dir is None:
+            return index
+
+        if (index.index_dir / RECORDS_FILE).exists():
+            index._replay_log()
+        elif (index.index_dir / LEGACY_RECORDS_FILE).exists():
+            index._load_legacy()
+        else:
+            return index
+
+        ann_path = index.index_dir / f"{ANN_FILE_PREFIX}{index.index_type}"
+        if index.index_type != "flat" and Path(f"{ann_path}.faiss").exists():
+            index._ann = AnnIndex.load(str(ann_path), index.index_type, index.ann_params)
+            index._ann_saved = True
+            index._catch_up_ann()
+        index._update_ann()
+
+        logger.info(f"Loaded vector index with {len(index)} chunks from {index.index_dir}.")
+        return index
+
+    def _replay_log(self):
+        dimension = None
+        log_size = 0
+        with open(self.index_dir / RECORDS_FILE, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring the end of {self.index_dir / RECORDS_FILE} after {log_size} bytes, it was not fully written.")
+                    break
+                log_size += len(line)
+
+                op = entry.get("op")
+                if op is None:
+                    dimension = entry["dimension"]
+                elif op == "add":
+                    self._add_row(Document(page_content=entry["page_content"], metadata=entry["metadata"]), entry["content_hash"])
+                elif op == "update":
+                    self._documents.set_metadata(entry["row"], entry["metadata"])
+                else:
+                    self._delete_rows([entry["row"]])
+
+        self._pending = []
+        self._saved_rows = self.num_rows
+        self._log_size = log_size
+        self._vectors = VectorMatrix.open(self.index_dir / VECTORS_FILE, dimension, self.num_rows)
+
+    def _load_legacy(self):
+        """Reads the single-file format, the next save rewrites it in the current one."""
+        with open(self.index_dir / LEGACY_RECORDS_FILE, encoding="utf-8") as f:
+            records = json.load(f)
+        if not records:
+            return
+
+        vectors = np.load(self.index_dir / LEGACY_VECTORS_FILE, mmap_mode="r")
+        for r in records:
+            self._add_row(Document(page_content=r["page_content"], metadata=r["metadata"]), r["content_hash"])
+        self._vectors = VectorMatrix(vectors.shape[1], vectors)
+
+    def _catch_up_ann(self):
+        """Adds the rows appended after the ANN index was saved and drops the ones deleted since."""
+        live = self._ann.slot_rows[self._ann.slot_rows >= 0]
+        covered = int(live.max()) + 1 if len(live) else 0
+        deleted = np.frombuffer(self._deleted, dtype=bool)
+        for start in range(covered, self.num_rows, WRITE_BLOCK_ROWS):
+            rows = np.arange(start, min(start + WRITE_BLOCK_ROWS, self.num_rows), dtype=np.int64)
+            rows = rows[~deleted[rows]]
+            self._ann.add(self._vectors.take(rows), rows)
+
+        if self._num_deleted:
+            self._ann.delete_rows(np.flatnonzero(deleted))
+
+    def _stage(self, documents: List[Document], embeddings, staged_documents: List[Tuple[Document, str]], staged_vectors: List[np.ndarray]) -> int:
+        """
+        Normalizes the vectors of not yet indexed documents and stages them to be appended in one go by '_append'.
+        """
+        new_documents = []
+        new_vectors = []
+        staged_keys = set()
+
+        for doc, vector in zip(documents, embeddings):
+            key = (doc.metadata["source_url"], content_hash(doc.page_content))
+            if key in self._rows or key in staged_keys:
+                continue
+
+            staged_keys.add(key)
+            new_documents.append((doc, key[1]))
+            new_vectors.append(vector)
+
+        if not new_documents:
+            return 0
+
+        vectors = np.asarray(new_vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        staged_documents.extend(new_documents)
+        staged_vectors.append(vectors / np.where(norms == 0, 1, norms))
+
+        return len(new_documents)
+
+    def _append(self, staged_documents: List[Tuple[Document, str]], staged_vectors: List[np.ndarray]):
+        if not staged_documents:
+            return
+
+        vectors = np.concatenate(staged_vectors)
+        first_row = self.num_rows
+        if self._vectors is None:
+            self._vectors = VectorMatrix(vectors.shape[1])
+        self._vectors.append(vectors)
+        if self._ann is not None:
+            self._ann.add(vectors, np.arange(first_row, first_row + len(vectors), dtype=np.int64))
+
+        for doc, chunk_hash in staged_documents:
+            self._log("add", self._add_row(doc, chunk_hash))
+
+    def _add_row(self, doc: Document, chunk_hash: str) -> int:
+        row = self.num_rows
+        key = (doc.metadata["source_url"], chunk_hash)
+
+        self._documents.append(doc)
+        self._hashes.append(chunk_hash)
+        self._deleted.append(0)
+        self._rows[key] = row
+        self._url_rows.setdefault(key[0], []).append(row)
+        if self._sparse is not None:
+            self._sparse.add(key, doc.page_content)
+        return row
+
+    def _delete_rows(self, rows: List[int]):
+        """
+        Marks rows deleted, they are skipped by searches until the index is compacted. Without an
+        'index_dir' the index is compacted right away once 'COMPACT_DELETED_FRACTION' is deleted,
+        otherwise on the next save.
+        """
+        if not len(rows):
+            return
+
+        deleted_by_url: Dict[str, Set[int]] = {}
+        for row in rows:
+            key = (self._documents.source_url(row), self._hashes[row])
+            if self._sparse is not None:
+                self._sparse.remove(key)
+            del self._rows[key]
+            self._deleted[row] = 1
+            deleted_by_url.setdefault(key[0], set()).add(row)
+            self._log("delete", row)
+
+        for url, deleted in deleted_by_url.items():
+            remaining = [row for row in self._url_rows[url] if row not in deleted]
+            if remaining:
+                self._url_rows[url] = remaining
+            else:
+                del self._url_rows[url]
+
+        self._num_deleted += len(rows)
+        if self._ann is not None:
+            self._ann.delete_rows(np.asarray(rows, dtype=np.int64))
+
+        if self.index_dir is None and self._num_deleted > COMPACT_DELETED_FRACTION * self.num_rows:
+            live_rows = self._live_rows()
+            vectors = VectorMatrix(self.dimension)
+            vectors.append(self._vectors.take(live_rows))
+            self._compact(live_rows)
+            self._vectors = vectors
+
+    def _compact(self, live_rows: np.ndarray):
+        """
+        Drops the deleted rows from everything but the vector matrix, which the caller replaces with the live rows.
+        """
+        if not self._num_deleted:
+            return
+
+        new_rows = np.full(self.num_rows, -1, dtype=np.int64)
+        new_rows[live_rows] = np.arange(len(live_rows))
+
+        self._documents.delete_rows(np.flatnonzero(new_rows < 0))
+        self._hashes = [self._hashes[row] for row in live_rows]
+        self._rows = {key: int(new_rows[row]) for key, row in self._rows.items()}
+        self._url_rows = {url: [int(new_rows[row]) for row in rows] for url, rows in self._url_rows.items()}
+        self._deleted = bytearray(len(live_rows))
+        self._num_deleted = 0
+
+        if self._ann is not None:
+            self._ann.remap_rows(new_rows)
+            self._ann_saved = False
+
+    def _log(self, op: str, row: int):
+        if self.index_dir is not None:
+            self._pending.append((op, row))
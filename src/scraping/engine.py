@@ -0,0 +1,382 @@
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+from crawler.article_crawler.spiders.content_spider import ContentSpider
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
+
+PAGE_CACHE_MIDDLEWARE = "crawler.article_crawler.middlewares.PageCacheDownloaderMiddleware"
+
+SCRAPE_BUDGET_MIDDLEWARE = "crawler.article_crawler.middlewares.ScrapeBudgetDownloaderMiddleware"
+
+
+@dataclass
+class UrlTiming:
+    """How long a single URL took from submission until it finished, and how it finished."""
+    url: str
+    status: str
+    seconds: float
+
+
+class ScrapeBatch:
+    """
+    The URLs submitted by a single 'scrape_urls' call and the results collected for them.
+
+    All bookkeeping happens on the reactor thread, callers only ever wait on 'future',
+    which resolves to a dictionary of urls to scraped text once every URL has either
+    produced an item or failed, 'max_pages' pages were scraped, or 'deadline' seconds passed.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        on_result: Optional[Callable[[str, str], None]] = None,
+        deadline: Optional[float] = None,
+        max_pages: Optional[int] = None
+    ):
+        self.urls = list(dict.fromkeys(urls))
+        self.on_result = on_result
+        self.deadline = deadline or None
+        self.max_pages = max_pages or None
+        self.pending = set(self.urls)
+        self.results: Dict[str, str] = {}
+        self.stats: Counter = Counter()
+        self.timings: Dict[str, UrlTiming] = {}
+        self.text_lengths: Dict[str, Tuple[int, int]] = {}
+        self.stop_reason: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.future: Future = Future()
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def remaining_time(self) -> Optional[float]:
+        """Seconds left before the deadline, None when the batch has no deadline."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - self.elapsed, 0.0)
+
+    def add_item(self, item: dict):
+        # Pages finishing after the batch resolved are still cached by the middleware, but not returned.
+        if self.done or not item.get('cleaned_text'):
+            return
+
+        self.results[item['url']] = item['cleaned_text']
+        if item.get('full_text_length') is not None:
+            self.text_lengths[item['url']] = (item['full_text_length'], len(item['cleaned_text']))
+            self.stats["extract/chars_before"] += item['full_text_length']
+            self.stats["extract/chars_after"] += len(item['cleaned_text'])
+        if self.on_result is not None:
+            self.on_result(item['url'], item['cleaned_text'])
+
+        if self.max_pages is not None and len(self.results) >= self.max_pages:
+            self.finish(reason="max_pages")
+
+    def record(self, meta: dict):
+        """Counts how a response was served, e.g. from the page cache or the browser, for the scrape summary."""
+        status = meta.get("page_cache")
+        if status:
+            self.stats[f"page_cache/{status}"] += 1
+            self.stats["page_cache/bytes_saved"] += meta.get("page_cache_bytes_saved", 0)
+
+        if status not in ("fresh", "revalidated"):
+            self.stats["fetch/browser" if meta.get("playwright") else "fetch/http"] += 1
+            if meta.get("fetch_fallback"):
+                self.stats[f"fetch/browser_fallback/{meta['fetch_fallback']}"] += 1
+
+    def mark_done(self, url: str, status: str = "scraped"):
+        if url not in self.pending or self.done:
+            return
+
+        self.pending.discard(url)
+        self.timings[url] = UrlTiming(url=url, status=status, seconds=self.elapsed)
+        if not self.pending:
+            self.finish()
+
+    def finish(self, reason: str = "completed"):
+        """
+        Resolves the batch with what was collected so far, URLs still pending are recorded as cancelled.
+        """
+        if self.future.done():
+            return
+
+        self.stop_reason = reason
+        for url in self.pending:
+            self.timings[url] = UrlTiming(url=url, status="cancelled", seconds=self.elapsed)
+
+        self.future.set_result(dict(self.results))
+
+    def fail(self, error: BaseException):
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class ScrapingEngine:
+    """
+    Runs the Twisted reactor and a single long-lived 'ContentSpider' on a background thread.
+
+    The reactor cannot be restarted once stopped, and starting Scrapy (and the Playwright
+    browser behind it) is expensive, so both are started once and URL batches are injected
+    into the running spider for every 'scrape_urls' call.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings if settings is not None else get_project_settings()
+        self.settings.set("DOWNLOADER_MIDDLEWARES", {
+            SCRAPE_BUDGET_MIDDLEWARE: 100,
+            PAGE_CACHE_MIDDLEWARE: 543,
+            **self.settings.getdict("DOWNLOADER_MIDDLEWARES"),
+        })
+        self._reactor = None
+        self._crawler = None
+        self._spider = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._stopping = False
+        self._batches: List[ScrapeBatch] = []
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self._spider is not None
+
+    def start(self, timeout: float = 60):
+        """
+        Starts the reactor thread and opens the spider, blocks until the spider is ready to accept URLs.
+        This is a resource-intensive operation and should be done only once.
+        """
+        if self._thread is not None:
+            logger.warning("Scraping engine already started, 'engine.start' should only be called once.")
+            return
+
+        logger.info("Starting scraping engine...")
+
+        self._thread = threading.Thread(target=self._run_reactor, name="scraping-engine", daemon=True)
+        self._thread.start()
+
+        if not self._ready.wait(timeout):
+            raise RuntimeError(f"Scraping engine did not start within {timeout} seconds.")
+
+        if self._startup_error is not None:
+            raise RuntimeError(f"Could Not start scraping engine, original error message: {self._startup_error}")
+
+        atexit.register(self.stop)
+        logger.info("Scraping engine started.")
+
+    def stop(self, timeout: float = 30):
+        """
+        Closes the spider and stops the reactor, pending batches are resolved with what was collected.
+        """
+        if not self.is_running or self._stopping:
+            return
+
+        logger.info("Stopping scraping engine...")
+        self._stopping = True
+        self._reactor.callFromThread(self._shutdown)
+        self._thread.join(timeout)
+
+    def submit(
+        self,
+        urls: List[str],
+        on_result: Optional[Callable[[str, str], None]] = None,
+        deadline: Optional[float] = None,
+        max_pages: Optional[int] = None
+    ) -> ScrapeBatch:
+        """
+        Schedules a batch of URLs on the running spider. Safe to call from any thread.
+
+        Args:
+            urls: a list of url strings to be scraped.
+            on_result: called on the reactor thread with (url, cleaned_text) as soon as each page is scraped.
+            deadline: seconds after which the batch resolves with what was collected, outstanding requests are cancelled.
+            max_pages: resolve the batch as soon as this many pages with text were scraped.
+
+        Returns:
+            The 'ScrapeBatch' whose 'future' resolves to a dictionary of urls to scraped text.
+        """
+        if not self.is_running:
+            raise RuntimeError("Scraping engine is not running, call 'engine.start' first.")
+
+        batch = ScrapeBatch(urls, on_result=on_result, deadline=deadline, max_pages=max_pages)
+        if not batch.urls:
+            batch.finish()
+            return batch
+
+        self._reactor.callFromThread(self._schedule_batch, batch)
+        return batch
+
+    def cancel(self, batch: ScrapeBatch):
+        """
+        Resolves a batch with what was collected so far, e.g. once its caller stopped waiting for it.
+        Its requests that did not reach the network yet are dropped. Safe to call from any thread.
+        """
+        if batch.done or not self.is_running:
+            return
+
+        self._reactor.callFromThread(self._cancel_batch, batch)
+
+    def _run_reactor(self):
+        try:
+            install_reactor(self.settings.get("TWISTED_REACTOR") or DEFAULT_REACTOR, self.settings.get("ASYNCIO_EVENT_LOOP"))
+            from twisted.internet import reactor
+
+            self._reactor = reactor
+            reactor.callWhenRunning(self._start_crawler)
+            reactor.run(installSignalHandlers=False)
+        except Exception as e:
+            self._startup_error = e
+            self._ready.set()
+
+    def _start_crawler(self):
+        crawler = Crawler(ContentSpider, self.settings)
+
+        crawler.signals.connect(self._on_spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self._on_spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(self._on_item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(self._on_item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(self._on_spider_error, signal=signals.spider_error)
+        crawler.signals.connect(self._on_request_dropped, signal=signals.request_dropped)
+
+        self._crawler = crawler
+        crawler.crawl(urls=[]).addErrback(self._on_crawl_failure)
+
+    def _on_crawl_failure(self, failure):
+        logger.error(f"Scraping engine crawl failed, original error message: {failure.value}")
+        if not self._ready.is_set():
+            self._startup_error = failure.value
+            self._ready.set()
+            self._reactor.stop()
+            return
+
+        for batch in self._batches:
+            batch.fail(failure.value)
+        self._batches.clear()
+
+    def _shutdown(self):
+        def stop_reactor(_):
+            for batch in self._batches:
+                batch.finish()
+            self._batches.clear()
+            self._reactor.stop()
+
+        self._crawler.stop().addBoth(stop_reactor)
+
+    def _schedule_batch(self, batch: ScrapeBatch):
+        self._batches.append(batch)
+
+        if batch.deadline is not None:
+            self._reactor.callLater(batch.remaining_time, self._expire_batch, batch)
+
+        for url in batch.urls:
+            request = self._spider.build_request(
+                url,
+                meta={"scrape_batch": batch, "scrape_url": url},
+                dont_filter=True,
+            ).replace(errback=self._on_request_failed)
+
+            self._crawler.engine.crawl(request)
+
+    def _expire_batch(self, batch: ScrapeBatch):
+        if batch.done:
+            return
+
+        logger.warning(f"Scrape deadline of {batch.deadline}s reached, cancelling {len(batch.pending)} outstanding URLs.")
+        batch.finish(reason="deadline")
+        self._forget(batch)
+
+    def _cancel_batch(self, batch: ScrapeBatch):
+        if batch.done:
+            return
+
+        logger.info(f"Scrape batch cancelled, dropping {len(batch.pending)} outstanding URLs.")
+        batch.finish(reason="cancelled")
+        self._forget(batch)
+
+    def _forget(self, batch: ScrapeBatch):
+        if batch.done and batch in self._batches:
+            self._batches.remove(batch)
+
+    def _complete(self, meta: dict, status: str):
+        batch = meta.get("scrape_batch")
+        if batch is None:
+            return
+
+        batch.mark_done(meta.get("scrape_url"), status=status)
+        self._forget(batch)
+
+    def _on_spider_opened(self, spider):
+        self._spider = spider
+        self._ready.set()
+
+    def _on_spider_idle(self, spider):
+        # Nothing is in flight, so any batch still waiting lost requests without a signal.
+        for batch in self._batches:
+            batch.finish()
+        self._batches.clear()
+
+        if not self._stopping:
+            raise DontCloseSpider
+
+    def _on_item_scraped(self, item, response, spider):
+        batch = response.meta.get("scrape_batch")
+        if batch is not None:
+            batch.add_item(dict(item))
+            batch.record(response.meta)
+        self._complete(response.meta, status="scraped" if item.get('cleaned_text') else "empty")
+
+    def _on_item_dropped(self, item, response, exception, spider):
+        self._complete(response.meta, status="dropped")
+
+    def _on_spider_error(self, failure, response, spider):
+        self._complete(response.meta, status="error")
+
+    def _on_request_dropped(self, request, spider):
+        self._complete(request.meta, status="dropped")
+
+    def _on_request_failed(self, failure):
+        batch = failure.request.meta.get("scrape_batch")
+        if batch is not None and batch.done and failure.check(IgnoreRequest):
+            logger.debug(f"Skipped request for URL: {failure.request.url}, its batch already finished.")
+            return
+
+        self._spider.handle_error(failure)
+        self._complete(failure.request.meta, status="failed")
+
+
+_ENGINE: Optional[ScrapingEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_scraping_engine() -> ScrapingEngine:
+    """
+    Returns the process-wide 'ScrapingEngine', starting it on first use.
+    """
+    global _ENGINE
+
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            engine = ScrapingEngine()
+            engine.start()
+            _ENGINE = engine
+
+    return _ENGINE
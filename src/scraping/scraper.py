@@ -1,41 +1,112 @@
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
-from crawler.article_crawler.spiders.content_spider import ContentSpider
-from crawler.article_crawler.items import ArticleCrawlerItem
-
+import asyncio
 import logging
-from typing import Dict, List
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from scrapy.utils.project import get_project_settings
+from crawler.article_crawler.page_cache import get_page_cache
+from src import config
+from src.scraping.engine import ScrapeBatch, get_scraping_engine
 
 
 logger = logging.getLogger(__name__)
 
-CRAWLER_RESULTS = []
 
+def _serve_from_page_cache(urls: List[str]) -> Tuple[Dict[str, str], List[str], Counter]:
+    """
+    Splits the URLs into those with a fresh page cache entry, which are served without
+    touching the network, and those that still have to go through the scraping engine.
+    """
+    page_cache = get_page_cache(get_project_settings())
+    if page_cache is None:
+        return {}, urls, Counter()
+
+    cached_content = {}
+    remaining = []
+    stats = Counter()
 
-class ItemCollectorPipeline:
-    """A Scrapy pipeline that collects items into a list."""
-    def __init__(self):
-        self.items = []
+    for url in dict.fromkeys(urls):
+        entry = page_cache.get_fresh(url)
+        if entry is None:
+            remaining.append(url)
+            continue
 
-    def open_spider(self, spider):
-        CRAWLER_RESULTS.clear()
+        cached_content[entry.final_url] = entry.cleaned_text
+        stats["page_cache/fresh"] += 1
+        stats["page_cache/bytes_saved"] += entry.content_length
 
-    def close_spider(self, spider):
-        global CRAWLER_RESULTS
-        CRAWLER_RESULTS = self.items
+    return cached_content, remaining, stats
 
-    def process_item(self, item, spider):
-        self.items.append(dict(item))
-        return item
-    
 
-def scrape_urls(urls: List[str]) -> Dict[str, str]:
+def _scrape_budget(deadline: Optional[float], max_pages: Optional[int], num_cached: int) -> Tuple[Optional[float], Optional[int]]:
     """
-    Runs the Scrapy content_spider for the given URLs and returns the cleaned text.
-    The function signature remains the same, so the rest of the application is unaffected.
+    Resolves the deadline and page limit of a call against the config defaults, pages served
+    from the page cache count towards the limit. A limit of 0 means the engine is not needed.
+    """
+    deadline = config.SCRAPE_DEADLINE if deadline is None else deadline
+    max_pages = config.SCRAPE_MAX_PAGES if max_pages is None else max_pages
+
+    if max_pages:
+        return deadline or None, max(max_pages - num_cached, 0)
+    return deadline or None, None
+
+
+def _log_url_timings(batch: ScrapeBatch):
+    if batch.stop_reason not in (None, "completed"):
+        logger.info(msg=f"Scrape stopped early ({batch.stop_reason}) after {batch.elapsed:.1f}s.")
+
+    for timing in sorted(batch.timings.values(), key=lambda timing: timing.seconds, reverse=True):
+        chars = ""
+        if timing.url in batch.text_lengths:
+            before, after = batch.text_lengths[timing.url]
+            chars = f"  {before} -> {after} chars"
+        logger.info(msg=f"{timing.seconds:7.2f}s  {timing.status:<9}  {urlparse(timing.url).netloc}  {timing.url}{chars}")
+
+
+def _log_scrape_summary(scraped_content: Dict[str, str], stats: Counter, batch: Optional[ScrapeBatch] = None):
+    logger.info(msg=f"Scraping complete. Successfully extracted content from {len(scraped_content)} URLs.")
+
+    if batch is not None:
+        _log_url_timings(batch)
+
+    fetched = stats["fetch/http"] + stats["fetch/browser"]
+    if fetched:
+        fallbacks = ", ".join(
+            f"{key.rsplit('/', 1)[-1]}: {count}" for key, count in sorted(stats.items()) if key.startswith("fetch/browser_fallback/")
+        )
+        logger.info(
+            msg=f"Fetched {fetched} pages: {stats['fetch/http']} over plain HTTP, {stats['fetch/browser']} with the browser"
+                + (f" (fallbacks - {fallbacks})." if fallbacks else ".")
+        )
+
+    chars_before, chars_after = stats["extract/chars_before"], stats["extract/chars_after"]
+    if chars_before > chars_after:
+        logger.info(
+            msg=f"Main content extraction kept {chars_after} of {chars_before} characters "
+                f"({chars_after / chars_before:.0%}), {chars_before - chars_after} fewer to chunk and embed."
+        )
+
+    hits = stats["page_cache/fresh"] + stats["page_cache/revalidated"]
+    lookups = hits + stats["page_cache/miss"]
+    if lookups:
+        logger.info(
+            msg=f"Page cache: {hits}/{lookups} hits ({hits / lookups:.0%}, {stats['page_cache/revalidated']} revalidated), "
+                f"{stats['page_cache/bytes_saved']} bytes saved."
+        )
+
+
+def scrape_urls(urls: List[str], deadline: Optional[float] = None, max_pages: Optional[int] = None) -> Dict[str, str]:
+    """
+    Submits the given URLs to the long-lived scraping engine and returns the cleaned text.
+    Pages with a fresh entry in the page cache are returned without being scraped again.
+    When the deadline passes or 'max_pages' pages were scraped, outstanding requests are
+    cancelled and whatever was collected is returned.
 
     args:
         urls: a list of url strings to be scraped.
+        deadline: seconds to wait for the pages, defaults to 'config.SCRAPE_DEADLINE', 0 waits for every page.
+        max_pages: stop after this many pages with text, defaults to 'config.SCRAPE_MAX_PAGES', 0 scrapes every page.
 
     returns:
         a dictionary of urls to scraped text.
@@ -49,19 +120,121 @@ def scrape_urls(urls: List[str]) -> Dict[str, str]:
     if not urls:
         logger.warning(msg="Got 0 URLs to scrape, skipping Scraping process...")
         return {}
-    
-    logger.info(msg=f"Initializing Scrapy crawler for {len(urls)} URLs...")
 
-    settings = get_project_settings()
-    settings.set("ITEM_PIPELINES", {**settings.get("ITEM_PIPELINES", {}), ItemCollectorPipeline: 1})
+    scraped_content, remaining, stats = _serve_from_page_cache(urls)
+    deadline, max_pages = _scrape_budget(deadline, max_pages, len(scraped_content))
 
-    process = CrawlerProcess(settings=settings)
-    process.crawl(ContentSpider, urls=urls)
+    batch = None
+    if remaining and max_pages != 0:
+        logger.info(msg=f"Submitting {len(remaining)} URLs to the scraping engine...")
 
-    process.start()
+        batch = get_scraping_engine().submit(remaining, deadline=deadline, max_pages=max_pages)
+
+        scraped_content.update(batch.future.result())
+        stats.update(batch.stats)
+
+    _log_scrape_summary(scraped_content, stats, batch)
 
-    scraped_content = {item['url']: item['cleaned_text'] for item in CRAWLER_RESULTS if item.get('cleaned_text')}
-    
-    logger.info(msg=f"Scraping complete. Successfully extracted content from {len(scraped_content)} URLs.")
-    
     return scraped_content
+
+
+async def scrape_urls_async(urls: List[str], deadline: Optional[float] = None, max_pages: Optional[int] = None) -> Dict[str, str]:
+    """
+    Async variant of 'scrape_urls', awaits the batch without blocking the caller's event loop.
+
+    args:
+        urls: a list of url strings to be scraped.
+        deadline: seconds to wait for the pages, defaults to 'config.SCRAPE_DEADLINE'.
+        max_pages: stop after this many pages with text, defaults to 'config.SCRAPE_MAX_PAGES'.
+
+    returns:
+        a dictionary of urls to scraped text.
+    """
+
+    if not urls:
+        logger.warning(msg="Got 0 URLs to scrape, skipping Scraping process...")
+        return {}
+
+    scraped_content, remaining, stats = _serve_from_page_cache(urls)
+    deadline, max_pages = _scrape_budget(deadline, max_pages, len(scraped_content))
+
+    batch = None
+    if remaining and max_pages != 0:
+        logger.info(msg=f"Submitting {len(remaining)} URLs to the scraping engine...")
+
+        engine = await asyncio.to_thread(get_scraping_engine)
+        batch = engine.submit(remaining, deadline=deadline, max_pages=max_pages)
+
+        scraped_content.update(await asyncio.wrap_future(batch.future))
+        stats.update(batch.stats)
+
+    _log_scrape_summary(scraped_content, stats, batch)
+
+    return scraped_content
+
+
+async def scrape_urls_stream(
+    urls: List[str],
+    deadline: Optional[float] = None,
+    max_pages: Optional[int] = None
+) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Yields (url, cleaned_text) pairs as soon as each page is scraped, so downstream stages
+    can start on the first pages while slow sites are still loading. When the consumer stops
+    early, the engine batch is cancelled instead of scraping on until the deadline.
+
+    args:
+        urls: a list of url strings to be scraped.
+        deadline: seconds to wait for the pages, defaults to 'config.SCRAPE_DEADLINE'.
+        max_pages: stop after this many pages with text, defaults to 'config.SCRAPE_MAX_PAGES'.
+
+    example usage:
+        >>> async for url, text in scrape_urls_stream(['https://example.com']):
+        ...     print(url)
+            https://example.com
+    """
+
+    if not urls:
+        logger.warning(msg="Got 0 URLs to scrape, skipping Scraping process...")
+        return
+
+    scraped_content, remaining, stats = _serve_from_page_cache(urls)
+    deadline, max_pages = _scrape_budget(deadline, max_pages, len(scraped_content))
+
+    for url, text in scraped_content.items():
+        yield url, text
+
+    batch = None
+    if remaining and max_pages != 0:
+        logger.info(msg=f"Submitting {len(remaining)} URLs to the scraping engine...")
+
+        loop = asyncio.get_running_loop()
+        results: asyncio.Queue = asyncio.Queue()
+
+        def put_threadsafe(result):
+            try:
+                loop.call_soon_threadsafe(results.put_nowait, result)
+            except RuntimeError:
+                # The consumer's event loop is already closed, it stopped listening early.
+                pass
+
+        engine = await asyncio.to_thread(get_scraping_engine)
+        batch = engine.submit(
+            remaining,
+            on_result=lambda url, text: put_threadsafe((url, text)),
+            deadline=deadline,
+            max_pages=max_pages
+        )
+        batch.future.add_done_callback(lambda _: put_threadsafe(None))
+
+        try:
+            while (result := await results.get()) is not None:
+                scraped_content[result[0]] = result[1]
+                yield result
+        finally:
+            # The consumer stopped early (cancelled or closed the stream), the rest of the batch is not needed.
+            engine.cancel(batch)
+
+        stats.update(batch.stats)
+
+    _log_scrape_summary(scraped_content, stats, batch)
@@ -0,0 +1,22 @@
+import os
+import sys
+from typing import Optional
+
+
+def resident_memory_mb() -> Optional[float]:
+    """
+    Returns the current resident set size of this process in MB.
+    Falls back to the peak RSS where '/proc' is not available, and to None where neither is (e.g. Windows).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+        except ImportError:
+            return None
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
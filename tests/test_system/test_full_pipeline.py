@@ -1,3 +1,5 @@
+import asyncio
+import time
 import pytest
 from src import main
 from src.processing.text_processor import Document
@@ -10,6 +12,13 @@ MOCK_PROCESSED_DOCS = [Document(page_content='Python is a high-level, general-pu
 MOCK_FINAL_ANSWER = "Based on the context, Python is a high-level programming language."
 
 
+@pytest.fixture(autouse=True)
+def no_process_answer_cache(mocker):
+    """Queries of one test must not be answered from another test's answers."""
+    mocker.patch('src.main._answer_cache', None)
+    mocker.patch('src.config.ANSWER_CACHE_ENABLED', False)
+
+
 def test_full_rag_pipeline_end_to_end(mocker):
     """
     An end-to-end test of the entire run_pipeline function.
@@ -23,8 +32,8 @@ def test_full_rag_pipeline_end_to_end(mocker):
     mock_scrape_urls = mocker.patch('src.main.scrape_urls')
     mock_scrape_urls.return_value = MOCK_SCRAPED_CONTENT
 
-    mock_process_scraped_data = mocker.patch('src.main.process_scraped_data')
-    mock_process_scraped_data.return_value = MOCK_PROCESSED_DOCS
+    mock_iter_chunks = mocker.patch('src.main.iter_chunks')
+    mock_iter_chunks.return_value = iter(MOCK_PROCESSED_DOCS)
     
     mock_retriever_instance = mocker.patch('src.main.Retriever').return_value
     mock_retriever_instance.build_vector_store.return_value = None
@@ -44,5 +53,161 @@ def test_full_rag_pipeline_end_to_end(mocker):
 
     mock_get_search_results.assert_called_once_with(query=MOCK_QUERY)
     mock_scrape_urls.assert_called_once_with(urls=MOCK_SEARCH_RESULTS)
-    mock_retriever_instance.retrieve_context.assert_called_once_with(query=MOCK_QUERY)
-    mock_generator_instance.generate_answer.assert_called_once_with(query=MOCK_QUERY, context_docs=MOCK_PROCESSED_DOCS)
\ No newline at end of file
+    mock_iter_chunks.assert_called_once_with(scraped_content=MOCK_SCRAPED_CONTENT)
+    mock_retriever_instance.retrieve_context.assert_called_once_with(query=MOCK_QUERY, query_vector=None, source_urls=set(MOCK_SCRAPED_CONTENT))
+    mock_generator_instance.generate_answer.assert_called_once_with(query=MOCK_QUERY, context_docs=MOCK_PROCESSED_DOCS)
+
+def test_async_pipeline_does_not_wait_for_slow_pages(mocker):
+    """
+    Tests that the async pipeline retrieves once 'min_pages' pages are indexed,
+    instead of waiting for the slowest site to finish loading.
+    """
+
+    async def mock_scrape_urls_stream(urls, deadline=None):
+        yield 'http://python.org/about', MOCK_SCRAPED_CONTENT['http://python.org/about']
+        await asyncio.sleep(30)
+        yield 'http://slow.example.com', 'This page arrives far too late.'
+
+    mocker.patch('src.main.get_search_results', return_value=MOCK_SEARCH_RESULTS + ['http://slow.example.com'])
+    mocker.patch('src.main.scrape_urls_stream', new=mock_scrape_urls_stream)
+    mock_process_scraped_data = mocker.patch('src.main.process_scraped_data', return_value=MOCK_PROCESSED_DOCS)
+
+    mock_retriever_instance = mocker.MagicMock()
+    mock_retriever_instance.retrieve_context.return_value = MOCK_PROCESSED_DOCS
+    mock_generator_instance = mocker.MagicMock()
+    mock_generator_instance.generate_answer.return_value = MOCK_FINAL_ANSWER
+
+    started_at = time.perf_counter()
+    answer, source_urls = asyncio.run(main.pipeline_async(
+        query=MOCK_QUERY,
+        retriever=mock_retriever_instance,
+        generator=mock_generator_instance,
+        min_pages=1,
+        deadline=10
+    ))
+
+    assert time.perf_counter() - started_at < 5
+    assert answer == MOCK_FINAL_ANSWER
+    assert source_urls == {'http://python.org/about'}
+
+    mock_process_scraped_data.assert_called_once_with(scraped_content=MOCK_SCRAPED_CONTENT)
+    mock_retriever_instance.build_vector_store.assert_called_once_with(documents=MOCK_PROCESSED_DOCS)
+    mock_retriever_instance.retrieve_context.assert_called_once_with(query=MOCK_QUERY, query_vector=None, source_urls={'http://python.org/about'})
+    mock_generator_instance.generate_answer.assert_called_once_with(query=MOCK_QUERY, context_docs=MOCK_PROCESSED_DOCS)
+
+
+def test_async_pipeline_retrieves_at_the_deadline(mocker):
+    """
+    Tests that retrieval starts at the deadline with whatever was indexed when
+    fewer than 'min_pages' pages arrived in time.
+    """
+
+    async def mock_scrape_urls_stream(urls, deadline=None):
+        await asyncio.sleep(30)
+        yield 'http://slow.example.com', 'This page arrives far too late.'
+
+    mocker.patch('src.main.get_search_results', return_value=['http://slow.example.com'])
+    mocker.patch('src.main.scrape_urls_stream', new=mock_scrape_urls_stream)
+    mock_process_scraped_data = mocker.patch('src.main.process_scraped_data')
+
+    mock_retriever_instance = mocker.MagicMock()
+    mock_retriever_instance.retrieve_context.return_value = []
+    mock_generator_instance = mocker.MagicMock()
+
+    answer, source_urls = asyncio.run(main.pipeline_async(
+        query=MOCK_QUERY,
+        retriever=mock_retriever_instance,
+        generator=mock_generator_instance,
+        min_pages=3,
+        deadline=0.2
+    ))
+
+    assert source_urls == set()
+    mock_process_scraped_data.assert_not_called()
+    mock_retriever_instance.retrieve_context.assert_called_once_with(query=MOCK_QUERY, query_vector=None, source_urls=set())
+
+def test_answer_cache_skips_search_scraping_and_generation(mocker):
+    """
+    Tests that a paraphrase of an answered query is answered from the answer cache,
+    without calling the search API, the scraper or the generator.
+    """
+
+    mock_get_search_results = mocker.patch('src.main.get_search_results', return_value=MOCK_SEARCH_RESULTS)
+    mock_scrape_urls = mocker.patch('src.main.scrape_urls', return_value=MOCK_SCRAPED_CONTENT)
+    mocker.patch('src.main.iter_chunks', return_value=iter(MOCK_PROCESSED_DOCS))
+
+    mock_retriever_instance = mocker.patch('src.main.Retriever').return_value
+    mock_retriever_instance.retrieve_context.return_value = MOCK_PROCESSED_DOCS
+    mock_retriever_instance.embedding_model.embed_query.side_effect = [[1.0, 0.1], [1.0, 0.12]]
+
+    mock_generator_instance = mocker.patch('src.main.Generator').return_value
+    mock_generator_instance.generate_answer.return_value = MOCK_FINAL_ANSWER
+
+    answer_cache = main.AnswerCache(similarity_threshold=0.95)
+
+    first = main.pipeline(MOCK_QUERY, mock_retriever_instance, mock_generator_instance, answer_cache=answer_cache)
+    second = main.pipeline("Tell me what Python is", mock_retriever_instance, mock_generator_instance, answer_cache=answer_cache)
+
+    assert second == first == (MOCK_FINAL_ANSWER, {"http://python.org/about"})
+    mock_get_search_results.assert_called_once()
+    mock_scrape_urls.assert_called_once()
+    mock_generator_instance.generate_answer.assert_called_once()
+    mock_retriever_instance.retrieve_context.assert_called_once_with(query=MOCK_QUERY, query_vector=[1.0, 0.1], source_urls=set(MOCK_SCRAPED_CONTENT))
+
+def test_pipeline_uses_the_process_answer_cache_by_default(mocker):
+    """
+    Tests that without an answer cache passed in, every query of the process shares one cache.
+    """
+
+    mocker.patch('src.config.ANSWER_CACHE_ENABLED', True)
+    mock_get_search_results = mocker.patch('src.main.get_search_results', return_value=MOCK_SEARCH_RESULTS)
+    mocker.patch('src.main.scrape_urls', return_value=MOCK_SCRAPED_CONTENT)
+    mocker.patch('src.main.iter_chunks', return_value=iter(MOCK_PROCESSED_DOCS))
+
+    mock_retriever_instance = mocker.patch('src.main.Retriever').return_value
+    mock_retriever_instance.retrieve_context.return_value = MOCK_PROCESSED_DOCS
+    mock_retriever_instance.embedding_model.embed_query.side_effect = [[1.0, 0.1], [1.0, 0.11]]
+
+    mock_generator_instance = mocker.patch('src.main.Generator').return_value
+    mock_generator_instance.generate_answer.return_value = MOCK_FINAL_ANSWER
+
+    first = main.pipeline(MOCK_QUERY, mock_retriever_instance, mock_generator_instance)
+    answer_stream, source_urls = main.pipeline_stream("Tell me what Python is", mock_retriever_instance, mock_generator_instance)
+
+    assert (MOCK_FINAL_ANSWER, {"http://python.org/about"}) == first == ("".join(answer_stream), source_urls)
+    mock_get_search_results.assert_called_once()
+    assert main.get_answer_cache() is main._answer_cache
+    assert len(main.get_answer_cache()) == 1
+
+def test_async_pipeline_stops_with_a_full_page_queue(mocker):
+    """
+    Tests that the async pipeline returns when it stops early while more pages are scraped
+    than the page queue holds, and the scraper is blocked on the full queue.
+    """
+
+    async def mock_scrape_urls_stream(urls, deadline=None):
+        for url in urls:
+            yield url, f'Content of {url}.'
+
+    urls = [f'http://example.com/{i}' for i in range(8)]
+    mocker.patch('src.main.config.PIPELINE_QUEUE_SIZE', 4)
+    mocker.patch('src.main.get_search_results', return_value=urls)
+    mocker.patch('src.main.scrape_urls_stream', new=mock_scrape_urls_stream)
+    mocker.patch('src.main.process_scraped_data', return_value=MOCK_PROCESSED_DOCS)
+
+    mock_retriever_instance = mocker.MagicMock()
+    mock_retriever_instance.build_vector_store.side_effect = lambda documents: time.sleep(0.3)
+    mock_retriever_instance.retrieve_context.return_value = MOCK_PROCESSED_DOCS
+    mock_generator_instance = mocker.MagicMock()
+    mock_generator_instance.generate_answer.return_value = MOCK_FINAL_ANSWER
+
+    answer, source_urls = asyncio.run(asyncio.wait_for(main.pipeline_async(
+        query=MOCK_QUERY,
+        retriever=mock_retriever_instance,
+        generator=mock_generator_instance,
+        min_pages=8,
+        deadline=0.1
+    ), timeout=5))
+
+    assert answer == MOCK_FINAL_ANSWER
+    assert mock_retriever_instance.build_vector_store.call_count < len(urls)
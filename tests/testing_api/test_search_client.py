@@ -1,32 +1,106 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
 from src.api import search_client
-import requests
 
-def test_get_search_results_success(mocker):
+
+class StandInSerpApi(BaseHTTPRequestHandler):
+    """A local stand-in for SerpApi that records every request it receives."""
+
+    requests_received = []
+    status = 200
+    delay = 0.0
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        type(self).requests_received.append(params)
+        time.sleep(self.delay)
+
+        body = json.dumps({
+            "organic_results": [
+                {"position": 1, "title": "Result 1", "link": "http://test.com/1"},
+                {"position": 2, "title": "Result 2", "link": "http://test.com/2"}
+            ]
+        }).encode()
+
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def serpapi(mocker):
+    StandInSerpApi.requests_received = []
+    StandInSerpApi.status = 200
+    StandInSerpApi.delay = 0.0
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInSerpApi)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    mocker.patch('src.api.search_client.SERPAPI_ENDPOINT', f"http://127.0.0.1:{server.server_port}/search")
+    search_client.clear_search_cache()
+
+    yield StandInSerpApi
+
+    server.shutdown()
+    server.server_close()
+    search_client.clear_search_cache()
+
+
+def test_get_search_results_success(serpapi):
     """Tests the happy path where the API returns valid results."""
-    # 1. Create fake API response data
-    mock_response_data = {
-        "organic_results": [
-            {"position": 1, "title": "Result 1", "link": "http://test.com/1"},
-            {"position": 2, "title": "Result 2", "link": "http://test.com/2"}
-        ]
-    }
-    
-    mock_get = mocker.patch('src.api.search_client.requests.get')
-    mock_get.return_value.status_code = 200
-    mock_get.return_value.json.return_value = mock_response_data
-    
+
     results = search_client.get_search_results("test query")
     
-    assert len(results) == 2
-    assert results[0]['link'] == "http://test.com/1"
-    mock_get.assert_called_once()
+    assert results == ["http://test.com/1", "http://test.com/2"]
+    assert len(serpapi.requests_received) == 1
+    assert serpapi.requests_received[0]["q"] == ["test query"]
 
 
-def test_get_search_results_api_error(mocker):
-    """Tests the failure path where the API returns an error."""
-    mock_get = mocker.patch('src.api.search_client.requests.get')
-    mock_get.side_effect = requests.exceptions.HTTPError
+def test_get_search_results_api_error(serpapi):
+    """Tests the failure path where the API returns an error, failures are not cached."""
+    serpapi.status = 500
     
-    results = search_client.get_search_results("test query")
-    
-    assert results == []
\ No newline at end of file
+    assert search_client.get_search_results("test query") == []
+    assert search_client.get_search_results("test query") == []
+    assert len(serpapi.requests_received) == 2
+
+
+def test_get_search_results_are_cached_by_normalized_query(serpapi):
+    """Tests that repeated queries differing only in case and spacing hit the cache."""
+
+    first = search_client.get_search_results("Test  Query")
+    second = search_client.get_search_results(" test query ")
+    other_size = search_client.get_search_results("test query", num_results=10)
+
+    assert first == second == other_size
+    assert len(serpapi.requests_received) == 2
+
+
+def test_concurrent_identical_queries_share_one_request(serpapi):
+    """Tests single-flight coalescing: N simultaneous identical queries make one upstream call."""
+    serpapi.delay = 0.3
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(search_client.get_search_results("test query")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8
+    assert all(result == ["http://test.com/1", "http://test.com/2"] for result in results)
+    assert len(serpapi.requests_received) == 1
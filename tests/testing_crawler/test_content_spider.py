@@ -1,5 +1,8 @@
+import asyncio
+import inspect
 import pytest
 from pathlib import Path
+from scrapy.exceptions import CloseSpider
 from scrapy.http import HtmlResponse, Request
 from crawler.article_crawler.spiders.content_spider import ContentSpider
 
@@ -40,4 +43,121 @@ def test_spider_parsing_logic():
     
     assert '<nav>' not in cleaned_text
     assert '<footer>' not in cleaned_text
-    assert 'script' not in cleaned_text.lower()
\ No newline at end of file
+    assert 'script' not in cleaned_text.lower()
+def test_spider_closes_after_max_pages():
+    """
+    Tests the "first K good pages" rule of standalone crawls: the spider closes
+    once 'max_pages' pages with text were scraped, after yielding the last one.
+    """
+
+    html_content = (TEST_DATA_DIR / "sample_article.html").read_text(encoding="utf-8")
+    spider = ContentSpider(max_pages="2")
+
+    for page in range(2):
+        fake_url = f"http://example.com/article-{page}.html"
+        response = HtmlResponse(url=fake_url, request=Request(url=fake_url), body=html_content, encoding='utf-8')
+        results = spider.parse(response)
+
+        assert next(results)['url'] == fake_url
+
+        if page == 0:
+            assert list(results) == []
+        else:
+            with pytest.raises(CloseSpider):
+                list(results)
+
+@pytest.mark.parametrize("body, reason", [
+    ("<html><body><p>Too short to be an article.</p></body></html>", "short_text"),
+    ("<html><body><div id=\"root\"></div><p>" + "Server rendered filler. " * 50 + "</p></body></html>", "js_markers"),
+])
+def test_spider_falls_back_to_playwright(body, reason):
+    """
+    Tests the two-tier fetch: pages downloaded over plain HTTP are re-fetched with
+    Playwright when the text is too short or the markup needs JavaScript to render,
+    and the browser response is parsed into an item.
+    """
+
+    fake_url = "http://example.com/app.html"
+    spider = ContentSpider()
+
+    request = spider.build_request(fake_url)
+    assert request.meta["playwright"] is False
+
+    response = HtmlResponse(url=fake_url, request=request, body=body, encoding='utf-8')
+    results = list(spider.parse(response))
+
+    assert len(results) == 1
+    retry = results[0]
+    assert isinstance(retry, Request)
+    assert retry.url == fake_url
+    assert retry.meta["playwright"] is True
+    assert retry.meta["fetch_fallback"] == reason
+    assert retry.dont_filter
+
+    browser_response = HtmlResponse(url=fake_url, request=retry, body=body, encoding='utf-8')
+    results = list(spider.parse(browser_response))
+
+    assert len(results) == 1
+    assert results[0]['url'] == fake_url
+
+def test_spider_without_fast_path_always_uses_playwright():
+    """
+    Tests that disabling the fast path sends every request through the browser.
+    """
+
+    spider = ContentSpider()
+    spider.fast_path_enabled = False
+
+    assert spider.build_request("http://example.com").meta["playwright"] is True
+
+def test_spider_starts_the_parse_pool_only_for_large_pages(mocker):
+    """
+    Tests that small pages never start the parse pool, and that the first large page starts it
+    but is parsed on the reactor thread while the workers are starting.
+    """
+
+    html_content = (TEST_DATA_DIR / "sample_article.html").read_text(encoding="utf-8")
+    fake_url = "http://example.com/article.html"
+    response = HtmlResponse(url=fake_url, request=Request(url=fake_url), body=html_content, encoding='utf-8')
+
+    spider = ContentSpider()
+    spider.parse_pool_size = 2
+    mock_open_parse_pool = mocker.patch.object(spider, 'open_parse_pool', return_value=[])
+
+    spider.parse_offload_min_bytes = len(response.body) + 1
+    assert not inspect.isasyncgen(spider.parse(response))
+    mock_open_parse_pool.assert_not_called()
+
+    spider.parse_offload_min_bytes = len(response.body)
+    assert not inspect.isasyncgen(spider.parse(response))
+    mock_open_parse_pool.assert_called_once_with(2)
+
+def test_spider_parses_in_the_process_pool():
+    """
+    Tests that with a parse pool configured, parse() returns an async generator whose
+    item, extracted in a worker process, matches the one parsed on the reactor thread.
+    """
+
+    html_content = (TEST_DATA_DIR / "sample_article.html").read_text(encoding="utf-8")
+    fake_url = "http://example.com/article.html"
+    response = HtmlResponse(url=fake_url, request=Request(url=fake_url), body=html_content, encoding='utf-8')
+
+    async def collect(results):
+        return [result async for result in results]
+
+    spider = ContentSpider()
+    spider.parse_offload_min_bytes = 0
+    for future in spider.open_parse_pool(1):
+        future.result(timeout=60)
+    try:
+        results = spider.parse(response)
+
+        assert inspect.isasyncgen(results)
+        pooled = asyncio.run(collect(results))
+    finally:
+        spider.closed("finished")
+
+    inline = list(ContentSpider().parse(response))
+
+    assert len(pooled) == 1
+    assert dict(pooled[0]) == dict(inline[0])
@@ -0,0 +1,70 @@
+import pytest
+from pathlib import Path
+from crawler.article_crawler import extractors
+
+
+TEST_DATA_DIR = Path(__file__).parent.parent / "test_data"
+
+@pytest.mark.parametrize("fixture", sorted(path.name for path in TEST_DATA_DIR.glob("*.html")))
+def test_lxml_extractor_matches_beautifulsoup(fixture):
+    """
+    Tests that the streaming lxml extractor produces exactly the text
+    the BeautifulSoup extractor produces for the saved HTML fixtures.
+    """
+
+    body = (TEST_DATA_DIR / fixture).read_bytes()
+
+    assert extractors.extract_text_lxml(body) == extractors.extract_text_bs4(body)
+
+def test_lxml_extractor_strips_boilerplate_while_parsing():
+    """
+    Tests that text nested anywhere inside a stripped tag is dropped, text after it is kept,
+    and that comments and the <head> never leak into the output.
+    """
+
+    body = (
+        b"<html><head><title>Title</title></head><body>"
+        b"<nav><ul><li><a href='/'>Home</a></li></ul></nav>"
+        b"<p>First &amp; <b>second</b></p><!-- a comment -->"
+        b"<aside><div><p>Related</p></div></aside><script>var p = '<p>';</script>"
+        b"<p>Third</p><footer>Copyright</footer></body></html>"
+    )
+
+    assert extractors.extract_text_lxml(body) == "First & second Third"
+
+def test_extract_text_falls_back_to_beautifulsoup(mocker):
+    """
+    Tests that a failing extractor falls back to BeautifulSoup instead of losing the page.
+    """
+
+    mocker.patch.dict(extractors.EXTRACTORS, {"lxml": mocker.Mock(side_effect=ValueError("broken"))})
+
+    assert extractors.extract_text(b"<body><p>Still here</p></body>", extractor="lxml") == "Still here"
+
+def test_extract_text_rejects_unknown_extractors():
+    with pytest.raises(ValueError):
+        extractors.extract_text(b"<body></body>", extractor="regex")
+
+def test_main_content_keeps_only_the_article_body():
+    """
+    Tests that the main-content mode drops the cookie banner, newsletter, related articles
+    and comment thread, keeps every section of the article, and reports the full length.
+    """
+
+    body = (TEST_DATA_DIR / "long_article.html").read_bytes()
+
+    main_text, full_text_length = extractors.extract_page(body, extractor="main_content")
+
+    assert full_text_length == len(extractors.extract_text_lxml(body))
+    assert len(main_text) < full_text_length
+    assert main_text.startswith("Grid Storage Capacity Doubles as Solar Output Hits Record")
+    assert all(f"Section {section}:" in main_text for section in range(1, 13))
+    assert "cookies" not in main_text
+    assert "Related articles" not in main_text
+    assert "reader1" not in main_text
+    assert "newsletter" not in main_text
+
+def test_main_content_falls_back_to_the_full_text_without_paragraphs():
+    body = b"<html><body><div class='menu'>Home</div><span>Just a short note.</span></body></html>"
+
+    assert extractors.extract_page(body, extractor="main_content") == ("Home Just a short note.", 23)
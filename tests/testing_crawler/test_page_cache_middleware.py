@@ -0,0 +1,66 @@
+import pytest
+from scrapy.http import HtmlResponse, Request
+from scrapy.statscollectors import MemoryStatsCollector
+from crawler.article_crawler.middlewares import PageCacheDownloaderMiddleware
+from crawler.article_crawler.page_cache import PageCache
+from crawler.article_crawler.spiders.content_spider import ContentSpider
+
+
+URL = "http://example.com/article.html"
+
+
+@pytest.fixture
+def middleware(mocker, tmp_path):
+    middleware = PageCacheDownloaderMiddleware(PageCache(tmp_path / "pages.sqlite3", ttl=60))
+    middleware.stats = mocker.Mock(spec=MemoryStatsCollector)
+    return middleware
+
+
+def test_fresh_entry_skips_the_network(middleware):
+    """Tests that a fresh entry is answered by the middleware and parsed from the cached text."""
+
+    middleware.page_cache.store(URL, URL, "Cached article text.", content_length=500)
+
+    request = Request(URL)
+    response = middleware.process_request(request, spider=None)
+
+    assert response is not None
+    assert request.meta["page_cache"] == "fresh"
+
+    items = list(ContentSpider().parse(response))
+    assert items[0]['cleaned_text'] == "Cached article text."
+
+def test_stale_entry_is_revalidated(middleware):
+    """Tests that stale entries send conditional headers and a 304 is served from the cache."""
+
+    middleware.page_cache.store(URL, URL, "Cached article text.", etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    middleware.page_cache.ttl = 0
+
+    request = Request(URL)
+    assert middleware.process_request(request, spider=None) is None
+    assert request.headers["If-None-Match"] == b'"v1"'
+    assert request.headers["If-Modified-Since"] == b"Mon, 01 Jan 2024 00:00:00 GMT"
+
+    response = middleware.process_response(request, HtmlResponse(URL, status=304, request=request), spider=None)
+
+    assert response.status == 200
+    assert request.meta["page_cache"] == "revalidated"
+    assert request.meta["page_cache_text"] == "Cached article text."
+
+def test_downloaded_page_is_stored(middleware):
+    """Tests that a full download is cached together with its validators once scraped."""
+
+    request = Request(URL)
+    middleware.process_request(request, spider=None)
+    response = middleware.process_response(
+        request,
+        HtmlResponse(URL, status=200, body=b"<html><body>Hi</body></html>", headers={"ETag": '"v2"'}, request=request),
+        spider=None,
+    )
+
+    middleware.item_scraped({'url': URL, 'cleaned_text': "Fresh text."}, response, spider=None)
+
+    entry = middleware.page_cache.get(URL)
+    assert entry.cleaned_text == "Fresh text."
+    assert entry.etag == '"v2"'
+    assert entry.content_length == len(response.body)
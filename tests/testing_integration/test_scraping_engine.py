@@ -0,0 +1,112 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from scrapy.settings import Settings
+
+from src.scraping import engine as scraping_engine
+from src.scraping import scraper
+
+
+TEST_DATA = Path(__file__).parent.parent / "test_data"
+SLOW_PAGE_SECONDS = 5
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """Serves the HTML fixtures, '/slow/<fixture>' only after 'SLOW_PAGE_SECONDS' and anything else as a 404."""
+
+    def do_GET(self):
+        path = self.path
+        if path.startswith("/slow/"):
+            time.sleep(SLOW_PAGE_SECONDS)
+            path = path[len("/slow"):]
+
+        page = TEST_DATA / path.lstrip("/")
+        if not path.endswith(".html") or not page.is_file():
+            self.send_error(404)
+            return
+
+        body = page.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            # The scraper gave up on the page, e.g. at the deadline.
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="module")
+def engine_settings(tmp_path_factory):
+    """
+    The real engine reads the Scrapy project settings, the page cache is disabled so every call
+    goes through the network, and it only needs the plain HTTP download handler.
+    """
+    settings = Settings({"PAGE_CACHE_ENABLED": False, "LOG_LEVEL": "WARNING", "DOWNLOAD_TIMEOUT": 30})
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(scraping_engine, "get_project_settings", lambda: settings.copy())
+        monkeypatch.setattr(scraper, "get_project_settings", lambda: settings.copy())
+        yield settings
+
+    # The reactor can not be restarted, the engine of this process stops for good here.
+    if scraping_engine._ENGINE is not None:
+        scraping_engine._ENGINE.stop()
+
+
+def test_engine_is_reused_across_scrape_calls(site, engine_settings):
+    """
+    Tests that two 'scrape_urls' calls in one process go through the same running engine,
+    and that failed URLs (a 404 and a refused connection) resolve the batch without waiting for the deadline.
+    """
+
+    first = scraper.scrape_urls([f"{site}/sample_article.html", f"{site}/missing.html", "http://127.0.0.1:9/refused.html"], deadline=20)
+    engine = scraping_engine.get_scraping_engine()
+    reactor_thread = engine._thread
+
+    started_at = time.monotonic()
+    second = scraper.scrape_urls([f"{site}/long_article.html", f"{site}/docs_page.html"], deadline=20)
+
+    assert list(first) == [f"{site}/sample_article.html"]
+    assert set(second) == {f"{site}/long_article.html", f"{site}/docs_page.html"}
+    assert all(second.values())
+    assert time.monotonic() - started_at < 10
+    assert scraping_engine.get_scraping_engine() is engine
+    assert engine._thread is reactor_thread and engine.is_running
+
+def test_scrape_deadline_expires_and_engine_keeps_running(site, engine_settings):
+    """
+    Tests that a batch resolves at its deadline with the pages scraped so far while a slow page is still
+    loading, and that the engine, kept open by 'DontCloseSpider', serves the next call.
+    """
+
+    started_at = time.monotonic()
+    content = scraper.scrape_urls([f"{site}/sample_article.html", f"{site}/slow/long_article.html"], deadline=1.5)
+    elapsed = time.monotonic() - started_at
+
+    assert list(content) == [f"{site}/sample_article.html"]
+    assert elapsed < SLOW_PAGE_SECONDS
+
+    # Once the cancelled slow request settled the spider goes idle, it must stay open for the next batch.
+    time.sleep(1)
+    assert list(scraper.scrape_urls([f"{site}/docs_page.html"], deadline=20)) == [f"{site}/docs_page.html"]
@@ -0,0 +1,114 @@
+import pytest
+from src.processing.deduplication import ChunkDeduplicator, minhash
+from src.processing.text_processor import Document, process_scraped_data
+from src.main import collect_source_urls, retrieve_context_docs
+
+ARTICLE = (
+    "The city council approved the new transit plan on Tuesday, after months of debate over bus routes, "
+    "bike lanes and the cost of extending the light rail line to the northern suburbs. Supporters said the "
+    "plan would cut commute times for thousands of residents, while critics questioned whether the budget "
+    "estimates were realistic given rising construction costs and delays on earlier projects. The mayor "
+    "called the vote a turning point for the region and promised quarterly progress reports to the public."
+)
+
+OTHER_ARTICLE = (
+    "Researchers at the university published a study on sleep patterns in teenagers, finding that later school "
+    "start times were linked to better grades, fewer absences and improved mood. The team followed more than two "
+    "thousand students over three years and controlled for family income, screen time and extracurricular activities."
+)
+
+
+def make_doc(text, url, index=0):
+    return Document(page_content=text, metadata={"source_url": url, "chunk_index": index})
+
+
+@pytest.fixture(autouse=True)
+def dedup_enabled(mocker):
+    mocker.patch('src.config.DEDUP_ENABLED', True)
+    mocker.patch('src.config.DEDUP_SIMILARITY_THRESHOLD', 0.8)
+
+
+def test_exact_duplicates_collapse_and_merge_source_urls():
+    """
+    Formatting-only differences are exact duplicates, the kept chunk lists every URL.
+    """
+    documents = [
+        make_doc(ARTICLE, "http://news.com/transit"),
+        make_doc("  " + ARTICLE.upper().replace(" ", "\n  "), "http://mirror.com/transit"),
+        make_doc(OTHER_ARTICLE, "http://science.com/sleep"),
+    ]
+
+    unique = ChunkDeduplicator().add(documents)
+
+    assert [doc.metadata["source_url"] for doc in unique] == ["http://news.com/transit", "http://science.com/sleep"]
+    assert unique[0].metadata["source_urls"] == ["http://news.com/transit", "http://mirror.com/transit"]
+    assert unique[1].metadata["source_urls"] == ["http://science.com/sleep"]
+
+
+def test_near_duplicates_collapse_distinct_chunks_are_kept():
+    """
+    A syndicated copy with a couple of edited words collapses, an unrelated chunk does not.
+    """
+    edited = ARTICLE.replace("Tuesday", "Wednesday").replace("thousands of residents", "many residents")
+    assert (minhash(ARTICLE) == minhash(edited)).mean() >= 0.8
+
+    deduplicator = ChunkDeduplicator()
+    unique = deduplicator.add([
+        make_doc(ARTICLE, "http://news.com/transit"),
+        make_doc(edited, "http://syndicate.com/transit"),
+        make_doc(OTHER_ARTICLE, "http://science.com/sleep"),
+    ])
+
+    assert len(unique) == 2
+    assert unique[0].metadata["source_urls"] == ["http://news.com/transit", "http://syndicate.com/transit"]
+    assert (deduplicator.num_seen, deduplicator.num_exact, deduplicator.num_near) == (3, 0, 1)
+
+
+def test_deduplication_is_incremental_across_calls():
+    """
+    Pages added one at a time, like in 'pipeline_async', are deduplicated against earlier pages.
+    """
+    deduplicator = ChunkDeduplicator()
+
+    first = deduplicator.add(process_scraped_data({"http://news.com/transit": ARTICLE * 3}))
+    second = deduplicator.add(process_scraped_data({"http://mirror.com/transit": ARTICLE * 3}))
+
+    assert len(first) > 0
+    assert second == []
+    assert collect_source_urls(first) == {"http://news.com/transit", "http://mirror.com/transit"}
+
+
+def test_threshold_above_one_only_drops_exact_duplicates():
+    edited = ARTICLE.replace("Tuesday", "Wednesday")
+
+    unique = ChunkDeduplicator(similarity_threshold=1.1).add(
+        [make_doc(ARTICLE, "http://a.com"), make_doc(edited, "http://b.com"), make_doc(ARTICLE, "http://c.com")]
+    )
+
+    assert [doc.metadata["source_urls"] for doc in unique] == [["http://a.com", "http://c.com"], ["http://b.com"]]
+
+
+def test_disabled_indexes_chunks_unchanged(mocker):
+    mocker.patch('src.config.DEDUP_ENABLED', False)
+    documents = [make_doc(ARTICLE, "http://a.com"), make_doc(ARTICLE, "http://b.com")]
+    mocker.patch('src.main.get_search_results', return_value=["http://a.com", "http://b.com"])
+    mocker.patch('src.main.scrape_urls', return_value={"http://a.com": ARTICLE, "http://b.com": ARTICLE})
+    mocker.patch('src.main.iter_chunks', return_value=documents)
+    retriever = mocker.MagicMock()
+
+    retrieve_context_docs("transit plan", retriever)
+
+    assert retriever.build_vector_store.call_args.kwargs["documents"] is documents
+    assert "source_urls" not in documents[0].metadata
+
+
+def test_chunks_of_one_article_are_not_collapsed(mocker):
+    """
+    Overlapping chunks of the same page share text but are not near duplicates of each other.
+    """
+    mocker.patch('src.config.CHUNK_SIZE', 300)
+    mocker.patch('src.config.CHUNK_OVERLAP', 60)
+    documents = process_scraped_data({"http://news.com/long": ARTICLE + " " + OTHER_ARTICLE})
+
+    assert len(documents) > 2
+    assert ChunkDeduplicator().add(documents) == documents
@@ -1,5 +1,5 @@
 import pytest
-from src.processing.text_processor import process_scraped_data, Document
+from src.processing.text_processor import iter_chunks, process_scraped_data, Document, DocumentBatch, _get_text_splitter
 from src import config
 
 MOCK_TEXT_LONG = "This is the first sentence. " * 50 + "This is the second sentence. " * 50 + "This is the third sentence. " * 50
@@ -89,4 +89,105 @@ def test_respects_config_values(mocker):
     
     assert len(documents) > 10 
     for doc in documents:
-        assert len(doc.page_content) <= 50
\ No newline at end of file
+        assert len(doc.page_content) <= 50
+
+def test_iter_chunks_is_lazy_and_reuses_the_splitter(mocker):
+    """
+    Tests that chunks are produced page by page on demand, and the splitter is only built once per configuration.
+    """
+
+    mocker.patch('src.processing.text_processor.config.CHUNK_SIZE', 100)
+    mocker.patch('src.processing.text_processor.config.CHUNK_OVERLAP', 20)
+    _get_text_splitter.cache_clear()
+
+    split_text = mocker.spy(_get_text_splitter(100, 20), 'split_text')
+    chunks = iter_chunks(MOCK_SCRAPED_CONTENT)
+
+    first = next(chunks)
+    assert first.metadata == {"source_url": "http://example.com/long_article", "chunk_index": 0, "start_index": 0}
+    assert split_text.call_count == 1
+
+    documents = [first, *chunks]
+    assert documents == process_scraped_data(MOCK_SCRAPED_CONTENT)
+    assert _get_text_splitter.cache_info().misses == 1
+
+
+def test_document_batch_round_trips_documents():
+    """
+    Tests that a DocumentBatch hands back the same documents it was given, with URLs interned once.
+    """
+
+    documents = process_scraped_data(MOCK_SCRAPED_CONTENT)
+    documents[1].metadata["source_urls"] = ["http://example.com/long_article", "http://mirror.com/long_article"]
+    documents.append(Document(page_content="Ünïcode, no chunk index.", metadata={"source_url": "http://example.com/other"}))
+
+    batch = DocumentBatch(documents)
+
+    assert len(batch) == len(documents)
+    assert list(batch) == documents
+    assert batch[-1] == documents[-1]
+    assert batch.urls == ["http://example.com/long_article", "http://example.com/short_article", "http://example.com/other"]
+    assert not hasattr(batch[0], "__dict__")
+
+    with pytest.raises(IndexError):
+        batch[len(documents)]
+
+def test_document_batch_stores_source_urls_as_url_ids():
+    """
+    Tests that deduplication's 'source_urls' lists round-trip without keeping per-row metadata dicts.
+    """
+
+    documents = process_scraped_data(MOCK_SCRAPED_CONTENT)
+    for doc in documents:
+        doc.metadata["source_urls"] = [doc.metadata["source_url"]]
+    documents[0].metadata["source_urls"] = ["http://example.com/long_article", "http://mirror.com/long_article"]
+
+    batch = DocumentBatch(documents)
+
+    assert list(batch) == documents
+    assert not batch._extra
+    assert list(batch._mirror_offsets) == [0] + [-1] * (len(documents) - 1)
+    assert "http://mirror.com/long_article" not in batch.urls
+
+    batch.set_metadata(0, {"source_url": "http://example.com/long_article", "source_urls": ["http://mirror.com/long_article", "http://example.com/long_article"]})
+    assert batch.metadata(0)["source_urls"] == ["http://mirror.com/long_article", "http://example.com/long_article"]
+    assert len(batch._mirror_url_ids) == 3
+
+    batch.set_metadata(1, {"source_url": "http://example.com/long_article", "chunk_index": 1})
+    assert "source_urls" not in batch.metadata(1)
+
+def test_document_batch_deletes_rows_in_place():
+    """
+    Tests that deleting rows compacts every column, including the text buffer and 'source_urls', in place.
+    """
+
+    documents = process_scraped_data(MOCK_SCRAPED_CONTENT)
+    documents[0].metadata["source_urls"] = ["http://example.com/long_article", "http://mirror.com/a"]
+    documents[2].metadata["source_urls"] = ["http://example.com/long_article", "http://mirror.com/b", "http://mirror.com/c"]
+    documents[-1].metadata["note"] = "kept"
+    batch = DocumentBatch(documents)
+    text = batch._text
+
+    batch.delete_rows([0, 1])
+
+    assert list(batch) == documents[2:]
+    assert batch._text is not text
+    assert list(batch._mirror_url_ids) == [3] + [batch._url_ids_by_url[url] for url in documents[2].metadata["source_urls"]]
+
+    batch.delete_rows(row for row in range(len(batch)) if batch.source_url(row) == "http://example.com/short_article")
+    assert batch.urls == ["http://example.com/long_article"]
+    assert "note" not in [key for doc in batch for key in doc.metadata]
+
+def test_document_batch_set_metadata_and_select():
+    batch = DocumentBatch(process_scraped_data(MOCK_SCRAPED_CONTENT))
+    last = len(batch) - 1
+
+    batch.set_metadata(0, {"source_url": "http://example.com/long_article", "chunk_index": 7, "source_urls": ["a", "b"]})
+    assert batch.metadata(0) == {"source_url": "http://example.com/long_article", "chunk_index": 7, "source_urls": ["a", "b"]}
+
+    with pytest.raises(ValueError):
+        batch.set_metadata(0, {"source_url": "http://elsewhere.com"})
+
+    selected = batch.select([last, 0])
+    assert list(selected) == [batch[last], batch[0]]
+    assert selected.urls == ["http://example.com/short_article", "http://example.com/long_article"]
@@ -0,0 +1,86 @@
+import pytest
+from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, trainers
+from src.processing.token_splitter import EmbeddingTokenSplitter, resolve_model_id
+from src.processing import text_processor
+from src.processing.text_processor import iter_chunks
+
+TEXT = (
+    "Retrieval augmented generation grounds answers in fetched documents. "
+    "Pages are scraped, cleaned, chunked and embedded before retrieval! "
+    "Chunks longer than the embedding window are silently truncated by the model? "
+    "Tokenization-aware chunking avoids that, at the cost of loading the tokenizer. "
+) * 6
+
+
+@pytest.fixture
+def tokenizer():
+    """A small WordPiece tokenizer trained on the test text, so words are split into several pieces."""
+    tokenizer = Tokenizer(models.WordPiece(unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.train_from_iterator([TEXT], trainers.WordPieceTrainer(vocab_size=120, special_tokens=["[UNK]"]))
+    return tokenizer
+
+
+def test_chunks_fit_the_window_and_cover_the_text(tokenizer):
+    splitter = EmbeddingTokenSplitter(tokenizer, chunk_tokens=24, overlap_tokens=4)
+
+    spans = splitter.split_spans([TEXT])[0]
+    chunks = [TEXT[start:end] for start, end in spans]
+
+    assert len(chunks) > 3
+    assert max(splitter.count_tokens(chunks)) <= 24
+    assert spans[0][0] == 0 and spans[-1][1] == len(TEXT.rstrip())
+    assert all(next_start < end for (_, end), (next_start, _) in zip(spans, spans[1:]))
+
+    for start, end in spans:
+        assert start == 0 or not TEXT[start - 1].isalnum()
+        assert end == len(TEXT) or not TEXT[end].isalnum()
+
+def test_windows_prefer_sentence_ends(tokenizer):
+    """Every sentence is well below a quarter of the window, so every window can end after one."""
+    splitter = EmbeddingTokenSplitter(tokenizer, chunk_tokens=160)
+
+    chunks = splitter.split_text(TEXT)
+
+    assert len(chunks) > 2
+    assert all(chunk[-1] in ".!?" for chunk in chunks)
+
+def test_spans_are_cached_and_pages_batched(tokenizer, mocker):
+    splitter = EmbeddingTokenSplitter(tokenizer, chunk_tokens=24, cache_size=2)
+    encode_batch = mocker.spy(splitter.tokenizer, "encode_batch")
+
+    first = splitter.split_spans([TEXT, "A short page.", TEXT])
+    second = splitter.split_spans([TEXT])
+
+    assert first[0] == first[2] == second[0]
+    encode_batch.assert_called_once()
+    assert len(encode_batch.call_args.args[0]) == 2
+
+def test_iter_chunks_in_token_mode(tokenizer, mocker):
+    mocker.patch('src.processing.text_processor.config.CHUNKING_MODE', "tokens")
+    mocker.patch('src.processing.text_processor._get_token_splitter', return_value=EmbeddingTokenSplitter(tokenizer, chunk_tokens=24))
+
+    documents = list(iter_chunks({"http://example.com/rag": TEXT, "http://example.com/empty": ""}))
+
+    assert len(documents) > 3
+    for i, doc in enumerate(documents):
+        assert doc.metadata["chunk_index"] == i
+        assert TEXT[doc.metadata["start_index"]:].startswith(doc.page_content)
+
+def test_token_mode_falls_back_to_characters(mocker):
+    """Tests that chunking still works when the tokenizer can not be loaded."""
+
+    mocker.patch('src.processing.text_processor.config.CHUNKING_MODE', "tokens")
+    mocker.patch('src.processing.token_splitter.EmbeddingTokenSplitter.from_pretrained', side_effect=OSError("offline"))
+    text_processor._get_token_splitter.cache_clear()
+
+    documents = list(iter_chunks({"http://example.com/rag": TEXT}))
+
+    assert len(documents) > 1
+    assert all(len(doc.page_content) <= text_processor.config.CHUNK_SIZE for doc in documents)
+    text_processor._get_token_splitter.cache_clear()
+
+def test_resolve_model_id():
+    assert resolve_model_id("all-MiniLM-L6-v2") == "sentence-transformers/all-MiniLM-L6-v2"
+    assert resolve_model_id("BAAI/bge-small-en-v1.5") == "BAAI/bge-small-en-v1.5"
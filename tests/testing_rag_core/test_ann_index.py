@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+from src.rag_core.ann_index import AnnIndex, AnnParams
+from src.rag_core.vector_index import VectorIndex
+from src.processing.text_processor import Document
+
+
+DIMENSION = 32
+
+
+def random_vectors(n, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_docs(url, n):
+    return [Document(page_content=f"{url} chunk {i}", metadata={"source_url": url, "chunk_index": i}) for i in range(n)]
+
+
+def embed_fn(vectors, offset=0):
+    def embed(texts):
+        return [vectors[offset + int(text.rsplit(" ", 1)[1])] for text in texts]
+    return embed
+
+
+def test_auto_index_type_switches_above_threshold():
+    """Tests that 'auto' searches exactly below the threshold and with the ANN index type above it."""
+
+    params = AnnParams(index_type="auto", auto_index_type="ivf_flat", min_vectors=100)
+
+    assert params.resolve(99) == "flat"
+    assert params.resolve(100) == "ivf_flat"
+    assert AnnParams(index_type="hnsw", min_vectors=100).resolve(10) == "flat"
+    assert AnnParams(index_type="flat", min_vectors=0).resolve(10 ** 6) == "flat"
+    assert AnnParams(min_vectors=100).resolve(10 ** 6) == "hnsw"
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "ivf_pq", "hnsw"])
+def test_ann_search_finds_nearest_rows(index_type):
+    """Tests that every index type finds a stored vector as its own nearest neighbor, with its exact score."""
+
+    vectors = random_vectors(2000)
+    ann = AnnIndex.build(vectors, index_type, AnnParams(nprobe=64, pq_m=8))
+
+    rows, scores = ann.search(vectors, vectors[123], k=5)
+
+    assert rows[0] == 123
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert list(scores) == sorted(scores, reverse=True)
+
+def test_deleted_rows_are_filtered_and_trigger_rebuild():
+    """Tests that deleted rows are never returned and that the index asks for a rebuild past the deleted fraction."""
+
+    vectors = random_vectors(500)
+    ann = AnnIndex.build(vectors, "hnsw", AnnParams(rebuild_fraction=0.2))
+
+    new_rows = np.arange(500)
+    new_rows[:50] = -1
+    new_rows[50:] -= 50
+    ann.remap_rows(new_rows)
+    kept = vectors[50:]
+
+    rows, _ = ann.search(kept, vectors[10], k=10)
+    assert len(ann) == 450
+    assert not ann.needs_rebuild
+    assert all(0 <= row < 450 for row in rows)
+
+    rows, _ = ann.search(kept, kept[7], k=1)
+    assert rows[0] == 7
+
+    ann.remap_rows(np.where(np.arange(450) < 100, -1, np.arange(450) - 100))
+    assert ann.needs_rebuild
+
+def test_vector_index_uses_ann_and_follows_updates():
+    """Tests that VectorIndex builds the ANN index when an upsert crosses the threshold and keeps it in step with upserts and deletes."""
+
+    vectors = random_vectors(450)
+    index = VectorIndex(ann_params=AnnParams(index_type="hnsw", min_vectors=300))
+
+    index.upsert(make_docs("url1", 200), embed_fn(vectors))
+    assert index.index_type == "flat"
+    assert index._ann is None
+
+    index.upsert(make_docs("url2", 200), embed_fn(vectors, offset=200))
+    assert index.index_type == "hnsw"
+    assert index._ann is not None
+    doc, score = index.search(vectors[205], k=1)[0]
+    assert doc.page_content == "url2 chunk 5"
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+    index.upsert(make_docs("url3", 50), embed_fn(vectors, offset=400))
+    assert len(index._ann) == 450
+    assert index.search(vectors[410], k=1)[0][0].page_content == "url3 chunk 10"
+
+    index.delete("url3")
+    assert len(index._ann) == 400
+    assert index.search(vectors[410], k=1)[0][0].metadata["source_url"] != "url3"
+
+    index.delete("url1")
+    assert index.index_type == "flat"
+    assert index._ann is None
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "hnsw"])
+def test_ann_search_is_restricted_to_source_rows(mocker, index_type):
+    """Tests that a search restricted to some pages goes through the ANN index and only returns their chunks."""
+
+    vectors = random_vectors(400)
+    index = VectorIndex(ann_params=AnnParams(index_type=index_type, min_vectors=100, nprobe=64))
+    for page in range(4):
+        index.upsert(make_docs(f"url{page}", 100), embed_fn(vectors, offset=100 * page))
+    ann_search = mocker.spy(index._ann, "search")
+
+    results = index.search(vectors[5], k=5, source_urls={"url2", "url3"})
+
+    ann_search.assert_called_once()
+    assert len(results) == 5
+    assert {doc.metadata["source_url"] for doc, _ in results} <= {"url2", "url3"}
+    assert index.search(vectors[250], k=1, source_urls={"url2"})[0][0].page_content == "url2 chunk 50"
+
+def test_ann_index_is_saved_and_loaded(tmp_path):
+    """Tests that a trained ANN index is saved with the vectors and reused when the index is loaded."""
+
+    vectors = random_vectors(300)
+    params = AnnParams(index_type="ivf_flat", min_vectors=100, nprobe=64)
+    index = VectorIndex(tmp_path, params)
+    index.upsert(make_docs("url1", 300), embed_fn(vectors))
+    index.search(vectors[0], k=1)
+    index.save()
+
+    loaded = VectorIndex.load(tmp_path, params)
+
+    assert loaded._ann is not None
+    assert loaded.search(vectors[42], k=1)[0][0].page_content == "url1 chunk 42"
+    assert VectorIndex.load(tmp_path)._ann is None
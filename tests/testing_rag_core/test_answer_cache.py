@@ -0,0 +1,70 @@
+import pytest
+from src.rag_core.answer_cache import AnswerCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lookup_hits_similar_queries_only():
+    """Tests that a query close enough to a cached one gets its answer and a dissimilar one misses."""
+
+    cache = AnswerCache(similarity_threshold=0.9)
+    cache.put("What is Python?", [1.0, 0.1, 0.0], "A programming language.", {"url1"})
+
+    hit = cache.lookup([2.0, 0.25, 0.0])
+    assert hit.answer == "A programming language."
+    assert hit.source_urls == {"url1"}
+    assert hit.similarity == pytest.approx(1.0, abs=0.01)
+
+    assert cache.lookup([0.5, 1.0, 0.0]) is None
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+def test_entries_expire_after_ttl():
+    """Tests that an entry older than the TTL is no longer returned."""
+
+    clock = FakeClock()
+    cache = AnswerCache(ttl_seconds=60, clock=clock)
+    cache.put("q", [1.0, 0.0], "answer", {"url1"})
+
+    clock.now += 59
+    assert cache.lookup([1.0, 0.0]) is not None
+
+    clock.now += 2
+    assert cache.lookup([1.0, 0.0]) is None
+
+def test_least_recently_used_entry_is_evicted():
+    """Tests that a full cache replaces the entry looked up least recently."""
+
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", [1.0, 0.0, 0.0], "answer a", {"url1"})
+    cache.put("b", [0.0, 1.0, 0.0], "answer b", {"url2"})
+
+    assert cache.lookup([1.0, 0.0, 0.0]).answer == "answer a"
+    cache.put("c", [0.0, 0.0, 1.0], "answer c", {"url3"})
+
+    assert len(cache) == 2
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0]).answer == "answer a"
+    assert cache.lookup([0.0, 0.0, 1.0]).answer == "answer c"
+
+def test_expired_entries_are_replaced_first():
+    """Tests that a full cache reuses the slot of an expired entry before evicting a live one."""
+
+    clock = FakeClock()
+    cache = AnswerCache(max_entries=2, ttl_seconds=60, clock=clock)
+    cache.put("a", [1.0, 0.0, 0.0], "answer a", {"url1"})
+    clock.now += 50
+    cache.put("b", [0.0, 1.0, 0.0], "answer b", {"url2"})
+    clock.now += 20
+
+    cache.lookup([0.0, 1.0, 0.0])
+    cache.put("c", [0.0, 0.0, 1.0], "answer c", {"url3"})
+
+    assert cache.lookup([0.0, 1.0, 0.0]).answer == "answer b"
+    assert cache.lookup([0.0, 0.0, 1.0]).answer == "answer c"
@@ -0,0 +1,53 @@
+import pytest
+from src.rag_core.context_selection import merge_adjacent_chunks, mmr_select
+from src.processing.text_processor import Document, iter_chunks
+
+
+PAGE = " ".join(f"Sentence number {i} of the page." for i in range(300))
+
+
+def test_mmr_skips_near_duplicates():
+    """Tests that MMR prefers a less relevant but different candidate over a near-duplicate of its first pick."""
+
+    query = [1.0, 0.0, 0.0]
+    vectors = [[1.0, 0.1, 0.0], [1.0, 0.12, 0.0], [0.7, 0.0, 0.7]]
+
+    assert mmr_select(query, vectors, k=2, lambda_mult=1.0) == [0, 1]
+    assert mmr_select(query, vectors, k=2, lambda_mult=0.5) == [0, 2]
+
+def test_mmr_caps_candidates_per_group():
+    """Tests that no group gets more than 'max_per_group' picks, even when it holds the most relevant candidates."""
+
+    vectors = [[1.0, 0.0], [0.99, 0.1], [0.98, 0.2], [0.5, 0.5]]
+    groups = ["url1", "url1", "url1", "url2"]
+
+    picked = mmr_select([1.0, 0.0], vectors, k=3, lambda_mult=1.0, groups=groups, max_per_group=2)
+
+    assert picked == [0, 1, 3]
+    assert mmr_select([1.0, 0.0], vectors, k=3, relevance=[0.0, 0.0, 1.0, 0.5], lambda_mult=1.0)[0] == 2
+
+def test_merge_adjacent_chunks_drops_overlap_exactly():
+    """Tests that neighboring chunks are merged into the exact page span, at the rank of their best chunk."""
+
+    chunks = list(iter_chunks({"url1": PAGE}))
+    other = Document(page_content="Unrelated.", metadata={"source_url": "url2", "chunk_index": 0})
+
+    merged = merge_adjacent_chunks([chunks[4], other, chunks[2], chunks[3], chunks[8]])
+
+    assert [doc.metadata.get("chunk_indices", [doc.metadata["chunk_index"]]) for doc in merged] == [[2, 3, 4], [0], [8]]
+    start = chunks[2].metadata["start_index"]
+    assert merged[0].page_content == PAGE[start:chunks[4].metadata["start_index"] + len(chunks[4].page_content)]
+    assert merged[0].metadata["start_index"] == start
+
+def test_merge_without_start_index_joins_text():
+    """Tests that neighbors without character offsets are joined whole and other sources are never merged."""
+
+    docs = [
+        Document(page_content="first", metadata={"source_url": "url1", "chunk_index": 0}),
+        Document(page_content="second", metadata={"source_url": "url1", "chunk_index": 1}),
+        Document(page_content="third", metadata={"source_url": "url2", "chunk_index": 2}),
+    ]
+
+    merged = merge_adjacent_chunks(docs)
+
+    assert [doc.page_content for doc in merged] == ["first\nsecond", "third"]
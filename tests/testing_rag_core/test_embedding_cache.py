@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from src.rag_core.embedding_cache import EmbeddingCache
+
+
+def embed(texts):
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_only_misses_are_embedded_in_one_batch(mocker):
+    """Tests that cached texts skip the model and misses are deduplicated into a single call."""
+
+    cache = EmbeddingCache("test-model")
+    embed_fn = mocker.Mock(side_effect=embed)
+
+    cache.embed(["alpha", "beta"], embed_fn)
+    vectors = cache.embed(["alpha", "gamma", "gamma"], embed_fn)
+
+    assert embed_fn.call_count == 2
+    embed_fn.assert_called_with(["gamma"])
+    assert [v.tolist() for v in vectors] == [[5.0, 1.0], [5.0, 1.0], [5.0, 1.0]]
+    assert all(v.dtype == np.float32 for v in vectors)
+    assert cache.hits == 1
+    assert cache.misses == 4
+
+def test_keys_depend_on_model_id():
+    """Tests that the same text embedded by a different model is a different entry."""
+
+    assert EmbeddingCache("model-a").key("text") != EmbeddingCache("model-b").key("text")
+
+def test_evicted_entries_are_read_back_from_disk(mocker, tmp_path):
+    """Tests the LRU bound and that the SQLite store serves entries evicted from memory."""
+
+    cache = EmbeddingCache("test-model", tmp_path / "embeddings.sqlite3", max_entries=1)
+    embed_fn = mocker.Mock(side_effect=embed)
+
+    cache.embed(["alpha", "beta"], embed_fn)
+    assert cache.stats["entries_in_memory"] == 1
+
+    reopened = EmbeddingCache("test-model", tmp_path / "embeddings.sqlite3")
+    vectors = reopened.embed(["alpha", "beta"], embed_fn)
+
+    assert embed_fn.call_count == 1
+    assert reopened.hits == 2
+    assert vectors[1].tolist() == [4.0, 1.0]
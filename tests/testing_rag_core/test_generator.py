@@ -1,5 +1,9 @@
 import pytest
-from src.rag_core.generator import Generator
+import queue
+import time
+from collections import OrderedDict
+from threading import Event, Thread
+from src.rag_core.generator import NO_CONTEXT_ANSWER, AnswerStreamFilter, Generator
 from src.processing.text_processor import Document
 
 
@@ -58,4 +62,300 @@ def test_generator_handles_no_context():
     generator.load_model()
     
     answer = generator.generate_answer("Any query", [])
-    assert "could not find any relevant information" in answer.lower()
\ No newline at end of file
+    assert "could not find any relevant information" in answer.lower()
+def test_answer_stream_filter_strips_echoed_marker():
+    """Tests that the marker is stripped even when it arrives split across several deltas."""
+
+    answer_filter = AnswerStreamFilter()
+    deltas = ["\n  **", "Answer", ":**", " The sky", " is blue", "."]
+
+    streamed = "".join(answer_filter.feed(delta) for delta in deltas) + answer_filter.flush()
+
+    assert streamed == "The sky is blue."
+
+def test_answer_stream_filter_passes_plain_answers_through():
+    """Tests that answers without a marker are streamed as soon as they diverge from it."""
+
+    answer_filter = AnswerStreamFilter()
+
+    assert answer_filter.feed("  ") == ""
+    assert answer_filter.feed("*") == ""
+    assert answer_filter.feed("Note*") == "*Note*"
+    assert answer_filter.feed(" more") == " more"
+    assert answer_filter.flush() == ""
+
+def test_generator_answer_stream(mocker):
+    """Tests that the stream yields the cleaned deltas produced by the model's streamer."""
+
+    mocker.patch('src.rag_core.generator.AutoModelForCausalLM.from_pretrained')
+    mocker.patch('src.rag_core.generator.AutoTokenizer.from_pretrained')
+    mocker.patch('src.rag_core.generator.TextIteratorStreamer', return_value=iter(["**Answer:**", " Rayleigh", " scattering."]))
+
+    generator = Generator()
+    generator.load_model()
+
+    deltas = list(generator.generate_answer_stream("Why is the sky blue?", MOCK_CONTEXT_DOCS))
+
+    assert deltas == ["Rayleigh", " scattering."]
+    assert "streamer" in generator.model.generate.call_args.kwargs
+
+def test_generator_answer_stream_raises_generation_errors(mocker):
+    """Tests that an error in the generation thread ends the stream and is raised to the consumer instead of blocking it."""
+
+    mocker.patch('src.rag_core.generator.AutoModelForCausalLM.from_pretrained')
+    mocker.patch('src.rag_core.generator.AutoTokenizer.from_pretrained')
+
+    generator = Generator()
+    generator.load_model()
+    mocker.patch.object(generator.model, 'generate', side_effect=RuntimeError("out of memory"))
+
+    result = {}
+    def consume():
+        try:
+            list(generator.generate_answer_stream("Why is the sky blue?", MOCK_CONTEXT_DOCS))
+        except RuntimeError as e:
+            result["error"] = e
+
+    consumer = Thread(target=consume, daemon=True)
+    consumer.start()
+    consumer.join(timeout=5)
+
+    assert not consumer.is_alive()
+    assert str(result["error"]) == "out of memory"
+
+def test_generator_answer_stream_stops_generation_when_the_consumer_leaves(mocker):
+    """Tests that closing the stream early stops the generation thread instead of letting it run to 'max_new_tokens'."""
+
+    import torch
+
+    class QueueStreamer:
+        def __init__(self, *args, **kwargs):
+            self.queue = queue.Queue()
+
+        def end(self):
+            self.queue.put(None)
+
+        def __iter__(self):
+            while (text := self.queue.get()) is not None:
+                yield text
+
+    mocker.patch('src.rag_core.generator.AutoModelForCausalLM.from_pretrained')
+    mocker.patch('src.rag_core.generator.AutoTokenizer.from_pretrained')
+    mocker.patch('src.rag_core.generator.TextIteratorStreamer', QueueStreamer)
+
+    generator = Generator()
+    generator.load_model()
+
+    finished = Event()
+    steps = []
+    def generate(streamer, stopping_criteria, **kwargs):
+        while not stopping_criteria(torch.zeros((1, 1), dtype=torch.long), None).all() and len(steps) < 500:
+            steps.append(len(steps))
+            streamer.queue.put(f" token{len(steps)}")
+            time.sleep(0.01)
+        streamer.end()
+        finished.set()
+
+    mocker.patch.object(generator.model, 'generate', side_effect=generate)
+
+    stream = generator.generate_answer_stream("Why is the sky blue?", MOCK_CONTEXT_DOCS)
+    assert next(stream) == "token1"
+    stream.close()
+
+    assert finished.wait(timeout=5)
+    assert len(steps) < 500
+
+def test_generator_batch_decodes_only_new_tokens(mocker):
+    """
+    Tests that batched generation left-pads prompts without changing the shared tokenizer, returns one
+    answer per request and only counts generated tokens, not padding, in its throughput.
+    """
+
+    import torch
+
+    mocker.patch('src.rag_core.generator.AutoModelForCausalLM.from_pretrained')
+    mocker.patch('src.rag_core.generator.AutoTokenizer.from_pretrained')
+
+    generator = Generator()
+    generator.load_model()
+
+    inputs = {"input_ids": torch.ones((2, 4), dtype=torch.long)}
+    mocker.patch.object(generator, 'tokenizer')
+    generator.tokenizer.padding_side = "right"
+    generator.tokenizer.pad_token_id = 0
+    generator.tokenizer.return_value.to.return_value = inputs
+    generator.tokenizer.batch_decode.return_value = [" First answer.", "**Answer:** Second answer."]
+    outputs = torch.ones((2, 7), dtype=torch.long)
+    outputs[1, 5:] = 0
+    mocker.patch.object(generator.model, 'generate', return_value=outputs)
+    log_throughput = mocker.patch.object(generator, '_log_throughput')
+
+    answers = generator.generate_batch([("q1", MOCK_CONTEXT_DOCS), ("q2", []), ("q3", MOCK_CONTEXT_DOCS)])
+
+    assert answers[0] == "First answer."
+    assert "could not find any relevant information" in answers[1].lower()
+    assert answers[2] == "Second answer."
+    assert generator.tokenizer.call_args.kwargs["padding_side"] == "left"
+    assert generator.tokenizer.padding_side == "right"
+    assert generator.tokenizer.batch_decode.call_args.args[0].shape == (2, 3)
+    assert log_throughput.call_args.args[0] == 4
+
+@pytest.mark.parametrize("device, backend, expected", [
+    ("cpu", "auto", "int8-dynamic"),
+    ("cuda", "auto", "bnb-4bit"),
+    ("cpu", "bnb-4bit", "int8-dynamic"),
+    ("cpu", "bf16-compile", "bf16-compile"),
+])
+def test_generator_backend_is_device_aware(mocker, device, backend, expected):
+    """Tests that bitsandbytes 4-bit loading is never selected on cpu."""
+
+    mocker.patch('src.rag_core.generator.config.GENERATOR_BACKEND', backend)
+
+    generator = Generator()
+    mocker.patch.object(generator, 'device', device, create=True)
+
+    assert generator._resolve_backend() == expected
+
+class CharTokenizer:
+    """A tiny character-level tokenizer, enough to drive a randomly initialised model offline."""
+
+    eos_token_id = 0
+
+    def __call__(self, text, return_tensors=None, **kwargs):
+        from transformers import BatchEncoding
+        import torch
+
+        ids = [ord(c) % 250 + 1 for c in text]
+        if return_tensors is None:
+            return BatchEncoding({"input_ids": ids})
+
+        ids = torch.tensor([ids])
+        return BatchEncoding({"input_ids": ids, "attention_mask": torch.ones_like(ids)})
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(chr(97 + int(i) % 26) for i in ids)
+
+
+def test_prefix_cache_matches_full_prefill(mocker):
+    """
+    Tests that reusing the cached instruction prefix produces exactly the same output
+    as prefilling the whole prompt, and that the switch turns it off.
+    """
+
+    import torch
+    from transformers import Qwen2Config, Qwen2ForCausalLM
+
+    torch.manual_seed(0)
+    tiny_model = Qwen2ForCausalLM(Qwen2Config(
+        vocab_size=256, hidden_size=32, intermediate_size=64,
+        num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=2
+    )).eval()
+
+    generator = Generator()
+    mocker.patch.object(generator, 'model', tiny_model)
+    mocker.patch.object(generator, 'tokenizer', CharTokenizer())
+    mocker.patch.object(generator, 'prefix_cache', None)
+    mocker.patch.object(generator, 'device', 'cpu', create=True)
+    mocker.patch.object(generator, 'backend', 'int8-dynamic', create=True)
+    mocker.patch('src.rag_core.generator.config.PREFIX_CACHE_ENABLED', True)
+
+    generator._build_prefix_cache()
+    cached_generate = mocker.spy(tiny_model, 'generate')
+    with_prefix_cache = generator.generate_answer("Why is the sky blue?", MOCK_CONTEXT_DOCS)
+
+    assert "past_key_values" in cached_generate.call_args.kwargs
+    assert generator.prefix_cache_stats["hits"] == 1
+
+    mocker.patch('src.rag_core.generator.config.PREFIX_CACHE_ENABLED', False)
+    generator._build_prefix_cache()
+    without_prefix_cache = generator.generate_answer("Why is the sky blue?", MOCK_CONTEXT_DOCS)
+
+    assert generator.prefix_cache is None
+    assert "past_key_values" not in cached_generate.call_args.kwargs
+    assert with_prefix_cache == without_prefix_cache
+
+
+def test_pack_context_keeps_best_chunks_within_budget(mocker):
+    """
+    Tests that context packing fills the token budget in rank order, skipping chunks that
+    do not fit, and that the query and answer marker always survive.
+    """
+
+    generator = Generator()
+    mocker.patch.object(generator, 'tokenizer', CharTokenizer())
+    mocker.patch.object(generator, '_token_counts', OrderedDict())
+    mocker.patch('src.rag_core.generator.config.GENERATION_CONTEXT_WINDOW', 2000)
+    mocker.patch('src.rag_core.generator.config.GENERATION_MAX_NEW_TOKENS', 512)
+    mocker.patch('src.rag_core.generator.config.GENERATION_CONTEXT_TOKEN_BUDGET', 150)
+
+    docs = [
+        Document(page_content="a" * 60, metadata={"source_url": "u1"}),
+        Document(page_content="b" * 200, metadata={"source_url": "u2"}),
+        Document(page_content="c" * 40, metadata={"source_url": "u3"}),
+        Document(page_content="d" * 40, metadata={"source_url": "u4"}),
+    ]
+
+    packed = generator.pack_context("Why?", docs)
+
+    assert [doc.metadata["source_url"] for doc in packed] == ["u1", "u3"]
+
+    prompt = generator._build_prompt("Why?", packed)
+    assert prompt.rstrip().endswith("**Answer:**")
+    assert "Why?" in prompt
+
+def test_no_context_answer_when_nothing_fits_the_budget(mocker):
+    """
+    Tests that a query too long for any context chunk to fit is answered with 'NO_CONTEXT_ANSWER'
+    instead of generating without context, and that the budget never goes negative.
+    """
+
+    generator = Generator()
+    mocker.patch.object(generator, 'tokenizer', CharTokenizer())
+    mocker.patch.object(generator, '_token_counts', OrderedDict())
+    mocker.patch.object(generator, 'model')
+    mocker.patch('src.rag_core.generator.config.GENERATION_CONTEXT_WINDOW', 2000)
+    mocker.patch('src.rag_core.generator.config.GENERATION_MAX_NEW_TOKENS', 512)
+    warning = mocker.patch('src.rag_core.generator.logger.warning')
+
+    long_query = "Why? " * 400
+
+    assert generator.pack_context(long_query, MOCK_CONTEXT_DOCS) == []
+    assert "budget of 0 tokens" in warning.call_args.args[0]
+    assert generator.generate_answer(long_query, MOCK_CONTEXT_DOCS) == NO_CONTEXT_ANSWER
+    assert list(generator.generate_answer_stream(long_query, MOCK_CONTEXT_DOCS)) == [NO_CONTEXT_ANSWER]
+    assert generator.generate_batch([(long_query, MOCK_CONTEXT_DOCS)]) == [NO_CONTEXT_ANSWER]
+    generator.model.generate.assert_not_called()
+
+def test_token_counts_are_cached(mocker):
+    """Tests that each text is only tokenized once."""
+
+    generator = Generator()
+    tokenizer = mocker.Mock(wraps=CharTokenizer())
+    mocker.patch.object(generator, 'tokenizer', tokenizer)
+    mocker.patch.object(generator, '_token_counts', OrderedDict())
+
+    assert generator.count_tokens("hello") == 5
+    assert generator.count_tokens("hello") == 5
+    assert tokenizer.call_count == 1
+
+def test_pack_context_merges_adjacent_chunks(mocker):
+    """Tests that overlapping neighbors of a page are merged before packing and the saved tokens are counted."""
+
+    generator = Generator()
+    mocker.patch.object(generator, 'tokenizer', CharTokenizer())
+    mocker.patch.object(generator, '_token_counts', OrderedDict())
+    mocker.patch.object(generator, 'context_stats', {"queries": 0, "chunks_merged": 0, "tokens_saved": 0})
+    mocker.patch('src.rag_core.generator.config.MERGE_ADJACENT_CHUNKS', True)
+
+    docs = [
+        Document(page_content="6789abcdef", metadata={"source_url": "u1", "chunk_index": 1, "start_index": 6}),
+        Document(page_content="zzz", metadata={"source_url": "u2", "chunk_index": 0, "start_index": 0}),
+        Document(page_content="0123456789", metadata={"source_url": "u1", "chunk_index": 0, "start_index": 0}),
+    ]
+
+    packed = generator.pack_context("Why?", docs)
+
+    assert [doc.page_content for doc in packed] == ["0123456789abcdef", "zzz"]
+    assert generator.context_stats["chunks_merged"] == 1
+    assert generator.context_stats["tokens_saved"] == generator._context_tokens(docs) - generator._context_tokens(packed)
+    assert generator.context_stats["tokens_saved"] > 0
@@ -0,0 +1,46 @@
+import pytest
+from src.rag_core.reranker import Reranker
+from src.processing.text_processor import Document
+
+
+def make_docs(texts):
+    return [Document(page_content=text, metadata={"source_url": f"url{i}"}) for i, text in enumerate(texts)]
+
+
+def count_score(pairs):
+    """Scores a chunk by how often it repeats the query."""
+    return [text.count(query) for query, text in pairs]
+
+
+def test_rerank_returns_best_k_by_score(mocker):
+    """Tests that the pool is scored in batches and the best k are returned, best first."""
+
+    score_fn = mocker.Mock(side_effect=count_score)
+    reranker = Reranker(score_fn, batch_size=2)
+
+    results = reranker.rerank("cat", make_docs(["dog", "cat cat cat", "cat", "cat cat", "bird"]), k=3)
+
+    assert [doc.page_content for doc, _ in results] == ["cat cat cat", "cat cat", "cat"]
+    assert [score for _, score in results] == [3, 2, 1]
+    assert score_fn.call_count == 3
+    assert reranker.stats["pairs_scored"] == 5
+
+def test_rerank_stops_at_latency_budget(mocker):
+    """Tests that batches stop once the budget is spent and unscored candidates keep their retrieval order."""
+
+    clock = iter(range(0, 1000, 50))
+    mocker.patch("src.rag_core.reranker.time.perf_counter", side_effect=lambda: next(clock) / 1000)
+    reranker = Reranker(count_score, batch_size=2, budget_ms=300)
+
+    results = reranker.rerank("cat", make_docs(["dog", "cat", "bird", "fish", "cat cat", "cat cat cat"]), k=6)
+
+    assert [doc.page_content for doc, _ in results] == ["cat", "dog", "bird", "fish", "cat cat", "cat cat cat"]
+    assert results[-1][1] == float("-inf")
+    assert reranker.stats["pairs_skipped"] == 2
+
+def test_rerank_empty_pool():
+    """Tests that an empty candidate pool returns no results without scoring."""
+
+    reranker = Reranker(lambda pairs: pytest.fail("nothing should be scored"))
+
+    assert reranker.rerank("cat", [], k=3) == []
@@ -1,5 +1,8 @@
 import pytest
+from src.rag_core.ann_index import AnnIndex
 from src.rag_core.retriever import Retriever
+from src.rag_core.embedding_cache import EmbeddingCache
+from src.rag_core.reranker import Reranker
 from src.processing.text_processor import Document
 
 
@@ -29,34 +32,208 @@ def test_retrieve_context_before_build():
     results = retriever.retrieve_context("test query")
     assert results == []
 
-def test_build_vector_store_and_retrieve(mocker):
+class FakeEmbeddings:
+    """Deterministic bag-of-words embeddings so retrieval results are predictable."""
+
+    VOCABULARY = ["microservices", "architectural", "python", "programming", "monolith", "codebase"]
+
+    def __init__(self):
+        self.embedded_texts = []
+
+    def _embed(self, text):
+        words = text.lower().replace(".", " ").replace("?", " ").split()
+        return [float(sum(word.startswith(term) for word in words)) + 0.01 for term in self.VOCABULARY]
+
+    def embed_documents(self, texts):
+        self.embedded_texts.extend(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def test_build_vector_store_and_retrieve(mocker, tmp_path):
     """
     Tests the end-to-end flow of building a vector store and retrieving context.
     This is an integration test for the Retriever class.
     """
     
-    mocker.patch('src.rag_core.retriever.HuggingFaceEmbeddings')
-    
-    mock_faiss = mocker.patch('src.rag_core.retriever.FAISS')
-    
-    from langchain.schema import Document as LangChainDocument
-    mock_faiss.from_texts.return_value.similarity_search.return_value = [
-        LangChainDocument(page_content=doc.page_content, metadata=doc.metadata) for doc in MOCK_DOCUMENTS[:2]
-    ]
+    mocker.patch('src.rag_core.retriever.config.VECTOR_INDEX_DIR', str(tmp_path))
 
     retriever = Retriever()
+    retriever.embedding_model = FakeEmbeddings()
+    retriever.embedding_cache = None
+    retriever.vector_store = None
     
     retriever.build_vector_store(MOCK_DOCUMENTS)
     
     retrieved_docs = retriever.retrieve_context("What are microservices?")
 
-    mock_faiss.from_texts.assert_called_once()
-    
-    mock_faiss.from_texts.return_value.similarity_search.assert_called_once_with(
-        query="What are microservices?",
-        k=pytest.approx(5)
-    )
-    
-    assert len(retrieved_docs) == 2
+    assert len(retrieved_docs) == 3
     assert retrieved_docs[0].page_content == "Microservices are a popular architectural style."
-    assert retrieved_docs[0].metadata["source_url"] == "url1"
\ No newline at end of file
+    assert retrieved_docs[0].metadata["source_url"] == "url1"
+
+def test_hybrid_retrieval_finds_exact_terms(mocker, tmp_path):
+    """
+    Tests that hybrid retrieval surfaces a chunk matching an exact term the embeddings know nothing about.
+    """
+
+    mocker.patch('src.rag_core.retriever.config.VECTOR_INDEX_DIR', str(tmp_path))
+    mocker.patch('src.rag_core.retriever.config.NUM_RETRIEVED_DOCS', 2)
+
+    retriever = Retriever()
+    retriever.embedding_model = FakeEmbeddings()
+    retriever.embedding_cache = None
+    retriever.vector_store = None
+
+    retriever.build_vector_store(MOCK_DOCUMENTS + [
+        Document(page_content="Python error PX-4021 means the interpreter ran out of memory.", metadata={"source_url": "url4"}),
+    ])
+    query = "What does PX-4021 mean?"
+
+    mocker.patch('src.rag_core.retriever.config.RETRIEVAL_MODE', "dense")
+    assert "url4" not in [doc.metadata["source_url"] for doc in retriever.retrieve_context(query)]
+
+    mocker.patch('src.rag_core.retriever.config.RETRIEVAL_MODE', "hybrid")
+    assert retriever.retrieve_context(query)[0].metadata["source_url"] == "url4"
+
+    mocker.patch('src.rag_core.retriever.config.RETRIEVAL_MODE', "sparse")
+    assert [doc.metadata["source_url"] for doc in retriever.retrieve_context(query)] == ["url4"]
+
+def test_retrieve_context_searches_the_ann_index_of_the_source_pages(mocker, tmp_path):
+    """
+    Tests that the default retrieval, restricted to the pages of the query, goes through the ANN
+    index once the store is past the threshold, and that the index is built before the query.
+    """
+
+    mocker.patch('src.rag_core.retriever.config.VECTOR_INDEX_DIR', str(tmp_path))
+    mocker.patch('src.config.VECTOR_INDEX_TYPE', "hnsw")
+    mocker.patch('src.config.ANN_MIN_VECTORS', 1)
+    ann_build = mocker.spy(AnnIndex, "build")
+    ann_search = mocker.spy(AnnIndex, "search")
+
+    retriever = Retriever()
+    retriever.embedding_model = FakeEmbeddings()
+    retriever.embedding_cache = None
+    retriever.vector_store = None
+
+    retriever.build_vector_store(MOCK_DOCUMENTS)
+    ann_build.assert_called_once()
+
+    retrieved_docs = retriever.retrieve_context("What are microservices?", source_urls={"url1", "url3"})
+
+    ann_build.assert_called_once()
+    ann_search.assert_called_once()
+    assert retrieved_docs[0].metadata["source_url"] == "url1"
+    assert {doc.metadata["source_url"] for doc in retrieved_docs} == {"url1", "url3"}
+
+def test_build_vector_store_reuses_embedded_chunks(mocker, tmp_path):
+    """
+    Tests that chunks embedded for an earlier query are not re-encoded, neither while the
+    index holds them nor, through the embedding cache, once the index is gone.
+    """
+
+    mocker.patch('src.rag_core.retriever.config.VECTOR_INDEX_DIR', str(tmp_path))
+
+    retriever = Retriever()
+    embeddings = FakeEmbeddings()
+    retriever.embedding_model = embeddings
+    retriever.embedding_cache = EmbeddingCache("fake-model", tmp_path / "embeddings.sqlite3")
+    retriever.vector_store = None
+
+    retriever.build_vector_store(MOCK_DOCUMENTS[:2])
+    retriever.build_vector_store(MOCK_DOCUMENTS)
+
+    assert len(embeddings.embedded_texts) == 3
+    assert (tmp_path / "vectors.f32").exists()
+
+    retriever.vector_store = None
+    retriever.build_vector_store(MOCK_DOCUMENTS)
+
+    assert len(embeddings.embedded_texts) == 3
+    assert retriever.embedding_cache.hits == 3
+
+def test_reranker_reorders_a_larger_candidate_pool(mocker, tmp_path):
+    """Tests that with a reranker the retriever fetches the candidate pool and returns the reranker's best k."""
+
+    mocker.patch('src.rag_core.retriever.config.VECTOR_INDEX_DIR', str(tmp_path))
+    mocker.patch('src.rag_core.retriever.config.NUM_RETRIEVED_DOCS', 1)
+    mocker.patch('src.rag_core.retriever.config.RERANK_POOL_SIZE', 3)
+    mocker.patch('src.rag_core.retriever.config.RETRIEVAL_MODE', "dense")
+
+    retriever = Retriever()
+    retriever.embedding_model = FakeEmbeddings()
+    retriever.embedding_cache = None
+    retriever.vector_store = None
+    retriever.build_vector_store(MOCK_DOCUMENTS)
+
+    score_fn = mocker.Mock(side_effect=lambda pairs: [float("monolith" in text.lower()) for _, text in pairs])
+    mocker.patch.object(retriever, "reranker", Reranker(score_fn))
+
+    retrieved_docs = retriever.retrieve_context("What are microservices?")
+
+    assert len(score_fn.call_args.args[0]) == 3
+    assert [doc.metadata["source_url"] for doc in retrieved_docs] == ["url3"]
+
+def test_mmr_caps_chunks_per_source(mocker, tmp_path):
+    """Tests that MMR selection keeps at most 'MAX_CHUNKS_PER_SOURCE' chunks of one source URL."""
+
+    mocker.patch('src.rag_core.retriever.config.VECTOR_INDEX_DIR', str(tmp_path))
+    mocker.patch('src.rag_core.retriever.config.NUM_RETRIEVED_DOCS', 3)
+    mocker.patch('src.rag_core.retriever.config.RETRIEVAL_MODE', "dense")
+    mocker.patch('src.rag_core.retriever.config.MMR_ENABLED', True)
+    mocker.patch('src.rag_core.retriever.config.MAX_CHUNKS_PER_SOURCE', 1)
+
+    retriever = Retriever()
+    retriever.embedding_model = FakeEmbeddings()
+    retriever.embedding_cache = None
+    retriever.vector_store = None
+    retriever.build_vector_store(MOCK_DOCUMENTS + [
+        Document(page_content="Microservices split an architectural monolith.", metadata={"source_url": "url1", "chunk_index": 1}),
+    ])
+
+    retrieved_docs = retriever.retrieve_context("What are microservices?")
+
+    assert sorted(doc.metadata["source_url"] for doc in retrieved_docs) == ["url1", "url2", "url3"]
+
+def test_retrieval_is_restricted_to_the_current_pages(mocker, tmp_path):
+    """
+    Tests that chunks indexed for earlier queries are not retrieved for pages of the current
+    one, and that nothing is retrieved when no page was scraped for the query.
+    """
+
+    mocker.patch('src.rag_core.retriever.config.VECTOR_INDEX_DIR', str(tmp_path))
+    mocker.patch('src.rag_core.retriever.config.RETRIEVE_FROM_ALL_SOURCES', False)
+
+    retriever = Retriever()
+    retriever.embedding_model = FakeEmbeddings()
+    retriever.embedding_cache = None
+    retriever.vector_store = None
+    retriever.build_vector_store(MOCK_DOCUMENTS)
+
+    for mode in ("dense", "sparse", "hybrid"):
+        mocker.patch('src.rag_core.retriever.config.RETRIEVAL_MODE', mode)
+        retrieved_docs = retriever.retrieve_context("What are microservices in python?", source_urls={"url2"})
+        assert [doc.metadata["source_url"] for doc in retrieved_docs] == ["url2"]
+        assert retriever.retrieve_context("What are microservices?", source_urls=set()) == []
+
+    mocker.patch('src.rag_core.retriever.config.RETRIEVE_FROM_ALL_SOURCES', True)
+    assert len(retriever.retrieve_context("What are microservices in python?", source_urls={"url2"})) == 3
+
+def test_mmr_falls_back_to_candidate_order_without_finite_scores(mocker, tmp_path):
+    """Tests that MMR selection does not fail when every relevance score is NaN, e.g. from a broken reranker."""
+
+    mocker.patch('src.rag_core.retriever.config.VECTOR_INDEX_DIR', str(tmp_path))
+    mocker.patch('src.rag_core.retriever.config.MAX_CHUNKS_PER_SOURCE', 1)
+
+    retriever = Retriever()
+    retriever.embedding_model = FakeEmbeddings()
+    retriever.embedding_cache = None
+    retriever.vector_store = None
+    retriever.build_vector_store(MOCK_DOCUMENTS)
+
+    candidates = [MOCK_DOCUMENTS[2], MOCK_DOCUMENTS[0], MOCK_DOCUMENTS[1]]
+    selected = retriever._select_diverse(FakeEmbeddings().embed_query("python"), candidates, [float("nan")] * 3, k=2)
+
+    assert len(selected) == 2
+    assert selected[0] is MOCK_DOCUMENTS[2]
@@ -0,0 +1,84 @@
+import threading
+import time
+import pytest
+from src.rag_core.scheduler import GenerationScheduler
+from src.processing.text_processor import Document
+
+
+MOCK_CONTEXT_DOCS = [Document(page_content="The sky is blue.", metadata={"source_url": "science.com/sky"})]
+
+
+class FakeGenerator:
+    """Records the size of every batch it is asked to generate."""
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    def generate_batch(self, requests):
+        self.batches.append(len(requests))
+        time.sleep(self.delay)
+        return [f"answer to {query}" for query, _ in requests]
+
+
+@pytest.fixture
+def scheduler_factory():
+    schedulers = []
+
+    def factory(generator, **kwargs):
+        scheduler = GenerationScheduler(generator, **kwargs)
+        scheduler.start()
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield factory
+
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def test_concurrent_requests_are_batched(scheduler_factory):
+    """Tests that requests arriving within the wait window share one generate call."""
+
+    generator = FakeGenerator()
+    scheduler = scheduler_factory(generator, max_batch_size=8, max_wait_ms=200)
+
+    futures = [scheduler.submit(f"q{i}", MOCK_CONTEXT_DOCS) for i in range(5)]
+
+    assert [future.result(timeout=5) for future in futures] == [f"answer to q{i}" for i in range(5)]
+    assert generator.batches == [5]
+
+def test_batch_size_is_capped(scheduler_factory):
+    """Tests that no batch exceeds max_batch_size and every caller gets its own answer."""
+
+    generator = FakeGenerator(delay=0.05)
+    scheduler = scheduler_factory(generator, max_batch_size=3, max_wait_ms=100)
+
+    answers = {}
+    threads = [
+        threading.Thread(target=lambda i=i: answers.__setitem__(i, scheduler.generate_answer(f"q{i}", MOCK_CONTEXT_DOCS)))
+        for i in range(7)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert answers == {i: f"answer to q{i}" for i in range(7)}
+    assert max(generator.batches) <= 3
+    assert sum(generator.batches) == 7
+
+    stats = scheduler.stats
+    assert stats["requests"] == 7
+    assert stats["batches"] == len(generator.batches)
+    assert stats["p95_latency_ms"] >= stats["p50_latency_ms"] > 0
+
+def test_generation_errors_reach_every_caller(scheduler_factory, mocker):
+    """Tests that a failing batch fails each of its futures instead of hanging them."""
+
+    generator = mocker.Mock()
+    generator.generate_batch.side_effect = RuntimeError("out of memory")
+    scheduler = scheduler_factory(generator, max_wait_ms=0)
+
+    with pytest.raises(RuntimeError):
+        scheduler.generate_answer("q", MOCK_CONTEXT_DOCS)
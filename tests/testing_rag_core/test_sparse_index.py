@@ -0,0 +1,56 @@
+import pytest
+from src.rag_core.sparse_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+DOCUMENTS = {
+    "router": "Error E4021 means the router lost its uplink, restart the router to recover.",
+    "printer": "The printer shows error E1002 when the paper tray is empty.",
+    "python": "Python is a versatile programming language used for scripting and data science.",
+    "rust": "Rust is a systems programming language focused on memory safety.",
+}
+
+
+def make_index():
+    index = BM25Index()
+    index.add_many(DOCUMENTS.items())
+    return index
+
+
+def test_exact_terms_rank_first():
+    """Tests that a rare exact term, like an error code, decides the ranking."""
+
+    index = make_index()
+
+    assert index.search("what does E4021 mean", k=1)[0][0] == "router"
+    assert {key for key, _ in index.search("programming language", k=4)} == {"python", "rust"}
+
+def test_rare_terms_weigh_more():
+    index = make_index()
+
+    assert index.idf("e4021") > index.idf("error") > 0
+    assert index.idf("unknown") > index.idf("e4021")
+
+def test_remove_and_replace():
+    """Tests that removed documents stop matching and re-adding a key replaces its text."""
+
+    index = make_index()
+
+    assert index.remove("router")
+    assert not index.remove("router")
+    assert index.search("E4021", k=3) == []
+
+    index.add("printer", "Now about E4021 instead.")
+    assert len(index) == 3
+    assert [key for key, _ in index.search("E4021", k=3)] == ["printer"]
+    assert index.search("tray", k=3) == []
+
+def test_tokenize_splits_codes():
+    assert tokenize("Part XJ-900, rev. B") == ["part", "xj", "900", "rev", "b"]
+
+def test_reciprocal_rank_fusion():
+    """Tests that items ranked well by both rankings beat items ranked first by only one."""
+
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]], k=60)
+
+    assert [item for item, _ in fused] == ["b", "a", "d", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
@@ -0,0 +1,172 @@
+import json
+import pytest
+from src.rag_core.vector_index import RECORDS_FILE, VECTORS_FILE, VectorIndex, content_hash
+from src.processing.text_processor import Document
+
+
+def embed(texts):
+    return [[float(len(text)), float(text.count("a")), 1.0] for text in texts]
+
+
+def make_docs(url, texts):
+    return [Document(page_content=text, metadata={"source_url": url, "chunk_index": i}) for i, text in enumerate(texts)]
+
+
+def test_upsert_only_embeds_new_chunks(mocker):
+    """Tests that unchanged chunks keep their vectors and removed chunks are deleted."""
+
+    index = VectorIndex()
+    embed_fn = mocker.Mock(side_effect=embed)
+
+    assert index.upsert(make_docs("url1", ["alpha", "beta"]), embed_fn) == 2
+    assert index.upsert(make_docs("url1", ["alpha", "gamma"]), embed_fn) == 1
+
+    embed_fn.assert_called_with(["gamma"])
+    assert len(index) == 2
+    assert {doc.page_content for doc, _ in index.search([5.0, 1.0, 1.0], k=5)} == {"alpha", "gamma"}
+
+def test_upsert_streams_in_fixed_size_batches(mocker):
+    """Tests that a generator of chunks is embedded in batches and stale chunks are still deleted at the end."""
+
+    index = VectorIndex()
+    embed_fn = mocker.Mock(side_effect=embed)
+    index.upsert(make_docs("url1", ["stale"]), embed_fn)
+
+    texts = [f"chunk {i}" for i in range(7)]
+    assert index.upsert((doc for doc in make_docs("url1", texts)), embed_fn, batch_size=3) == 7
+
+    assert [len(call.args[0]) for call in embed_fn.call_args_list[1:]] == [3, 3, 1]
+    assert len(index) == 7
+    assert {doc.page_content for doc, _ in index.search([7.0, 0.0, 1.0], k=10)} == set(texts)
+
+def test_upsert_keeps_metadata_added_while_streaming():
+    """Tests that metadata set on a chunk after it was streamed in, e.g. by deduplication, ends up in the index."""
+
+    index = VectorIndex()
+    index.upsert(make_docs("url1", ["alpha"]), embed)
+
+    def stream():
+        for doc in make_docs("url1", ["alpha", "beta"]):
+            yield doc
+            doc.metadata["source_urls"] = ["url1", "mirror"]
+
+    index.upsert(stream(), embed, batch_size=1)
+
+    assert [doc.metadata["source_urls"] for doc, _ in index.search([5.0, 1.0, 1.0], k=2)] == [["url1", "mirror"]] * 2
+
+def test_keyword_search_follows_upserts():
+    """Tests that the BM25 index, once built, is updated by later upserts and deletes."""
+
+    index = VectorIndex()
+    index.upsert(make_docs("url1", ["error E4021 on the router", "the printer is out of paper"]), embed)
+
+    assert [doc.page_content for doc, _ in index.keyword_search("E4021", k=5)] == ["error E4021 on the router"]
+
+    index.upsert(make_docs("url1", ["the printer is out of paper", "error E4021 fixed by a restart"]), embed)
+    index.upsert(make_docs("url2", ["E4021 again"]), embed)
+    index.delete("url2")
+
+    assert [doc.page_content for doc, _ in index.keyword_search("E4021", k=5)] == ["error E4021 fixed by a restart"]
+
+def test_hybrid_search_fuses_dense_and_keyword_results():
+    """Tests that a chunk only the keyword ranking finds still makes the fused top-k."""
+
+    index = VectorIndex()
+    index.upsert(make_docs("url1", ["aaaa aaaa", "aaa", "code ZX81"]), embed)
+
+    dense = [doc.page_content for doc, _ in index.search([9.0, 8.0, 1.0], k=2)]
+    hybrid = [doc.page_content for doc, _ in index.hybrid_search([9.0, 8.0, 1.0], "ZX81", k=2, num_candidates=3)]
+
+    assert "code ZX81" not in dense
+    assert hybrid[0] == "code ZX81"
+
+def test_delete_by_source_url():
+    """Tests that deleting a source removes all of its chunks and nothing else."""
+
+    index = VectorIndex()
+    index.upsert(make_docs("url1", ["alpha", "beta"]), embed)
+    index.upsert(make_docs("url2", ["delta"]), embed)
+
+    assert index.delete("url1") == 2
+    assert index.sources() == ["url2"]
+    assert [doc.page_content for doc, _ in index.search([1.0, 0.0, 0.0], k=5)] == ["delta"]
+
+def test_save_and_load_round_trip(tmp_path):
+    """Tests that a saved index is loaded back memory-mapped with identical search results."""
+
+    index = VectorIndex(tmp_path)
+    index.upsert(make_docs("url1", ["alpha", "beta", "a much longer chunk"]), embed)
+    index.save()
+
+    loaded = VectorIndex.load(tmp_path)
+
+    assert len(loaded) == 3
+    assert loaded.contains("url1", content_hash("alpha"))
+    assert [d.page_content for d, _ in loaded.search([19.0, 2.0, 1.0], k=2)] == [d.page_content for d, _ in index.search([19.0, 2.0, 1.0], k=2)]
+
+def test_load_missing_index_is_empty(tmp_path):
+    """Tests that loading from a directory with nothing saved returns an empty index."""
+
+    index = VectorIndex.load(tmp_path / "missing")
+
+    assert len(index) == 0
+    assert index.search([1.0, 0.0, 0.0], k=3) == []
+
+def test_save_only_appends_what_changed(tmp_path):
+    """Tests that a save after an upsert appends the new vectors and log entries instead of rewriting the files."""
+
+    index = VectorIndex(tmp_path)
+    index.upsert(make_docs("url1", ["alpha", "beta", "aa", "bbb"]), embed)
+    index.save()
+    vectors_size = (tmp_path / VECTORS_FILE).stat().st_size
+    records = (tmp_path / RECORDS_FILE).read_text()
+
+    index.upsert(make_docs("url2", ["gamma"]), embed)
+    index.upsert(make_docs("url1", ["alpha", "aa", "bbb"]), embed)
+    index.save()
+
+    assert (tmp_path / VECTORS_FILE).stat().st_size == vectors_size + 3 * 4
+    appended = (tmp_path / RECORDS_FILE).read_text()
+    assert appended.startswith(records)
+    assert [json.loads(line)["op"] for line in appended[len(records):].splitlines()] == ["add", "update", "update", "delete"]
+
+    loaded = VectorIndex.load(tmp_path)
+    assert len(loaded) == 4
+    assert sorted(loaded.sources()) == ["url1", "url2"]
+    assert not loaded.contains("url1", content_hash("beta"))
+    assert {doc.page_content for doc, _ in loaded.search([5.0, 1.0, 1.0], k=5)} == {"alpha", "aa", "bbb", "gamma"}
+
+def test_save_compacts_deleted_rows(tmp_path):
+    """Tests that once enough rows are deleted the next save rewrites the files without them."""
+
+    index = VectorIndex(tmp_path)
+    index.upsert(make_docs("url1", ["alpha", "beta"]), embed)
+    index.upsert(make_docs("url2", ["gamma", "delta"]), embed)
+    index.save()
+
+    index.delete("url1")
+    assert index.num_rows == 4
+    index.save()
+
+    assert index.num_rows == 2
+    assert (tmp_path / VECTORS_FILE).stat().st_size == 2 * 3 * 4
+    assert len((tmp_path / RECORDS_FILE).read_text().splitlines()) == 3
+
+    loaded = VectorIndex.load(tmp_path)
+    assert loaded.sources() == ["url2"]
+    assert {doc.page_content for doc, _ in loaded.search([5.0, 1.0, 1.0], k=5)} == {"gamma", "delta"}
+
+def test_load_ignores_a_partly_written_log_entry(tmp_path):
+    """Tests that a save interrupted mid-write loses only its own changes and is overwritten by the next save."""
+
+    index = VectorIndex(tmp_path)
+    index.upsert(make_docs("url1", ["alpha"]), embed)
+    index.save()
+    with open(tmp_path / RECORDS_FILE, "a") as f:
+        f.write('{"op": "add", "source_')
+
+    loaded = VectorIndex.load(tmp_path)
+    loaded.upsert(make_docs("url2", ["beta"]), embed)
+    loaded.save()
+
+    assert sorted(VectorIndex.load(tmp_path).sources()) == ["url1", "url2"]
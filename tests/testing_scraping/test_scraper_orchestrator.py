@@ -1,38 +1,281 @@
+import asyncio
 import pytest
 from src.scraping import scraper # Import the module we are testing
+from scrapy import Request
+from scrapy.exceptions import IgnoreRequest
+from crawler.article_crawler.middlewares import ScrapeBudgetDownloaderMiddleware
+from src.scraping.engine import ScrapeBatch
+from crawler.article_crawler.page_cache import PageCache
+
+
+@pytest.fixture(autouse=True)
+def no_page_cache(mocker):
+    """Keeps the tests from reading or writing the on-disk page cache."""
+    return mocker.patch('src.scraping.scraper.get_page_cache', return_value=None)
+
+
+def _completed_batch(urls, results):
+    batch = ScrapeBatch(urls)
+    for item in results:
+        batch.add_item(item)
+        batch.mark_done(item['url'])
+    return batch
+
+
+@pytest.fixture(autouse=True)
+def scrape_budget(mocker):
+    mocker.patch('src.config.SCRAPE_DEADLINE', 30)
+    mocker.patch('src.config.SCRAPE_MAX_PAGES', 0)
+
 
 def test_scrape_urls_with_mocked_crawler(mocker):
     """
     Tests the scrape_urls orchestrator function.
-    It mocks the Scrapy CrawlerProcess to avoid running a real crawl,
-    and checks if the function correctly processes the simulated results.
+    It mocks the long-lived scraping engine to avoid running a real crawl,
+    and checks if the function correctly returns the batch results.
     """
-    
+
     test_urls = ["http://test.com/page1", "http://test.com/page2"]
-    
+
     mock_results = [
         {'url': 'http://test.com/page1', 'cleaned_text': 'This is page one.'},
         {'url': 'http://test.com/page2', 'cleaned_text': 'This is page two.'}
     ]
 
-    mock_crawler_process = mocker.patch('src.scraping.scraper.CrawlerProcess')
-
-    mock_crawler_process.return_value.start.return_value = None
-
-    mocker.patch('src.scraping.scraper.CRAWLER_RESULTS', mock_results)
+    mock_get_engine = mocker.patch('src.scraping.scraper.get_scraping_engine')
+    mock_get_engine.return_value.submit.return_value = _completed_batch(test_urls, mock_results)
 
     final_dict = scraper.scrape_urls(test_urls)
 
-    mock_crawler_process.assert_called_once()
-    
+    mock_get_engine.return_value.submit.assert_called_once_with(test_urls, deadline=30, max_pages=None)
+
     assert isinstance(final_dict, dict)
     assert len(final_dict) == 2
     assert final_dict['http://test.com/page1'] == 'This is page one.'
     assert final_dict['http://test.com/page2'] == 'This is page two.'
 
-def test_scrape_urls_with_no_urls():
+def test_scrape_urls_async_with_mocked_crawler(mocker):
+    """
+    Tests that the async variant awaits the same per-call batch results.
+    """
+
+    test_urls = ["http://test.com/page1"]
+    mock_results = [{'url': 'http://test.com/page1', 'cleaned_text': 'This is page one.'}]
+
+    mock_get_engine = mocker.patch('src.scraping.scraper.get_scraping_engine')
+    mock_get_engine.return_value.submit.return_value = _completed_batch(test_urls, mock_results)
+
+    final_dict = asyncio.run(scraper.scrape_urls_async(test_urls))
+
+    assert final_dict == {'http://test.com/page1': 'This is page one.'}
+
+def test_scrape_batch_resolves_when_every_url_is_done():
+    """
+    Tests that a batch only resolves once every URL produced an item or failed,
+    and that empty texts are not returned.
+    """
+
+    batch = ScrapeBatch(["http://test.com/a", "http://test.com/b", "http://test.com/a"])
+
+    assert batch.urls == ["http://test.com/a", "http://test.com/b"]
+
+    batch.add_item({'url': 'http://test.com/a', 'cleaned_text': ''})
+    batch.mark_done("http://test.com/a")
+    assert not batch.done
+
+    batch.mark_done("http://test.com/b")
+    assert batch.done
+    assert batch.future.result() == {}
+
+def test_scrape_urls_serves_fresh_pages_from_cache(mocker, no_page_cache, tmp_path):
+    """
+    Tests the page cache fast path: fresh pages are returned without being submitted
+    to the scraping engine, only the remaining URLs are scraped.
+    """
+
+    page_cache = PageCache(tmp_path / "pages.sqlite3", ttl=60)
+    page_cache.store("http://test.com/page1", "http://test.com/page1", "Cached page one.", content_length=1234)
+    no_page_cache.return_value = page_cache
+
+    mock_results = [{'url': 'http://test.com/page2', 'cleaned_text': 'This is page two.'}]
+    mock_get_engine = mocker.patch('src.scraping.scraper.get_scraping_engine')
+    mock_get_engine.return_value.submit.return_value = _completed_batch(["http://test.com/page2"], mock_results)
+
+    final_dict = scraper.scrape_urls(["http://test.com/page1", "http://test.com/page2"])
+
+    mock_get_engine.return_value.submit.assert_called_once_with(["http://test.com/page2"], deadline=30, max_pages=None)
+    assert final_dict == {
+        'http://test.com/page1': 'Cached page one.',
+        'http://test.com/page2': 'This is page two.',
+    }
+
+def test_scrape_batch_stops_after_max_pages():
+    """
+    Tests the "first K good pages" rule: the batch resolves as soon as K pages with text
+    were scraped, the outstanding URLs are recorded as cancelled and late pages are ignored.
+    """
+
+    batch = ScrapeBatch(["http://test.com/a", "http://test.com/b", "http://test.com/c"], max_pages=1)
+
+    batch.add_item({'url': 'http://test.com/a', 'cleaned_text': ''})
+    batch.mark_done("http://test.com/a", status="empty")
+    batch.add_item({'url': 'http://test.com/b', 'cleaned_text': 'This is page b.'})
+
+    assert batch.done
+    assert batch.stop_reason == "max_pages"
+    assert batch.future.result() == {'http://test.com/b': 'This is page b.'}
+
+    batch.add_item({'url': 'http://test.com/c', 'cleaned_text': 'This page arrived too late.'})
+    batch.mark_done("http://test.com/c")
+
+    assert batch.future.result() == {'http://test.com/b': 'This is page b.'}
+    assert {url: timing.status for url, timing in batch.timings.items()} == {
+        'http://test.com/a': 'empty',
+        'http://test.com/b': 'cancelled',
+        'http://test.com/c': 'cancelled',
+    }
+
+def test_scrape_budget_middleware_cancels_requests_of_finished_batches():
+    """
+    Tests that requests of a resolved batch are dropped before the download, and that the
+    download timeout of the others is capped to the time left before the batch deadline.
+    """
+
+    batch = ScrapeBatch(["http://test.com/a"], deadline=5)
+    request = Request("http://test.com/a", meta={"scrape_batch": batch, "download_timeout": 180})
+    middleware = ScrapeBudgetDownloaderMiddleware()
+
+    assert middleware.process_request(request, spider=None) is None
+    assert 0 < request.meta["download_timeout"] <= 5
+
+    batch.finish(reason="deadline")
+
+    with pytest.raises(IgnoreRequest):
+        middleware.process_request(request, spider=None)
+
+def test_scrape_urls_skips_the_engine_when_the_cache_covers_max_pages(mocker, no_page_cache, tmp_path):
+    """
+    Tests that pages served from the page cache count towards 'max_pages'.
+    """
+
+    page_cache = PageCache(tmp_path / "pages.sqlite3", ttl=60)
+    page_cache.store("http://test.com/page1", "http://test.com/page1", "Cached page one.")
+    no_page_cache.return_value = page_cache
+
+    mock_get_engine = mocker.patch('src.scraping.scraper.get_scraping_engine')
+
+    final_dict = scraper.scrape_urls(["http://test.com/page1", "http://test.com/page2"], max_pages=1)
+
+    assert final_dict == {'http://test.com/page1': 'Cached page one.'}
+    mock_get_engine.assert_not_called()
+
+def test_scrape_urls_with_no_urls(mocker):
     """
     Tests the edge case where an empty list of URLs is provided.
     """
+    mock_get_engine = mocker.patch('src.scraping.scraper.get_scraping_engine')
+
     result = scraper.scrape_urls([])
+
     assert result == {}
+    mock_get_engine.assert_not_called()
+
+def test_scrape_urls_stream_yields_pages_as_they_arrive(mocker):
+    """
+    Tests that the streaming variant yields every scraped page through the batch's
+    result callback and stops once the batch resolves.
+    """
+
+    test_urls = ["http://test.com/page1", "http://test.com/page2"]
+    mock_results = [
+        {'url': 'http://test.com/page1', 'cleaned_text': 'This is page one.'},
+        {'url': 'http://test.com/page2', 'cleaned_text': 'This is page two.'}
+    ]
+
+    def submit(urls, on_result=None, deadline=None, max_pages=None):
+        batch = ScrapeBatch(urls, on_result=on_result, deadline=deadline, max_pages=max_pages)
+        for item in mock_results:
+            batch.add_item(item)
+            batch.mark_done(item['url'])
+        return batch
+
+    mock_get_engine = mocker.patch('src.scraping.scraper.get_scraping_engine')
+    mock_get_engine.return_value.submit.side_effect = submit
+
+    async def collect():
+        return [page async for page in scraper.scrape_urls_stream(test_urls)]
+
+    pages = asyncio.run(collect())
+
+    assert pages == [
+        ('http://test.com/page1', 'This is page one.'),
+        ('http://test.com/page2', 'This is page two.'),
+    ]
+
+def test_scrape_urls_stream_cancels_the_batch_when_the_consumer_stops(mocker):
+    """
+    Tests that a consumer cancelling the stream before the batch resolved cancels the engine
+    batch, instead of leaving it to scrape until its deadline.
+    """
+
+    test_urls = ["http://test.com/page1", "http://test.com/slow"]
+    batches = []
+
+    def submit(urls, on_result=None, deadline=None, max_pages=None):
+        batch = ScrapeBatch(urls, on_result=on_result, deadline=deadline, max_pages=max_pages)
+        batch.add_item({'url': 'http://test.com/page1', 'cleaned_text': 'This is page one.'})
+        batch.mark_done('http://test.com/page1')
+        batches.append(batch)
+        return batch
+
+    mock_get_engine = mocker.patch('src.scraping.scraper.get_scraping_engine')
+    mock_get_engine.return_value.submit.side_effect = submit
+
+    async def consume_until_cancelled():
+        pages = []
+        async def consume():
+            async for page in scraper.scrape_urls_stream(test_urls, deadline=15):
+                pages.append(page)
+
+        task = asyncio.create_task(consume())
+        while not pages:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return pages
+
+    pages = asyncio.run(consume_until_cancelled())
+
+    assert pages == [('http://test.com/page1', 'This is page one.')]
+    assert batches[0].deadline == 15
+    mock_get_engine.return_value.cancel.assert_called_once_with(batches[0])
+
+def test_scrape_batch_counts_fast_path_and_browser_fetches():
+    """
+    Tests that the batch reports how many pages were fetched over plain HTTP, how many needed
+    the browser and why, while pages served from the page cache are not counted as fetches.
+    """
+
+    batch = ScrapeBatch(["http://test.com/a", "http://test.com/b", "http://test.com/c"])
+
+    batch.record({"page_cache": "miss", "playwright": False})
+    batch.record({"page_cache": "miss", "playwright": True, "fetch_fallback": "short_text"})
+    batch.record({"page_cache": "fresh", "page_cache_bytes_saved": 10, "playwright": False})
+
+    assert batch.stats["fetch/http"] == 1
+    assert batch.stats["fetch/browser"] == 1
+    assert batch.stats["fetch/browser_fallback/short_text"] == 1
+    assert batch.stats["page_cache/fresh"] == 1
+
+def test_scrape_batch_records_main_content_reduction():
+    """
+    Tests that the batch keeps the before/after character count of every page
+    extracted in main-content mode, for the per-URL report and the summary.
+    """
+
+    batch = ScrapeBatch(["http://test.com/a"])
+    batch.add_item({'url': 'http://test.com/a', 'cleaned_text': 'Article body.', 'full_text_length': 120})
+
+    assert batch.text_lengths == {'http://test.com/a': (120, 13)}
+    assert batch.stats["extract/chars_before"] == 120
+    assert batch.stats["extract/chars_after"] == 13
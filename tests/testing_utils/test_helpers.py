@@ -0,0 +1,19 @@
+import sys
+from src.utils.helpers import resident_memory_mb
+
+
+def test_resident_memory_mb_without_proc_or_resource(mocker):
+    """
+    Tests that on platforms with neither '/proc' nor the Unix-only 'resource' module, e.g. Windows,
+    no resident memory is reported instead of raising.
+    """
+
+    mocker.patch('builtins.open', side_effect=OSError)
+    mocker.patch.dict(sys.modules, {'resource': None})
+
+    assert resident_memory_mb() is None
+
+def test_resident_memory_mb_falls_back_to_peak_rss(mocker):
+    mocker.patch('builtins.open', side_effect=OSError)
+
+    assert resident_memory_mb() > 0